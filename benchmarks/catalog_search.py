@@ -0,0 +1,150 @@
+"""
+Measures `/search` query latency on a large synthetic catalog.
+
+Creates a scratch database, builds the schema with the app's models (including the
+generated `search_vector` columns and their GIN indexes), fills it with synthetic
+destinations and cruises, then times `queries.search_catalog` for a mix of terms:
+rare words, common words, multi-word and prefix queries. The scratch database is
+dropped afterwards unless --keep is given.
+
+Usage (from the repository root, with the POSTGRES_* variables set):
+
+    python benchmarks/catalog_search.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from flaskapp import create_app, db, queries  # noqa: E402
+
+SYLLABLES = ["ka", "lor", "ve", "mi", "tan", "sor", "el", "qui", "dra", "on", "pe", "zu", "ri", "gal", "nox", "ty"]
+
+
+def vocabulary(size: int, rng: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def fill(rows: int, words):
+    """Inserts rows/2 destinations and rows/2 cruises whose text is drawn from `words`."""
+    # Names use two words and descriptions twelve, picked from the row id with different
+    # multipliers, so term frequencies are spread evenly and the data is the same on every run
+    primes = [7919, 104729, 1299709, 15485863, 32452843, 49979687, 67867967, 86028121, 104395301]
+    pick = "(SELECT word FROM bench_words WHERE n = (i::bigint * {prime} + {offset}) % :count)"
+    picks = [pick.format(prime=primes[n % len(primes)], offset=n * 31) for n in range(15)]
+    name = f"initcap({picks[0]}) || ' ' || initcap({picks[1]})"
+    subtitle = f"'The ' || {picks[2]} || ' route'"
+    description = " || ' ' || ".join(picks[3:])
+    half = rows // 2
+    # Subscripting a bound array would detoast all of it for every pick; an indexed table doesn't
+    db.session.execute(text("CREATE TEMPORARY TABLE bench_words (n integer PRIMARY KEY, word text)"))
+    db.session.execute(
+        text("INSERT INTO bench_words SELECT n - 1, word FROM unnest(:words) WITH ORDINALITY AS w(word, n)"),
+        {"words": words},
+    )
+    for table in ("destination", "cruise"):
+        # Building the GIN index once after loading is much faster than maintaining it per row
+        db.session.execute(text(f"DROP INDEX ix_{table}_search_vector"))
+        db.session.execute(
+            text(
+                f"INSERT INTO {table} (id, name, subtitle, description) "
+                f"SELECT i, {name}, {subtitle}, {description} FROM generate_series(1, :rows) AS i"
+            ),
+            {"count": len(words), "rows": half},
+        )
+        db.session.execute(text("SET maintenance_work_mem = '256MB'"))
+        db.session.execute(text(f"CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector)"))
+        db.session.commit()
+        db.session.execute(text(f"ANALYZE {table}"))
+        db.session.commit()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(terms, repeat: int, limit: int, candidates) -> dict:
+    timings = {}
+    for term in terms:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = queries.search_catalog(term, limit=limit, candidates=candidates)
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[term] = {
+            "results": len(results),
+            "p50_ms": round(statistics.median(samples), 2),
+            "p95_ms": round(percentile(samples, 0.95), 2),
+        }
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="destinations and cruises in total")
+    parser.add_argument("--words", type=int, default=20_000, help="size of the synthetic vocabulary")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--candidates", type=int, default=1000, help="matches ranked per table; 0 ranks all")
+    parser.add_argument("--database", default="flaskapp_search_bench")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    parser.add_argument("--reuse", action="store_true", help="query a database kept by an earlier --keep run")
+    args = parser.parse_args(argv)
+
+    base_app = create_app()
+    admin_url = base_app.config["SQLALCHEMY_DATABASE_URI"]
+    admin = create_engine(admin_url, isolation_level="AUTOCOMMIT")
+    if not args.reuse:
+        with admin.connect() as connection:
+            connection.execute(text(f'DROP DATABASE IF EXISTS "{args.database}"'))
+            connection.execute(text(f'CREATE DATABASE "{args.database}"'))
+
+    scratch_url = admin.url.set(database=args.database).render_as_string(hide_password=False)
+    app = create_app({"DATABASE_URI": scratch_url, "CATALOG_CACHE_BACKEND": "none"})
+    rng = random.Random(42)
+    words = vocabulary(args.words, rng)
+    try:
+        with app.app_context():
+            start = time.perf_counter()
+            if not args.reuse:
+                db.create_all()
+                fill(args.rows, words)
+            load_seconds = time.perf_counter() - start
+
+            terms = [
+                rng.choice(words),
+                rng.choice(words),
+                f"{rng.choice(words)} {rng.choice(words)}",
+                rng.choice(words)[:3],
+                rng.choice(words)[:4],
+                "no such thing",
+            ]
+            # Warm the buffer cache so the numbers reflect a running server
+            candidates = args.candidates or None
+            measure(terms, 2, args.limit, candidates)
+            timings = measure(terms, args.repeat, args.limit, candidates)
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        if not args.keep:
+            with admin.connect() as connection:
+                connection.execute(text(f'DROP DATABASE IF EXISTS "{args.database}"'))
+
+    summary = {"rows": args.rows, "candidates": args.candidates, "load_seconds": round(load_seconds, 1)}
+    print(json.dumps(dict(summary, queries=timings), indent=2))
+
+
+if __name__ == "__main__":
+    main()
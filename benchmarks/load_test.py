@@ -0,0 +1,369 @@
+"""
+End-to-end load test of every page against a synthetic catalog.
+
+Generates a catalog and info requests with synthetic_catalog.py, loads them into a scratch
+database (migrations, `seeder.stream_data` and the COPY import of `bulk`), starts gunicorn
+with `flaskapp:create_app()` and gunicorn.conf.py, and sends a weighted mix of requests to
+every route in `pages`, including info request posts. Server-Timing headers give the SQL
+statements each request ran.
+
+The report is JSON: throughput, p50/p95/p99 latency, errors and statements per request,
+in total and per route, along with the catalog size, server settings and git commit.
+Save one with --output and pass it to a later run with --compare to print the change in
+each number. The same --seed sends the same requests in the same order.
+
+Usage (from the repository root, with the POSTGRES_* variables set):
+
+    python benchmarks/load_test.py --cruises 50000 --info-requests 1000000 --output baseline.json
+    python benchmarks/load_test.py --cruises 50000 --info-requests 1000000 --compare baseline.json
+"""
+
+import argparse
+import concurrent.futures
+import http.client
+import json
+import os
+import pathlib
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import uuid
+
+import flask_migrate
+import synthetic_catalog
+from sqlalchemy import create_engine, text
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from flaskapp import bulk, create_app, db, seeder, startup  # noqa: E402
+
+# Relative weights of each kind of request in the traffic mix
+MIX = {
+    "index": 5,
+    "about": 2,
+    "destinations": 10,
+    "destinations_page": 6,
+    "destination_detail": 20,
+    "cruise_detail": 20,
+    "search": 10,
+    "cruises_search": 5,
+    "info_request": 12,
+    "info_request_post": 10,
+}
+STATEMENTS = re.compile(r'db;[^,]*desc="(\d+) queries"')
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors", "statements_per_request")
+
+
+class Traffic:
+    """Builds the requests of the mix, as (route, method, path, form)."""
+
+    def __init__(self, destinations: int, cruises: int, words, rng: random.Random):
+        self.destinations = destinations
+        self.cruises = cruises
+        self.words = words
+        self.rng = rng
+
+    def request(self, route: str):
+        rng = self.rng
+        if route == "index":
+            return "GET", "/", None
+        if route == "about":
+            return "GET", "/about", None
+        if route == "destinations":
+            return "GET", "/destinations", None
+        if route == "destinations_page":
+            return "GET", f"/destinations?after={rng.randint(1, self.destinations)}", None
+        if route == "destination_detail":
+            return "GET", f"/destination/{rng.randint(1, self.destinations)}", None
+        if route == "cruise_detail":
+            return "GET", f"/cruise/{rng.randint(1, self.cruises)}", None
+        if route == "search":
+            return "GET", "/search?" + urllib.parse.urlencode({"q": rng.choice(self.words)}), None
+        if route == "cruises_search":
+            return "GET", "/cruises/search?" + urllib.parse.urlencode({"q": rng.choice(self.words)[:3]}), None
+        if route == "info_request":
+            return "GET", "/info_request", None
+        if route == "info_request_post":
+            form = {
+                "name": "Load Test",
+                "email": "load@example.com",
+                "notes": "Sent by benchmarks/load_test.py",
+                "cruise_id": rng.randint(1, self.cruises),
+                "request_key": uuid.UUID(int=rng.getrandbits(128)).hex,
+            }
+            return "POST", "/info_request", form
+        raise ValueError(f"Unknown route {route!r}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_database(url: str, catalog_path: str, info_requests_path: str) -> dict:
+    """Migrates the scratch database and loads the generated files into it. Returns seconds per step."""
+    app = create_app({"DATABASE_URI": url, "CATALOG_CACHE_BACKEND": "none"})
+    timings = {}
+    with app.app_context():
+        start = time.perf_counter()
+        flask_migrate.upgrade(directory=startup.MIGRATIONS_DIRECTORY)
+        timings["migrate"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        seeder.stream_data(db, catalog_path)
+        timings["seed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(info_requests_path, "rb") as f:
+            bulk.import_info_requests(db, f, "csv")
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        timings["import"] = time.perf_counter() - start
+        db.session.remove()
+        db.engine.dispose()
+    return {step: round(seconds, 1) for step, seconds in timings.items()}
+
+
+def start_server(database: str, args):
+    port = free_port()
+    env = dict(os.environ, POSTGRES_DATABASE=database, SERVER_TIMING_HEADER="true")
+    if args.no_cache:
+        env.update(PAGE_CACHE_ENABLED="false", CATALOG_CACHE_BACKEND="none", FRAGMENT_CACHE_BACKEND="none")
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "-c",
+        str(ROOT / "src" / "gunicorn.conf.py"),
+        "--chdir",
+        str(ROOT / "src"),
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--workers",
+        str(args.workers),
+        "--threads",
+        str(args.threads),
+        "--worker-class",
+        args.worker_class,
+        "--log-level",
+        "warning",
+        "flaskapp:create_app()",
+    ]
+    server = subprocess.Popen(command, env=env)
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            send(port, "GET", "/about", None)
+            return server, port
+        except OSError:
+            if time.monotonic() > deadline or server.poll() is not None:
+                server.kill()
+                raise RuntimeError("gunicorn did not start")
+            time.sleep(0.2)
+
+
+def send(port: int, method: str, path: str, form):
+    """Sends one request without following redirects. Returns (status, seconds, statements)."""
+    body = urllib.parse.urlencode(form) if form else None
+    headers = {"Content-Type": "application/x-www-form-urlencoded"} if form else {}
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    try:
+        start = time.perf_counter()
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - start
+    finally:
+        connection.close()
+    match = STATEMENTS.search(response.getheader("Server-Timing") or "")
+    return response.status, elapsed, int(match.group(1)) if match else None
+
+
+def run_client(port: int, traffic: Traffic, routes, count: int):
+    """Sends `count` requests from the mix one after another. Returns [(route, status, seconds, statements)]."""
+    results = []
+    for route in routes[:count]:
+        method, path, form = traffic.request(route)
+        try:
+            status, elapsed, statements = send(port, method, path, form)
+        except OSError:
+            status, elapsed, statements = None, None, None
+        results.append((route, status, elapsed, statements))
+    return results
+
+
+def summarize(results, elapsed: float) -> dict:
+    latencies = [seconds for _, status, seconds, _ in results if seconds is not None]
+    statements = [count for _, _, _, count in results if count is not None]
+    errors = sum(1 for _, status, _, _ in results if status is None or status >= 400)
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        "statements_per_request": round(statistics.mean(statements), 2) if statements else None,
+    }
+
+
+def drive(port: int, args, mix: dict, words) -> dict:
+    """Sends the warm-up and measured requests. Returns the report's totals and routes."""
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    per_client = -(-args.requests // args.concurrency)
+
+    def clients(seed_offset: int, count: int):
+        # One generator per client, so the requests each client sends don't depend on thread timing
+        for n in range(args.concurrency):
+            rng = random.Random(args.seed * 1000 + seed_offset + n)
+            yield Traffic(args.destinations, args.cruises, words, rng), rng.choices(names, weights, k=count)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        warmup = -(-args.warmup // args.concurrency)
+        list(executor.map(lambda client: run_client(port, client[0], client[1], warmup), clients(500, warmup)))
+
+        start = time.perf_counter()
+        futures = [
+            executor.submit(run_client, port, traffic, routes, per_client) for traffic, routes in clients(0, per_client)
+        ]
+        results = [result for future in futures for result in future.result()]
+        elapsed = time.perf_counter() - start
+
+    routes = {}
+    for name in names:
+        route_results = [result for result in results if result[0] == name]
+        routes[name] = summarize(route_results, elapsed)
+    return {"total": summarize(results, elapsed), "routes": routes}
+
+
+def compare(previous: dict, current: dict) -> str:
+    """A table of each metric's change from `previous` to `current`."""
+    lines = [f"Compared with {previous.get('commit', 'unknown')}:"]
+    sections = [("total", previous.get("total", {}), current["total"])]
+    sections += [(name, previous.get("routes", {}).get(name, {}), values) for name, values in current["routes"].items()]
+    for name, old, new in sections:
+        changes = []
+        for metric in METRICS:
+            before, after = old.get(metric), new.get(metric)
+            if before is None or after is None:
+                continue
+            change = f" ({(after - before) / before:+.0%})" if before else ""
+            changes.append(f"{metric} {before} -> {after}{change}")
+        lines.append(f"  {name}: " + ", ".join(changes))
+    return "\n".join(lines)
+
+
+def parse_mix(overrides) -> dict:
+    mix = dict(MIX)
+    for override in overrides or ():
+        name, _, weight = override.partition("=")
+        if name not in MIX:
+            raise SystemExit(f"Unknown route {name!r}; expected one of {', '.join(MIX)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    synthetic_catalog.add_arguments(parser)
+    parser.add_argument("--requests", type=int, default=5000, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=500, help="requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="clients sending requests at once")
+    parser.add_argument("--mix", nargs="*", metavar="ROUTE=WEIGHT", help=f"change weights of: {', '.join(MIX)}")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--worker-class", default="gthread")
+    parser.add_argument("--no-cache", action="store_true", help="turn off the page, catalog and fragment caches")
+    parser.add_argument("--database", default="flaskapp_load_bench")
+    parser.add_argument("--data-dir", help="where to write the generated files; a temporary directory by default")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    parser.add_argument("--reuse", action="store_true", help="use a database kept by an earlier --keep run")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--compare", help="a report from an earlier run to compare with")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    admin = create_engine(create_app().config["SQLALCHEMY_DATABASE_URI"], isolation_level="AUTOCOMMIT")
+    scratch_url = admin.url.set(database=args.database).render_as_string(hide_password=False)
+    words = synthetic_catalog.vocabulary(max(100, (args.destinations + args.cruises) // 10), random.Random(args.seed))
+    load_seconds = {}
+    try:
+        if not args.reuse:
+            with admin.connect() as connection:
+                connection.execute(text(f'DROP DATABASE IF EXISTS "{args.database}" WITH (FORCE)'))
+                connection.execute(text(f'CREATE DATABASE "{args.database}"'))
+            with tempfile.TemporaryDirectory() as temporary:
+                paths = synthetic_catalog.write(
+                    args.data_dir or temporary,
+                    args.destinations,
+                    args.cruises,
+                    args.links_per_cruise,
+                    args.info_requests,
+                    args.seed,
+                )
+                load_seconds = load_database(scratch_url, *paths)
+
+        server, port = start_server(args.database, args)
+        try:
+            measured = drive(port, args, mix, words)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    finally:
+        if not args.keep:
+            with admin.connect() as connection:
+                connection.execute(text(f'DROP DATABASE IF EXISTS "{args.database}" WITH (FORCE)'))
+
+    report = {
+        "commit": git_commit(),
+        "catalog": {
+            "destinations": args.destinations,
+            "cruises": args.cruises,
+            "links_per_cruise": args.links_per_cruise,
+            "info_requests": args.info_requests,
+            "seed": args.seed,
+            "load_seconds": load_seconds,
+        },
+        "server": {
+            "workers": args.workers,
+            "threads": args.threads,
+            "worker_class": args.worker_class,
+            "caches": not args.no_cache,
+        },
+        "load": {"requests": args.requests, "warmup": args.warmup, "concurrency": args.concurrency, "mix": mix},
+        **measured,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Compares gunicorn worker classes under I/O-bound load.
+
+Each mode starts gunicorn with the same worker count and drives the catalog pages
+with many concurrent clients. Page and catalog caching are disabled and every SQL
+statement is preceded by `pg_sleep`, so requests spend their time waiting on
+Postgres the way they do against a remote Flexible Server.
+
+Usage (from the repository root, with the POSTGRES_* variables set):
+
+    python benchmarks/serving_modes.py --modes gthread gevent --concurrency 200 --requests 2000
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import pathlib
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+ROUTES = ["/destinations", "/destination/1", "/cruise/1", "/info_request"]
+
+
+def create_app():
+    """App factory used by the gunicorn workers started by this benchmark."""
+    from flaskapp import create_app as create_flask_app
+
+    latency = float(os.environ.get("BENCH_DB_LATENCY_MS", 0)) / 1000
+    if latency:
+
+        @event.listens_for(Engine, "before_cursor_execute", retval=True)
+        def add_latency(conn, cursor, statement, parameters, context, executemany):
+            return f"SELECT pg_sleep({latency}); {statement}", parameters
+
+    return create_flask_app()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def fetch(url: str) -> float:
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=120) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_mode(mode: str, args) -> dict:
+    port = free_port()
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=mode,
+        BENCH_DB_LATENCY_MS=str(args.db_latency_ms),
+        PAGE_CACHE_ENABLED="false",
+        CATALOG_CACHE_BACKEND="none",
+        DB_POOL_SIZE=str(args.pool_size),
+        DB_MAX_OVERFLOW="0",
+        DB_POOL_TIMEOUT="120",
+    )
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "-c",
+        str(ROOT / "src" / "gunicorn.conf.py"),
+        "--chdir",
+        str(ROOT / "src"),
+        "--pythonpath",
+        str(ROOT),
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--workers",
+        str(args.workers),
+        "--threads",
+        str(args.threads),
+        "--log-level",
+        "warning",
+        "benchmarks.serving_modes:create_app()",
+    ]
+    server = subprocess.Popen(command, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url + "/about")
+        urls = [base_url + ROUTES[i % len(ROUTES)] for i in range(args.requests)]
+        errors = 0
+        latencies = []
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for future in concurrent.futures.as_completed([executor.submit(fetch, url) for url in urls]):
+                try:
+                    latencies.append(future.result())
+                except OSError:
+                    errors += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        "mode": mode,
+        "requests": args.requests,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modes", nargs="+", default=["gthread", "gevent"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="threads per gthread worker")
+    parser.add_argument("--pool-size", type=int, default=50, help="DB connections per worker")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--db-latency-ms", type=float, default=20)
+    args = parser.parse_args(argv)
+
+    results = [run_mode(mode, args) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Generates a synthetic catalog and info requests for load tests.
+
+Writes two files to --output-dir:
+
+- `catalog.ndjson`: destinations and cruises in the seeder's format, one entry per line,
+  for `flask seed --stream --filename catalog.ndjson`. Each cruise visits
+  --links-per-cruise destinations on average.
+- `info_requests.csv`: info requests for those cruises, for
+  `flask info-requests import info_requests.csv`.
+
+Names and descriptions are drawn from a made-up vocabulary, so `/search` has terms of
+every frequency to match. The same --seed always produces the same files, and rows are
+written as they are generated, so millions of them need no more memory than a few.
+
+Usage (from the repository root):
+
+    python benchmarks/synthetic_catalog.py --destinations 10000 --cruises 50000 --info-requests 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import random
+import time
+from collections.abc import Iterator
+
+SYLLABLES = ["ka", "lor", "ve", "mi", "tan", "sor", "el", "qui", "dra", "on", "pe", "zu", "ri", "gal", "nox", "ty"]
+INFO_REQUEST_COLUMNS = ("name", "email", "notes", "cruise_id", "dedup_key")
+
+
+def vocabulary(size: int, rng: random.Random) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def phrase(words: list[str], count: int, rng: random.Random) -> str:
+    # Skewed towards the start of the vocabulary, so some words are common and most are rare
+    return " ".join(words[int(len(words) * rng.random() ** 3)] for _ in range(count))
+
+
+def catalog_entries(
+    destinations: int, cruises: int, links_per_cruise: float, words: list[str], rng: random.Random
+) -> Iterator[dict]:
+    """Seeder entries: `destinations` destinations with ids from 1, then `cruises` cruises."""
+    for pk in range(1, destinations + 1):
+        yield {
+            "model": "relecloud.destination",
+            "pk": pk,
+            "fields": {
+                "name": phrase(words, 2, rng).title(),
+                "subtitle": f"The {phrase(words, 1, rng)} system",
+                "description": phrase(words, 12, rng),
+            },
+        }
+    for pk in range(1, cruises + 1):
+        # Between 1 and twice the average, so the mean is links_per_cruise
+        visited = min(destinations, max(1, round(rng.uniform(1, 2 * links_per_cruise - 1))))
+        yield {
+            "model": "relecloud.cruise",
+            "pk": pk,
+            "fields": {
+                "name": f"{phrase(words, 2, rng).title()} Cruise",
+                "subtitle": f"{visited} stops",
+                "description": phrase(words, 12, rng),
+                "destinations": sorted(rng.sample(range(1, destinations + 1), visited)),
+            },
+        }
+
+
+def info_request_rows(count: int, cruises: int, rng: random.Random) -> Iterator[tuple]:
+    """Rows in INFO_REQUEST_COLUMNS order, each with a unique dedup key."""
+    for n in range(count):
+        yield (
+            f"Visitor {n}",
+            f"visitor{n}@example.com",
+            "Interested in the next departure",
+            rng.randint(1, cruises),
+            f"synthetic-{n:012d}",
+        )
+
+
+def write(output_dir: str, destinations: int, cruises: int, links_per_cruise: float, info_requests: int, seed: int):
+    """Writes both files and returns their paths as (catalog, info requests)."""
+    rng = random.Random(seed)
+    words = vocabulary(max(100, (destinations + cruises) // 10), rng)
+    os.makedirs(output_dir, exist_ok=True)
+    catalog_path = os.path.join(output_dir, "catalog.ndjson")
+    with open(catalog_path, "w") as f:
+        for entry in catalog_entries(destinations, cruises, links_per_cruise, words, rng):
+            f.write(json.dumps(entry))
+            f.write("\n")
+    info_requests_path = os.path.join(output_dir, "info_requests.csv")
+    with open(info_requests_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(INFO_REQUEST_COLUMNS)
+        writer.writerows(info_request_rows(info_requests, cruises, rng))
+    return catalog_path, info_requests_path
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--destinations", type=int, default=10_000)
+    parser.add_argument("--cruises", type=int, default=50_000)
+    parser.add_argument("--links-per-cruise", type=float, default=3, help="average destinations per cruise")
+    parser.add_argument("--info-requests", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_arguments(parser)
+    parser.add_argument("--output-dir", default="synthetic-catalog")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    paths = write(
+        args.output_dir, args.destinations, args.cruises, args.links_per_cruise, args.info_requests, args.seed
+    )
+    summary = {"files": paths, "seconds": round(time.perf_counter() - start, 1)}
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Measures template compile, load and render time per template.
+
+For every template this times compiling it from source, as each new worker does without a
+bytecode cache, and loading its compiled code from the bytecode cache instead. Then it
+requests each page with the page cache off, so every request renders, and records the
+render time of the page's template with the fragment cache off ("none") and warm
+("memory"). Render times are medians over --rounds requests.
+
+Usage (from the repository root, with the POSTGRES_* variables set):
+
+    python benchmarks/template_render.py --rounds 200
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import select
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from flaskapp import create_app, db, models  # noqa: E402
+
+
+def median_ms(samples) -> float:
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def load_times(app, rounds: int) -> dict:
+    """Median seconds to get each template from source and from the bytecode cache, by name."""
+    env = app.jinja_env
+    bytecode_cache = env.bytecode_cache
+    results = {}
+    for name in env.loader.list_templates():
+        timings = {}
+        for mode, cache in (("compile", None), ("bytecode", bytecode_cache)):
+            env.bytecode_cache = cache
+            env.get_template(name)
+            samples = []
+            for _ in range(rounds):
+                env.cache.clear()
+                start = time.perf_counter()
+                env.get_template(name)
+                samples.append(time.perf_counter() - start)
+            timings[mode] = samples
+        env.bytecode_cache = bytecode_cache
+        results[name] = timings
+    return results
+
+
+def render_times(app, paths, rounds: int) -> dict:
+    """Median seconds each page's template took to render, by template name."""
+    samples = {}
+    started = []
+
+    def on_start(sender, template, context, **extra):
+        started.append(time.perf_counter())
+
+    def on_rendered(sender, template, context, **extra):
+        samples.setdefault(template.name, []).append(time.perf_counter() - started.pop())
+
+    before_render_template.connect(on_start, app)
+    template_rendered.connect(on_rendered, app)
+    try:
+        client = app.test_client()
+        for path in paths:
+            client.get(path)  # warms the catalog and fragment caches
+        samples.clear()
+        for _ in range(rounds):
+            for path in paths:
+                response = client.get(path)
+                assert response.status_code == 200, (path, response.status_code)
+    finally:
+        before_render_template.disconnect(on_start, app)
+        template_rendered.disconnect(on_rendered, app)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as bytecode_dir:
+        renders = {}
+        for backend in ("none", "memory"):
+            app = create_app(
+                {
+                    "PAGE_CACHE_ENABLED": False,
+                    "FRAGMENT_CACHE_BACKEND": backend,
+                    "TEMPLATE_BYTECODE_CACHE_DIR": bytecode_dir,
+                    "SERVER_TIMING_HEADER": False,
+                }
+            )
+            with app.app_context():
+                destination = db.session.scalar(select(models.Destination.id).order_by(models.Destination.id))
+                cruise = db.session.scalar(select(models.Cruise.id).order_by(models.Cruise.id))
+            paths = [
+                "/",
+                "/about",
+                "/destinations",
+                f"/destination/{destination}",
+                f"/cruise/{cruise}",
+                "/info_request",
+                "/search?q=mars",
+            ]
+            renders[backend] = render_times(app, paths, args.rounds)
+        loads = load_times(app, args.rounds)
+
+    results = []
+    for name in sorted(loads):
+        result = {
+            "template": name,
+            "compile_ms": median_ms(loads[name]["compile"]),
+            "bytecode_load_ms": median_ms(loads[name]["bytecode"]),
+        }
+        for backend, label in (("none", "render_ms"), ("memory", "render_fragments_cached_ms")):
+            if name in renders[backend]:
+                result[label] = median_ms(renders[backend][name])
+        results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
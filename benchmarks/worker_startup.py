@@ -0,0 +1,103 @@
+"""
+Measures gunicorn startup time and per-worker memory with and without preload_app.
+
+For each mode this starts gunicorn with the real `flaskapp:create_app()`, times how long
+it takes until every worker has finished booting (its post_worker_init log line), then
+reads each worker's RSS and PSS from /proc. PSS splits shared pages between the processes
+sharing them, so it shows what copy-on-write sharing actually saves. Linux only.
+
+Usage (from the repository root, with the POSTGRES_* variables set):
+
+    python benchmarks/worker_startup.py --workers 4
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+BOOTED_MARKER = "Pre-warmed"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid: int):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def memory_kib(pid: int) -> dict:
+    """RSS and PSS of a process in KiB."""
+    result = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss"):
+                result[name.lower()] = int(value.split()[0])
+    return result
+
+
+def run_mode(preload: bool, args) -> dict:
+    env = dict(os.environ, GUNICORN_PRELOAD=str(preload).lower(), GUNICORN_WORKERS=str(args.workers))
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "-c",
+        str(ROOT / "src" / "gunicorn.conf.py"),
+        "--chdir",
+        str(ROOT / "src"),
+        "--bind",
+        f"127.0.0.1:{free_port()}",
+        "flaskapp:create_app()",
+    ]
+    start = time.perf_counter()
+    server = subprocess.Popen(command, env=env, stderr=subprocess.PIPE, text=True)
+    try:
+        booted = 0
+        for line in server.stderr:
+            if BOOTED_MARKER in line:
+                booted += 1
+                if booted == args.workers:
+                    break
+        startup_seconds = time.perf_counter() - start
+        # Let the workers settle before sampling their memory
+        time.sleep(args.settle)
+        workers = [memory_kib(pid) for pid in children(server.pid)]
+        master = memory_kib(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        "preload_app": preload,
+        "workers": len(workers),
+        "startup_seconds": round(startup_seconds, 2),
+        "master_rss_kib": master["rss"],
+        "worker_rss_kib_avg": sum(worker["rss"] for worker in workers) // len(workers),
+        "worker_pss_kib_avg": sum(worker["pss"] for worker in workers) // len(workers),
+        "total_pss_kib": master["pss"] + sum(worker["pss"] for worker in workers),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--settle", type=float, default=2, help="seconds to wait before reading memory")
+    args = parser.parse_args(argv)
+
+    results = [run_mode(preload, args) for preload in (False, True)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
 #!/bin/bash
 set -e
-python3 -m pip install --upgrade pip
-python3 -m pip install -e .
-python3 -m flask --app flaskapp db upgrade --directory flaskapp/migrations
-python3 -m flask --app flaskapp seed --filename="seed_data.json"
+# Reinstall only when the package definition changed since this environment last installed it
+install_stamp="$(python3 -c 'import sys; print(sys.prefix)')/.flaskapp-install.sha256"
+if sha256sum --check --status "$install_stamp" 2>/dev/null; then
+    echo "install: pyproject.toml unchanged, skipped"
+else
+    python3 -m pip install --upgrade pip
+    python3 -m pip install -e .
+    sha256sum pyproject.toml > "$install_stamp" || true
+fi
+# Fails the start if the deploy's postbuild.sh didn't derive every image the templates show
+python3 -m flask --app flaskapp images check
+# Migrates and seeds, skipping whichever is unchanged since the last start, and reports each phase
+python3 -m flask --app flaskapp startup --seed-file seed_data.json
+# Worker class and counts come from gunicorn.conf.py, e.g. GUNICORN_WORKER_CLASS=gevent
 python3 -m gunicorn "flaskapp:create_app()"
@@ -1,26 +1,26 @@
 import os
 
 import click
-from azure.monitor.opentelemetry import configure_azure_monitor
 from flask import Flask
+from flask.cli import with_appcontext
 from flask_migrate import Migrate
+from flask_migrate.cli import db as db_cli_group
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
+from .replicas import RoutingSession
+
 
 class BaseModel(DeclarativeBase):
     pass
 
 
-db = SQLAlchemy(model_class=BaseModel)
+db = SQLAlchemy(model_class=BaseModel, session_options={"class_": RoutingSession})
 migrate = Migrate()
 
 
 def create_app(test_config=None):
     # create and configure the app
-    if os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING"):
-        configure_azure_monitor()
-
     app = Flask(__name__, static_folder="../static", template_folder="../templates")
 
     # Load configuration for prod vs. dev
@@ -36,19 +36,175 @@ def create_app(test_config=None):
 
     app.config.update(SQLALCHEMY_DATABASE_URI=app.config.get("DATABASE_URI"), SQLALCHEMY_TRACK_MODIFICATIONS=False)
 
+    from . import (
+        api,
+        assets,
+        catalog,
+        green,
+        images,
+        ingest,
+        page_cache,
+        pages,
+        pool,
+        replicas,
+        telemetry,
+        templating,
+        timing,
+    )
+
+    telemetry.init_app(app)
+    timing.init_app(app)
+
+    if green.is_monkey_patched():
+        green.patch_psycopg()
+
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", pool.engine_options(app.config))
+    app.config.setdefault("SQLALCHEMY_BINDS", replicas.binds(app.config))
+
     db.init_app(app)
+    replicas.init_app(app)
     migrate.init_app(app, db)
 
-    from . import pages
+    catalog.init_app(app)
+    page_cache.init_app(app)
+    assets.init_app(app)
+    images.init_app(app)
+    templating.init_app(app)
+    ingest.init_app(app)
 
     app.register_blueprint(pages.bp)
+    if app.config.get("METRICS_ENABLED"):
+        from . import metrics
+
+        metrics.init_app(app)
+    api.init_app(app)
 
     @app.cli.command("seed")
     @click.option("--filename", default="seed_data.json")
-    def seed_data(filename):
-        from . import seeder
-
-        seeder.seed_data(db, filename)
-        click.echo("Database seeded!")
+    @click.option("--stream", is_flag=True, help="Read the file incrementally; it may be a JSON array or NDJSON.")
+    @click.option("--batch-size", default=5000, show_default=True, help="Entries written per batch with --stream.")
+    @click.option("--force", is_flag=True, help="Seed even if this file was already seeded.")
+    def seed_data(filename, stream, batch_size, force):
+        from . import startup
+
+        phase = startup.seed(db, filename, force=force, stream=stream, batch_size=batch_size)
+        click.echo(phase)
+        if phase.ran:
+            click.echo("Database seeded!")
+
+    @db_cli_group.command("audit")
+    @with_appcontext
+    def audit_command():
+        """Flags missing or unindexed foreign keys and route queries that need sequential scans."""
+        from . import audit
+
+        findings = audit.audit()
+        for finding in findings:
+            click.echo(finding)
+        if findings:
+            raise SystemExit(1)
+        click.echo("No schema issues found.")
+
+    @app.cli.command("startup")
+    @click.option("--seed-file", default="seed_data.json")
+    @click.option("--directory", default=None, help="Migrations directory; defaults to the one in the package.")
+    @click.option("--force", is_flag=True, help="Migrate and seed even if nothing changed.")
+    def startup_command(seed_file, directory, force):
+        """Applies migrations and seed data, skipping whatever is unchanged since the last start."""
+        from . import startup
+
+        click.echo(startup.run(db, seed_file, directory=directory or startup.MIGRATIONS_DIRECTORY, force=force))
+
+    @app.cli.group("assets")
+    def assets_cli():
+        """Build fingerprinted static assets."""
+
+    @assets_cli.command("build")
+    @click.option("--force", is_flag=True, help="Rebuild even if the static files are unchanged.")
+    def build_assets(force):
+        """Writes content-hashed, precompressed copies of the static files and their manifest."""
+        manifest, built = assets.build(
+            app.static_folder,
+            force=force,
+            gzip_level=app.config["ASSETS_GZIP_LEVEL"],
+            brotli_quality=app.config["ASSETS_BROTLI_QUALITY"],
+        )
+        if not built:
+            click.echo("assets: static files unchanged, skipped")
+            return
+        compressed = sum(1 for asset in manifest.files.values() if asset.encodings)
+        click.echo(f"assets: fingerprinted {len(manifest.files)} files, precompressed {compressed}")
+
+    @app.cli.group("images")
+    def images_cli():
+        """Derive responsive copies of the images in the templates."""
+
+    @images_cli.command("build")
+    @click.option("--force", is_flag=True, help="Encode every image again, even if it is unchanged.")
+    def build_images(force):
+        """Writes resized AVIF, WebP and fallback copies of every image shown with picture()."""
+        manifest, built = images.build(
+            app.static_folder,
+            images.referenced(app),
+            widths=app.config["IMAGE_WIDTHS"],
+            formats=app.config["IMAGE_FORMATS"],
+            force=force,
+        )
+        click.echo(f"images: derived {len(built)} of {len(manifest)} images, {len(manifest) - len(built)} unchanged")
+
+    @images_cli.command("check")
+    def check_images():
+        """Fails if an image shown with picture() has no up-to-date copies."""
+        referenced = images.referenced(app)
+        problems = images.check(
+            app.static_folder, referenced, widths=app.config["IMAGE_WIDTHS"], formats=app.config["IMAGE_FORMATS"]
+        )
+        for filename, problem in problems:
+            click.echo(f"{filename}: {problem} (shown in {', '.join(referenced[filename])})")
+        if problems:
+            click.echo("Run `flask images build` to derive them.")
+            raise SystemExit(1)
+        click.echo(f"All {len(referenced)} images have derivatives.")
+
+    @app.cli.group("info-requests")
+    def info_requests_cli():
+        """Manage stored info requests."""
+
+    @info_requests_cli.command("flush")
+    def flush_info_requests():
+        """Writes every buffered info request to the database now."""
+        queue = ingest.get_queue()
+        if queue is None:
+            click.echo("Info requests are not buffered (INFO_REQUEST_BUFFERED is off).")
+            return
+        written = ingest.drain(queue, app.config["INFO_REQUEST_BATCH_SIZE"])
+        click.echo(f"Wrote {written} info requests; {len(queue)} still queued, {len(queue.failed())} rejected.")
+
+    @info_requests_cli.command("export")
+    @click.option("--output", "output", type=click.File("wb"), default="-", help="File to write; stdout by default.")
+    @click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), help="Defaults to the file's extension.")
+    @click.option("--cruise", "cruise_ids", type=int, multiple=True, help="Only requests for this cruise id.")
+    @click.option("--min-id", type=int, help="Only requests with at least this id.")
+    @click.option("--max-id", type=int, help="Only requests with at most this id.")
+    def export_info_requests(output, fmt, cruise_ids, min_id, max_id):
+        """Streams info requests out with COPY, in id order."""
+        from . import bulk
+
+        fmt = fmt or bulk.format_for(output.name)
+        count = bulk.export_info_requests(db, output, fmt, cruise_ids=cruise_ids, min_id=min_id, max_id=max_id)
+        click.echo(f"Exported {count} info requests.", err=True)
+
+    @info_requests_cli.command("import")
+    @click.argument("source", type=click.File("rb"))
+    @click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), help="Defaults to the file's extension.")
+    def import_info_requests(source, fmt):
+        """Loads info requests from a CSV or NDJSON file with COPY, skipping dedup keys already stored."""
+        from . import bulk
+
+        try:
+            report = bulk.import_info_requests(db, source, fmt or bulk.format_for(source.name))
+        except ValueError as error:
+            raise click.ClickException(str(error))
+        click.echo(report)
 
     return app
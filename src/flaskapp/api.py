@@ -0,0 +1,206 @@
+"""
+Read-only JSON API over the catalog, under /api/v1.
+
+Queries select only the requested columns as plain rows, with the links of a whole page
+fetched in one more statement, so no ORM objects are built. Each response body is encoded
+once per catalog version and stored in the page cache together with its gzip and brotli
+encodings, so a repeated request costs a cache lookup and a conditional-GET check.
+
+    GET /api/v1/destinations?fields=name,cruises&limit=50&after=120
+    GET /api/v1/cruises/3?fields=name,description
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import gzip
+import hashlib
+import json
+from collections.abc import Callable
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, url_for
+from werkzeug.exceptions import HTTPException
+
+from . import catalog, models, queries
+from .page_cache import cache_key
+from .pages import page_args
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Clients that accept brotli get gzip instead
+    brotli = None
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+COLUMNS = ("id", "name", "subtitle", "description")
+
+# The resource name, its model and the resource its rows link to
+_RESOURCES = {
+    "destinations": (models.Destination, "cruises"),
+    "cruises": (models.Cruise, "destinations"),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class EncodedBody:
+    """A JSON body with its precomputed encodings, keyed by Content-Encoding ("identity" for none)."""
+
+    encodings: dict
+    etag: str
+    last_modified: float
+
+
+def init_app(app):
+    # Bodies smaller than this are sent uncompressed: the headers would outweigh the saving
+    app.config.setdefault("API_COMPRESS_MIN_SIZE", 512)
+    app.config.setdefault("API_GZIP_LEVEL", 6)
+    app.config.setdefault("API_BROTLI_QUALITY", 5)
+    app.register_blueprint(bp)
+
+
+@bp.errorhandler(HTTPException)
+def _json_error(error):
+    response = jsonify(error={"status": error.code, "title": error.name, "detail": error.description})
+    response.status_code = error.code
+    return response
+
+
+@bp.get("/destinations")
+def destinations():
+    return _respond(lambda: _collection("destinations"))
+
+
+@bp.get("/destinations/<int:pk>")
+def destination_detail(pk):
+    return _respond(lambda: _item("destinations", pk))
+
+
+@bp.get("/cruises")
+def cruises():
+    return _respond(lambda: _collection("cruises"))
+
+
+@bp.get("/cruises/<int:pk>")
+def cruise_detail(pk):
+    return _respond(lambda: _item("cruises", pk))
+
+
+def fields(resource: str) -> list[str]:
+    """The fields named by ?fields=, or all of them. `id` is always included."""
+    _, related = _RESOURCES[resource]
+    allowed = (*COLUMNS, related)
+    requested = request.args.get("fields")
+    if not requested:
+        return list(allowed)
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}.")
+    return ["id"] + [name for name in allowed if name in names and name != "id"]
+
+
+def _collection(resource: str) -> dict:
+    model, related = _RESOURCES[resource]
+    wanted = fields(resource)
+    args = page_args()
+    rows, has_more = queries.page_rows(model, [name for name in wanted if name in COLUMNS], **args)
+    items = _serialize(model, related, wanted, rows)
+    prev_cursor, next_cursor = _cursors(items, has_more, args["after"], args["before"])
+    return {
+        "data": items,
+        "links": {
+            "prev": _page_url(prev_cursor, "before"),
+            "next": _page_url(next_cursor, "after"),
+        },
+    }
+
+
+def _item(resource: str, pk: int) -> dict:
+    model, related = _RESOURCES[resource]
+    wanted = fields(resource)
+    row = queries.find_row(model, pk, [name for name in wanted if name in COLUMNS])
+    if row is None:
+        abort(404, f"No {resource[:-1]} with id {pk}.")
+    return {"data": _serialize(model, related, wanted, [row])[0]}
+
+
+def _serialize(model, related: str, wanted: list[str], rows) -> list[dict]:
+    items = [row._asdict() for row in rows]
+    if related in wanted and items:
+        links = {item["id"]: [] for item in items}
+        for link in queries.linked_rows(model, list(links)):
+            links[link.owner_id].append({"id": link.id, "name": link.name})
+        for item in items:
+            item[related] = links[item["id"]]
+    return items
+
+
+def _cursors(items, has_more: bool, after: int | None, before: int | None):
+    """The same prev/next cursors as `catalog.Page`."""
+    if not items:
+        return None, None
+    if before is not None:
+        return (items[0]["id"] if has_more else None), items[-1]["id"]
+    return (items[0]["id"] if after is not None else None), (items[-1]["id"] if has_more else None)
+
+
+def _page_url(cursor: int | None, direction: str) -> str | None:
+    if cursor is None:
+        return None
+    args = {name: request.args[name] for name in ("fields", "limit") if request.args.get(name)}
+    return url_for(request.endpoint, **args, **{direction: cursor})
+
+
+def _respond(build: Callable[[], dict]) -> Response:
+    """Serves the body `build` returns from the page cache, in the best encoding the client accepts."""
+    version = catalog.version()
+    page_cache = current_app.extensions["page_cache"]
+    key = "api:" + cache_key(request.endpoint, request.view_args, request.args, version)
+    body = page_cache.get(key) if current_app.config["PAGE_CACHE_ENABLED"] else None
+    if body is None:
+        body = _encode(build(), version)
+        if current_app.config["PAGE_CACHE_ENABLED"]:
+            page_cache.set(key, body)
+
+    encoding = _negotiate(body.encodings)
+    response = Response(body.encodings[encoding], mimetype="application/json")
+    if encoding != "identity":
+        response.content_encoding = encoding
+    response.vary.add("Accept-Encoding")
+    # Each encoding is a different representation, so it needs its own strong validator
+    response.set_etag(body.etag if encoding == "identity" else f"{body.etag}-{encoding}")
+    response.last_modified = body.last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = int(current_app.config["PAGE_CACHE_MAX_AGE"])
+    return response.make_conditional(request)
+
+
+def _encode(document: dict, version: float) -> EncodedBody:
+    raw = dumps(document)
+    encodings = {"identity": raw}
+    if len(raw) >= current_app.config["API_COMPRESS_MIN_SIZE"]:
+        # mtime=0 keeps the gzip bytes, and so their ETag, the same for the same body
+        encodings["gzip"] = gzip.compress(raw, compresslevel=current_app.config["API_GZIP_LEVEL"], mtime=0)
+        if brotli is not None:
+            encodings["br"] = brotli.compress(raw, quality=current_app.config["API_BROTLI_QUALITY"])
+    return EncodedBody(encodings=encodings, etag=hashlib.sha256(raw).hexdigest(), last_modified=version)
+
+
+def _negotiate(encodings: dict) -> str:
+    """The smallest encoding the client accepts, preferring brotli over gzip."""
+    accepted = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in encodings and accepted[encoding]:
+            return encoding
+    return "identity"
+
+
+def dumps(document) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(document)
+    return json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode()
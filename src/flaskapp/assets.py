@@ -0,0 +1,269 @@
+"""
+Fingerprinted, precompressed static assets.
+
+`flask assets build` copies every file under the static folder to `static/build/`, with a
+hash of its contents in the name (`res/css/theme.css` becomes `res/css/theme.<hash>.css`),
+writes gzip and brotli variants of the text files next to it, and records the mapping in
+`static/build/assets.json`. While that manifest exists, `url_for('static', filename=...)`
+links to the fingerprinted copy, and the static route serves it with the variant that
+matches Accept-Encoding and `Cache-Control: immutable`. A changed file gets a new name,
+so browsers and proxies can keep every copy for a year and never revalidate it with a
+request to a worker.
+
+Files that are not in the manifest, such as the ones in `manifest.json` that are linked by
+their plain path, are served as before.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # Only gzip variants are written
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds aren't serialized between processes
+    fcntl = None
+
+BUILD_DIRECTORY = "build"
+MANIFEST_NAME = "assets.json"
+# Held while building, so builds sharing a static folder run one at a time
+LOCK_NAME = BUILD_DIRECTORY + ".lock"
+# Sources that are compiled into other files rather than served
+SKIPPED_DIRECTORIES = ("scss",)
+# Images and fonts are compressed already; a second pass saves next to nothing
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".map", ".json", ".svg", ".txt", ".ico", ".webmanifest")
+ONE_YEAR = 365 * 24 * 60 * 60
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+_SOURCE_MAP = re.compile(r"sourceMappingURL=(\S+?)(\s*\*/)")
+
+
+@dataclasses.dataclass(frozen=True)
+class Asset:
+    path: str
+    encodings: tuple[str, ...] = ()
+
+
+@dataclasses.dataclass
+class Manifest:
+    source: str
+    files: dict[str, Asset]
+
+    def __post_init__(self):
+        self.served = {asset.path: asset for asset in self.files.values()}
+
+
+def init_app(app):
+    app.config.setdefault("ASSETS_BROTLI_QUALITY", 11)
+    app.config.setdefault("ASSETS_GZIP_LEVEL", 9)
+    load(app)
+    app.url_defaults(_fingerprinted)
+    app.view_functions["static"] = serve
+
+
+def load(app) -> Manifest | None:
+    """Reads the manifest from the static folder, if it has been built, and makes it current."""
+    manifest = read_manifest(app.static_folder)
+    app.extensions["assets"] = manifest
+    return manifest
+
+
+def read_manifest(static_folder: str) -> Manifest | None:
+    try:
+        with open(os.path.join(static_folder, BUILD_DIRECTORY, MANIFEST_NAME)) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    files = {name: Asset(entry["path"], tuple(entry["encodings"])) for name, entry in data["files"].items()}
+    return Manifest(source=data["source"], files=files)
+
+
+def build(
+    static_folder: str, force: bool = False, gzip_level: int = 9, brotli_quality: int = 11
+) -> tuple[Manifest, bool]:
+    """Builds the fingerprinted copies and the manifest. Returns (manifest, whether anything was built).
+
+    Nothing is rebuilt when the sources are unchanged since the last build, unless `force`.
+    Run it when deploying, not when the app starts: instances that share the static folder
+    would replace the build while the others serve it.
+    """
+    with _build_lock(static_folder):
+        sources = _sources(static_folder)
+        source_hash = _hash_sources(static_folder, sources)
+        previous = read_manifest(static_folder)
+        if previous is not None and previous.source == source_hash and not force:
+            return previous, False
+        return _build(static_folder, sources, source_hash, gzip_level, brotli_quality), True
+
+
+@contextlib.contextmanager
+def _build_lock(static_folder: str):
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(static_folder, LOCK_NAME), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _build(static_folder: str, sources: list[str], source_hash: str, gzip_level: int, brotli_quality: int) -> Manifest:
+    build_folder = os.path.join(static_folder, BUILD_DIRECTORY)
+    staging = f"{build_folder}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    files = {}
+    # Stylesheets last, so the files they reference already have their fingerprinted names
+    for name in sorted(sources, key=lambda name: (name.endswith(".css"), name)):
+        with open(os.path.join(static_folder, name), "rb") as f:
+            content = f.read()
+        if name.endswith(".css"):
+            content = _rewrite_css(name, content, files)
+        path = posixpath.join(BUILD_DIRECTORY, _fingerprint_name(name, content))
+        target = os.path.join(staging, os.path.relpath(path, BUILD_DIRECTORY))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(content)
+        encodings = []
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            variants = [("gzip", ".gz", gzip.compress(content, gzip_level, mtime=0))]
+            if brotli is not None:
+                variants.insert(0, ("br", ".br", brotli.compress(content, quality=brotli_quality)))
+            for encoding, suffix, compressed in variants:
+                # A variant that isn't smaller would only cost a lookup
+                if len(compressed) < len(content):
+                    with open(target + suffix, "wb") as f:
+                        f.write(compressed)
+                    encodings.append(encoding)
+        files[name] = Asset(path, tuple(encodings))
+
+    manifest = Manifest(source=source_hash, files=files)
+    with open(os.path.join(staging, MANIFEST_NAME), "w") as f:
+        json.dump(
+            {
+                "source": source_hash,
+                "files": {name: {"path": a.path, "encodings": list(a.encodings)} for name, a in files.items()},
+            },
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+    # Swapped in whole, so a worker never reads a manifest whose files are still being written.
+    # The old build is moved aside rather than deleted in place, leaving no half-deleted tree.
+    retired = f"{build_folder}.old-{os.getpid()}"
+    shutil.rmtree(retired, ignore_errors=True)
+    if os.path.isdir(build_folder):
+        os.rename(build_folder, retired)
+    os.rename(staging, build_folder)
+    shutil.rmtree(retired, ignore_errors=True)
+    return manifest
+
+
+def serve(filename: str):
+    """The static view: fingerprinted files from the manifest, anything else as Flask would."""
+    manifest = current_app.extensions.get("assets")
+    asset = manifest.served.get(filename) if manifest is not None else None
+    if asset is None:
+        return current_app.send_static_file(filename)
+
+    encoding = _negotiate(asset.encodings)
+    suffix = {"br": ".br", "gzip": ".gz"}.get(encoding, "")
+    response = send_from_directory(
+        current_app.static_folder,
+        filename + suffix,
+        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        max_age=ONE_YEAR,
+    )
+    if encoding:
+        response.content_encoding = encoding
+    if asset.encodings:
+        response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def _fingerprinted(endpoint, values):
+    if endpoint != "static":
+        return
+    manifest = current_app.extensions.get("assets")
+    asset = manifest.files.get(values.get("filename")) if manifest is not None else None
+    if asset is not None:
+        values["filename"] = asset.path
+
+
+def _negotiate(encodings) -> str | None:
+    accepted = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in encodings and accepted[encoding]:
+            return encoding
+    return None
+
+
+def _sources(static_folder: str) -> list[str]:
+    names = []
+    for directory, subdirectories, filenames in os.walk(static_folder):
+        relative = os.path.relpath(directory, static_folder)
+        if relative == ".":
+            # The build, its lock, and the staging and retired copies of a build
+            subdirectories[:] = [d for d in subdirectories if not _is_build_output(d)]
+            filenames = [f for f in filenames if not _is_build_output(f)]
+        subdirectories[:] = [d for d in subdirectories if d not in SKIPPED_DIRECTORIES]
+        for filename in filenames:
+            names.append(posixpath.normpath(posixpath.join(relative.replace(os.sep, "/"), filename)))
+    return sorted(names)
+
+
+def _is_build_output(name: str) -> bool:
+    return name == BUILD_DIRECTORY or name.startswith(BUILD_DIRECTORY + ".")
+
+
+def _hash_sources(static_folder: str, names: list[str]) -> str:
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(name.encode())
+        with open(os.path.join(static_folder, name), "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _fingerprint_name(name: str, content: bytes) -> str:
+    # The hash goes before the first extension, so theme.css.map becomes theme.<hash>.css.map
+    directory, filename = posixpath.split(name)
+    stem, dot, extensions = filename.partition(".")
+    fingerprint = hashlib.sha256(content).hexdigest()[:12]
+    return posixpath.join(directory, f"{stem}.{fingerprint}{dot}{extensions}")
+
+
+def _rewrite_css(name: str, content: bytes, files: dict[str, Asset]) -> bytes:
+    """Points relative url() and sourceMappingURL references at their fingerprinted copies."""
+    directory = posixpath.dirname(name)
+    css_path = posixpath.dirname(posixpath.join(BUILD_DIRECTORY, name))
+
+    def replace(reference: str) -> str:
+        path, _, suffix = reference.partition("?")
+        asset = files.get(posixpath.normpath(posixpath.join(directory, path)))
+        if asset is None or "//" in path or path.startswith(("data:", "/", "#")):
+            return reference
+        return posixpath.relpath(asset.path, css_path) + (f"?{suffix}" if suffix else "")
+
+    text = content.decode("utf-8")
+    text = _CSS_URL.sub(lambda m: f"url({m.group(1)}{replace(m.group(2))}{m.group(1)})", text)
+    text = _SOURCE_MAP.sub(lambda m: f"sourceMappingURL={replace(m.group(1))}{m.group(2)}", text)
+    return text.encode("utf-8")
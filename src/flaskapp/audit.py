@@ -0,0 +1,154 @@
+"""
+Schema audit: compares the models with the live database and checks the routes' query plans.
+
+Reports foreign keys declared on the models but missing from the database, foreign keys
+whose columns do not lead any index (so lookups and cascades on them scan the table),
+foreign keys added NOT VALID and never validated (so rows stored before may break them),
+and filtered route queries that Postgres can only answer by reading a whole table.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import re
+from collections.abc import Callable, Sequence
+
+from sqlalchemy import event, inspect, text
+
+from . import db, models, queries
+
+
+@dataclasses.dataclass(frozen=True)
+class Finding:
+    kind: str
+    table: str
+    detail: str
+
+    def __str__(self):
+        return f"[{self.kind}] {self.table}: {self.detail}"
+
+
+def route_queries(pk: int = 1) -> list[tuple[str, Callable[[], object]]]:
+    """The queries the page and API routes run, as (name, call) pairs.
+
+    Pages are fetched past a cursor, so the keyset filter is in the plan.
+    """
+    return [
+        ("page_destinations", lambda: queries.page_destinations(after=pk)),
+        ("page_cruises", lambda: queries.page_cruises(after=pk, search="sun")),
+        ("search_catalog", lambda: queries.search_catalog("sun")),
+        ("find_destination_detail", lambda: queries.find_destination_detail(pk)),
+        ("find_cruise_detail", lambda: queries.find_cruise_detail(pk)),
+        ("page_rows", lambda: queries.page_rows(models.Destination, ["id", "name"], after=pk)),
+        ("find_row", lambda: queries.find_row(models.Cruise, pk, ["id", "name"])),
+        ("linked_rows", lambda: queries.linked_rows(models.Destination, [pk])),
+        ("linked_rows", lambda: queries.linked_rows(models.Cruise, [pk])),
+    ]
+
+
+def audit(metadata=None, checked_queries: Sequence[tuple[str, Callable[[], object]]] = None) -> list[Finding]:
+    """Runs every check against the current app's database."""
+    metadata = metadata if metadata is not None else db.metadata
+    findings = check_foreign_keys(metadata, inspect(db.engine))
+    if db.engine.dialect.name == "postgresql":
+        findings += check_unvalidated_constraints()
+        findings += check_query_plans(checked_queries if checked_queries is not None else route_queries())
+    return findings
+
+
+def check_foreign_keys(metadata, inspector) -> list[Finding]:
+    findings = []
+    existing_tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            findings.append(Finding("missing-table", table.name, "declared on the models but not in the database"))
+            continue
+        declared = {tuple(inspected["constrained_columns"]) for inspected in inspector.get_foreign_keys(table.name)}
+        # Any index or the primary key serves lookups on its leading columns
+        indexed = [tuple(index["column_names"]) for index in inspector.get_indexes(table.name)]
+        indexed.append(tuple(inspector.get_pk_constraint(table.name)["constrained_columns"]))
+        for constraint in table.foreign_key_constraints:
+            columns = tuple(column.name for column in constraint.columns)
+            references = constraint.referred_table.name
+            if columns not in declared:
+                findings.append(
+                    Finding("missing-foreign-key", table.name, f"{', '.join(columns)} -> {references} is not enforced")
+                )
+            if not any(index[: len(columns)] == columns for index in indexed):
+                detail = f"no index leads with {', '.join(columns)}"
+                findings.append(Finding("unindexed-foreign-key", table.name, detail))
+    return findings
+
+
+def check_unvalidated_constraints() -> list[Finding]:
+    """Foreign keys that Postgres enforces on new rows only, because they were never validated."""
+    rows = db.session.execute(
+        text(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint"
+            " WHERE contype = 'f' AND NOT convalidated AND connamespace = 'public'::regnamespace"
+        )
+    ).all()
+    return [
+        Finding("unvalidated-foreign-key", table, f"{name} is NOT VALID; existing rows were never checked")
+        for table, name in rows
+    ]
+
+
+def check_query_plans(checked_queries: Sequence[tuple[str, Callable[[], object]]]) -> list[Finding]:
+    """EXPLAINs every filtered statement the given queries send, flagging full table reads.
+
+    Sequential scans are disabled while planning, so Postgres uses an index wherever one
+    can answer the query. What remains is flagged: a sequential scan, or an index scan that
+    reads the whole index and filters the rows afterwards, unless an index leads with a
+    column of that filter (then reading everything is the planner's choice for a small
+    table, not a missing index). Unfiltered full index scans that drive a join are also a
+    small-table planner choice and are not flagged. Statements without a WHERE clause list
+    whole tables by design and are skipped.
+    """
+    inspector = inspect(db.engine)
+    leading_columns = {}
+    for table in inspector.get_table_names():
+        leading_columns[table] = {index["column_names"][0] for index in inspector.get_indexes(table)}
+        leading_columns[table].update(inspector.get_pk_constraint(table)["constrained_columns"][:1])
+
+    findings = []
+    for name, run_query in checked_queries:
+        for statement, parameters in _captured_statements(run_query):
+            if "WHERE" not in statement:
+                continue
+            connection = db.session.connection()
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+            plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+            for table, node_type, filtered in _full_scans(plan[0]["Plan"]):
+                if filtered & leading_columns.get(table, set()):
+                    continue
+                findings.append(Finding("full-scan", table, f"{name} reads every row ({node_type})"))
+        db.session.rollback()
+    return findings
+
+
+def _captured_statements(run_query) -> list[tuple[str, object]]:
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    connection = db.session.connection()
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        run_query()
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+    return captured
+
+
+def _full_scans(node) -> list[tuple[str, str, set[str]]]:
+    """(table, node type, words in the filter) for each node of the plan that reads a whole table."""
+    node_type = node["Node Type"]
+    is_full = node_type == "Seq Scan" or (
+        node_type in ("Index Scan", "Index Only Scan") and "Index Cond" not in node and "Filter" in node
+    )
+    scans = [(node["Relation Name"], node_type, set(re.findall(r"\w+", node.get("Filter", ""))))] if is_full else []
+    for child in node.get("Plans", []):
+        scans += _full_scans(child)
+    return scans
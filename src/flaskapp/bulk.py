@@ -0,0 +1,189 @@
+"""
+Bulk export and import of info requests with PostgreSQL COPY.
+
+Rows stream between the file and the server through psycopg2's `copy_expert` in small
+buffers, so memory stays flat however many rows there are, and no ORM objects are built.
+Both CSV (with a header row) and newline-delimited JSON are supported.
+
+An import is first copied into a temporary staging table, then moved into info_request
+with one INSERT ... SELECT. That statement skips rows whose dedup_key is already stored,
+so importing the same file twice adds nothing. Rows without a dedup_key, such as a
+backfill from another system, get one derived from their contents, so identical rows in
+a file are stored once. Every stored request has a key (see migration e8b3d5a1f7c2), so
+exports always carry them. The statement also rejects rows that reference an unknown
+cruise or don't fit the columns, instead of failing the whole import.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import csv
+import dataclasses
+import io
+import time
+from collections.abc import Iterable
+from typing import BinaryIO
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from . import models
+
+FORMATS = ("csv", "ndjson")
+
+COLUMNS = ("id", "name", "email", "notes", "cruise_id", "dedup_key")
+REQUIRED_COLUMNS = ("name", "email", "notes", "cruise_id")
+
+# COPY's CSV format with quote and delimiter characters that can't occur unescaped in JSON,
+# so each line of JSON passes through verbatim as a single field
+_JSON_LINES = "FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02'"
+
+# Staged as text, so a cruise_id that isn't a whole number is read as NULL (and so rejected)
+# rather than failing the whole COPY
+_CRUISE_ID = "CASE WHEN fields.cruise_id ~ '^[0-9]{1,18}$' THEN fields.cruise_id::bigint END AS cruise_id"
+
+_CSV_ROWS = (
+    f"(SELECT fields.name, fields.email, fields.notes, fields.dedup_key, {_CRUISE_ID} "
+    "FROM info_request_import AS fields)"
+)
+
+# Each staged line parsed once
+_NDJSON_ROWS = (
+    f"(SELECT fields.name, fields.email, fields.notes, fields.dedup_key, {_CRUISE_ID} "
+    "FROM info_request_import, json_to_record(info_request_import.doc::json) "
+    "AS fields(name text, email text, notes text, cruise_id text, dedup_key text))"
+)
+
+_VALID = " AND ".join(
+    [f"staged.{name} IS NOT NULL AND length(staged.{name}) <= 255" for name in ("name", "email", "notes")]
+    + ["(staged.dedup_key IS NULL OR length(staged.dedup_key) <= 64)"]
+)
+
+# The key of a row that has none: a digest of the fields that make up the request
+_DEDUP_KEY = (
+    "coalesce(nullif(staged.dedup_key, ''), 'import-' || md5(concat_ws(E'\\x1f', "
+    "staged.name, staged.email, staged.notes, staged.cruise_id::text)))"
+)
+
+
+@dataclasses.dataclass
+class ImportReport:
+    read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+
+    def __str__(self):
+        return (
+            f"Read {self.read} rows: inserted {self.inserted}, skipped {self.duplicates} already stored, "
+            f"rejected {self.rejected} invalid in {self.seconds:.2f}s"
+        )
+
+
+def format_for(filename: str, default: str = "csv") -> str:
+    """The format implied by the file's extension."""
+    if filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if filename.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def export_info_requests(
+    db,
+    out: BinaryIO,
+    fmt: str = "csv",
+    cruise_ids: Iterable[int] | None = None,
+    min_id: int | None = None,
+    max_id: int | None = None,
+) -> int:
+    """Writes info requests to `out` in id order, optionally filtered. Returns how many were written."""
+    table = models.InfoRequest.__table__
+    query = select(*(table.c[name] for name in COLUMNS)).order_by(table.c.id)
+    if cruise_ids:
+        query = query.where(table.c.cruise_id.in_(list(cruise_ids)))
+    if min_id is not None:
+        query = query.where(table.c.id >= min_id)
+    if max_id is not None:
+        query = query.where(table.c.id <= max_id)
+    # COPY doesn't take bind parameters; the filters are integers, so inlining them is safe
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    if fmt == "csv":
+        copy = f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    elif fmt == "ndjson":
+        copy = f"COPY (SELECT row_to_json(rows) FROM ({sql}) AS rows) TO STDOUT WITH ({_JSON_LINES})"
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    with _raw_cursor(db) as cursor:
+        cursor.copy_expert(copy, out)
+        return cursor.rowcount
+
+
+def import_info_requests(db, source: BinaryIO, fmt: str = "csv") -> ImportReport:
+    """Adds the info requests in `source` and commits. Ids in the file are ignored; new ones are assigned."""
+    started = time.perf_counter()
+    report = ImportReport()
+    with _raw_cursor(db) as cursor:
+        if fmt == "csv":
+            columns = _csv_columns(source.readline())
+            cursor.execute(
+                "CREATE TEMPORARY TABLE info_request_import "
+                "(id text, name text, email text, notes text, cruise_id text, dedup_key text) ON COMMIT DROP"
+            )
+            cursor.copy_expert(f"COPY info_request_import ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", source)
+            staged = _CSV_ROWS
+        elif fmt == "ndjson":
+            cursor.execute("CREATE TEMPORARY TABLE info_request_import (doc text) ON COMMIT DROP")
+            cursor.copy_expert(f"COPY info_request_import (doc) FROM STDIN WITH ({_JSON_LINES})", source)
+            staged = _NDJSON_ROWS
+        else:
+            raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+        report.read = cursor.rowcount
+
+        # One pass over the staged rows counts the valid ones and inserts them. DO NOTHING also
+        # skips repeats of a dedup_key within the file, not only keys already stored.
+        cursor.execute(
+            "WITH valid AS MATERIALIZED ("
+            f"SELECT staged.name, staged.email, staged.notes, staged.cruise_id, {_DEDUP_KEY} "
+            f"FROM {staged} AS staged JOIN cruise ON cruise.id = staged.cruise_id WHERE {_VALID}), "
+            "inserted AS (INSERT INTO info_request (name, email, notes, cruise_id, dedup_key) "
+            "SELECT * FROM valid ON CONFLICT (dedup_key) DO NOTHING RETURNING 1) "
+            "SELECT (SELECT count(*) FROM valid), (SELECT count(*) FROM inserted)"
+        )
+        valid, report.inserted = cursor.fetchone()
+        # ON COMMIT DROP alone would leave it behind when the session's transaction is a savepoint
+        cursor.execute("DROP TABLE info_request_import")
+    db.session.commit()
+    report.duplicates = valid - report.inserted
+    report.rejected = report.read - valid
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _csv_columns(header: bytes):
+    columns = next(csv.reader(io.StringIO(header.decode("utf-8-sig"))), [])
+    unknown = [name for name in columns if name not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns {', '.join(unknown)}; expected {', '.join(COLUMNS)}")
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Missing columns {', '.join(missing)}")
+    return columns
+
+
+@contextlib.contextmanager
+def _raw_cursor(db):
+    """A psycopg2 cursor on the session's connection, so COPY runs in the session's transaction."""
+    connection = db.session.connection()
+    if connection.dialect.name != "postgresql":
+        raise ValueError("Bulk import and export use COPY, which needs PostgreSQL")
+    cursor = connection.connection.cursor()
+    try:
+        yield cursor
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        cursor.close()
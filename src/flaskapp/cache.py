@@ -0,0 +1,377 @@
+"""
+Cache backends.
+
+All backends share the same interface and single-flight `get_or_set`, so callers can
+switch between a per-process cache, a file store shared by every worker on the host,
+and a Redis server shared by every host.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import hashlib
+import math
+import os
+import pickle
+import stat
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # Windows: file locks are per process only
+    fcntl = None
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> dict:
+        return dataclasses.asdict(self)
+
+
+class CacheBackend:
+    """Base class for caches keyed by strings.
+
+    Subclasses implement `_get`, `_set`, `_clear` and optionally `_process_lock`, the lock
+    shared with other processes that `get_or_set` holds while it recomputes a value.
+    `_set` is given the entry's time to live, which is infinite for entries that are kept
+    until they are evicted or cleared.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._thread_locks = [threading.Lock() for _ in range(64)]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._get(key)
+        if value is _MISSING:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """Stores `value` for `ttl` seconds, the cache's TTL by default; `math.inf` never expires it."""
+        self._set(key, value, self.ttl if ttl is None else ttl)
+
+    def clear(self) -> None:
+        self._clear()
+        self.stats.invalidations += 1
+
+    def get_or_set(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Returns the cached value for `key`, calling `factory` to fill it on a miss.
+
+        Only one caller per key runs `factory` at a time; concurrent callers wait for it
+        and then read its result, so a cold cache does not fan out identical queries.
+        `None` results are not cached, so a missing row is looked up again next time.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self.lock(key):
+            value = self._get(key)
+            if value is _MISSING:
+                value = factory()
+                if value is not None:
+                    self._set(key, value, self.ttl)
+        return value
+
+    @contextlib.contextmanager
+    def lock(self, key: str):
+        """Holds the recompute lock for `key` across threads and, if supported, processes."""
+        with self._thread_locks[hash(key) % len(self._thread_locks)]:
+            with self._process_lock(key):
+                yield
+
+    def _process_lock(self, key: str):
+        return contextlib.nullcontext()
+
+    def _get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def _clear(self) -> None:
+        raise NotImplementedError
+
+
+class TTLCache(CacheBackend):
+    """In-process LRU cache whose entries also expire `ttl` seconds after they are stored.
+
+    The cache never holds more than `maxsize` entries; storing past that evicts the
+    least recently used one.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, clock: Callable[[], float] = time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        super().__init__(ttl=ttl)
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self._get(key) is not _MISSING
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.stats.expirations += 1
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def _clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class NullCache(CacheBackend):
+    """Cache that stores nothing, for turning caching off without changing callers."""
+
+    def get_or_set(self, key, factory):
+        self.stats.misses += 1
+        return factory()
+
+    def _get(self, key):
+        return _MISSING
+
+    def _set(self, key, value, ttl):
+        pass
+
+    def _clear(self):
+        pass
+
+
+class FileCache(CacheBackend):
+    """Cache stored as one file per key in a directory shared by every process on the host.
+
+    Point `directory` at a tmpfs such as /dev/shm to keep entries in shared memory.
+    Entries are pickled, so the directory must only be writable by the app.
+    A hit refreshes the file's mtime and storing past `maxsize` entries removes the
+    least recently used files.
+    """
+
+    _HEADER = struct.Struct("!d")
+    # Keys share a fixed set of lock files, so the directory doesn't fill with one per key
+    _LOCK_STRIPES = 64
+
+    def __init__(self, directory: str, maxsize: int = 1024, ttl: float = 300, clock: Callable[[], float] = time.time):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        super().__init__(ttl=ttl)
+        self.directory = directory
+        self.maxsize = maxsize
+        self._clock = clock
+        private_directory(directory)
+
+    def __len__(self):
+        return len(self._entry_paths())
+
+    def __contains__(self, key):
+        return self._get(key) is not _MISSING
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ".entry")
+
+    def _entry_paths(self):
+        return [entry.path for entry in os.scandir(self.directory) if entry.name.endswith(".entry")]
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return _MISSING
+        (expires_at,) = self._HEADER.unpack_from(data)
+        if expires_at <= self._clock():
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            self.stats.expirations += 1
+            return _MISSING
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+        return pickle.loads(data[self._HEADER.size :])
+
+    def _set(self, key, value, ttl):
+        data = self._HEADER.pack(self._clock() + ttl) + pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        paths = self._entry_paths()
+        if len(paths) <= self.maxsize:
+            return
+        by_age = sorted(paths, key=_mtime_or_zero)
+        for path in by_age[: len(paths) - self.maxsize]:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+                self.stats.evictions += 1
+
+    def _clear(self):
+        for path in self._entry_paths():
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+
+    @contextlib.contextmanager
+    def _process_lock(self, key):
+        if fcntl is None:
+            yield
+            return
+        # Striped by a stable digest: hash() differs between processes
+        stripe = int(hashlib.sha1(key.encode()).hexdigest(), 16) % self._LOCK_STRIPES
+        with open(os.path.join(self.directory, f"stripe-{stripe:02d}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class RedisCache(CacheBackend):
+    """Cache stored in a Redis (or Redis-protocol compatible) server shared by every process.
+
+    Keys are namespaced by `prefix` and expire through Redis TTLs; size limits are left to
+    the server's `maxmemory-policy`. Entries are pickled, so the server must be trusted.
+    """
+
+    def __init__(
+        self, client, prefix: str = "cache", ttl: float = 300, lock_timeout: float = 30, poll_interval: float = 0.05
+    ):
+        super().__init__(ttl=ttl)
+        self.client = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> RedisCache:
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("The redis cache backend requires the 'redis' package") from exc
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def _get(self, key):
+        data = self.client.get(self._key(key))
+        if data is None:
+            return _MISSING
+        return pickle.loads(data)
+
+    def _set(self, key, value, ttl):
+        expires = None if math.isinf(ttl) else int(ttl * 1000)
+        self.client.set(self._key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), px=expires)
+
+    def _clear(self):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}:*"))
+        if keys:
+            self.client.delete(*keys)
+
+    @contextlib.contextmanager
+    def _process_lock(self, key):
+        lock_key = f"{self.prefix}-lock:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        acquired = False
+        while True:
+            acquired = self.client.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000))
+            # Give up waiting after the lock timeout: a crashed holder must not block readers forever.
+            if acquired or time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+        try:
+            yield
+        finally:
+            if acquired and self.client.get(lock_key) == token.encode():
+                self.client.delete(lock_key)
+
+
+def from_config(config, prefix: str) -> CacheBackend:
+    """Builds the backend named by `<PREFIX>_CACHE_BACKEND` ("memory", "file", "redis" or "none")."""
+    name = prefix.upper()
+    backend = config.get(f"{name}_CACHE_BACKEND", "memory")
+    ttl = float(config.get(f"{name}_CACHE_TTL", 300))
+    maxsize = int(config.get(f"{name}_CACHE_MAXSIZE", 1024))
+    if backend == "memory":
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if backend == "none":
+        return NullCache(ttl=ttl)
+    if backend == "file":
+        directory = config.get(f"{name}_CACHE_DIR") or os.path.join(_default_cache_root(), prefix)
+        return FileCache(directory, maxsize=maxsize, ttl=ttl)
+    if backend == "redis":
+        return RedisCache.from_url(config[f"{name}_CACHE_URL"], prefix=prefix, ttl=ttl)
+    raise ValueError(f"Unknown cache backend {backend!r}")
+
+
+def private_directory(directory: str) -> str:
+    """Creates `directory` if need be, and checks that only this user can write to it.
+
+    Cache directories hold pickles and compiled code that the app loads, so one that another
+    user created first, or can write to, would let them run code as the app.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):  # Windows: no owner or mode bits to check
+        return directory
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise RuntimeError(f"Cache directory {directory} is not a directory owned by the current user")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise RuntimeError(f"Cache directory {directory} is writable by other users")
+    return directory
+
+
+def _default_cache_root() -> str:
+    # One per user, as /dev/shm and the temporary directory are shared by every user on the host
+    name = f"flaskapp-cache-{os.getuid()}" if hasattr(os, "getuid") else "flaskapp-cache"
+    parent = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return private_directory(os.path.join(parent, name))
+
+
+def _mtime_or_zero(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+_MISSING = object()
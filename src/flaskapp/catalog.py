@@ -0,0 +1,223 @@
+"""
+Read-through cache of the destination and cruise catalog.
+
+Views read immutable snapshots instead of ORM objects, so a cached page never
+touches the database session. Snapshots are plain picklable values, so any
+`cache` backend can hold them, including ones shared by all gunicorn workers.
+The cache is cleared whenever a session commits a change to a Destination or Cruise.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import math
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import cache, models, queries
+
+
+@dataclasses.dataclass(frozen=True)
+class CruiseSnapshot:
+    id: int
+    name: str
+    subtitle: str | None = None
+    description: str | None = None
+    destinations: tuple[DestinationSnapshot, ...] = ()
+
+    def __str__(self):
+        return self.name
+
+
+@dataclasses.dataclass(frozen=True)
+class DestinationSnapshot:
+    id: int
+    name: str
+    subtitle: str | None = None
+    description: str | None = None
+    cruises: tuple[CruiseSnapshot, ...] = ()
+
+    def __str__(self):
+        return self.name
+
+
+@dataclasses.dataclass(frozen=True)
+class Page:
+    """One page of a keyset-paginated listing.
+
+    The cursors are the ids to pass as `before` and `after` to reach the neighbouring
+    pages, or None at either end.
+    """
+
+    items: tuple
+    prev_cursor: int | None = None
+    next_cursor: int | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class SearchResult:
+    kind: str
+    id: int
+    name: str
+    subtitle: str | None
+    rank: float
+
+    def __str__(self):
+        return self.name
+
+
+def init_app(app):
+    app.config.setdefault("CATALOG_PAGE_SIZE", 25)
+    app.config.setdefault("CATALOG_MAX_PAGE_SIZE", 100)
+    app.config.setdefault("CATALOG_SEARCH_CANDIDATES", 1000)
+    app.extensions["catalog_cache"] = cache.from_config(app.config, prefix="catalog")
+
+
+def get_cache() -> cache.CacheBackend:
+    return current_app.extensions["catalog_cache"]
+
+
+def invalidate() -> None:
+    """Drops every cached snapshot for the current app, bumps the catalog version and records
+    when the catalog changed."""
+    catalog_cache = get_cache()
+    catalog_cache.clear()
+    now = time.time()
+    catalog_cache.set("changed_at", now, ttl=math.inf)
+    catalog_cache.set("version", now)
+
+
+def changed_at() -> float | None:
+    """The time of the last invalidation, or None when this cache hasn't seen one.
+
+    Unlike the version, it is never recreated by a read, so it only moves when the catalog changes.
+    """
+    return get_cache().get("changed_at")
+
+
+def version() -> float:
+    """The catalog version: the time of the last invalidation, or of the first read after it.
+
+    Caches derived from the catalog include it in their keys so they are invalidated with it.
+    """
+    return get_cache().get_or_set("version", time.time)
+
+
+def stats() -> dict:
+    """Hit, miss, eviction, expiration and invalidation counters for the current app."""
+    return get_cache().stats.as_dict()
+
+
+def destinations_page(after: int | None = None, before: int | None = None, limit: int = 25) -> Page:
+    key = f"destinations:after={after}:before={before}:limit={limit}"
+    return get_cache().get_or_set(
+        key, lambda: _load_page(queries.page_destinations, DestinationSnapshot, after, before, limit)
+    )
+
+
+def cruises_page(
+    after: int | None = None, before: int | None = None, limit: int = 25, search: str | None = None
+) -> Page:
+    key = f"cruises:after={after}:before={before}:limit={limit}:search={search!r}"
+    return get_cache().get_or_set(
+        key, lambda: _load_page(queries.page_cruises, CruiseSnapshot, after, before, limit, search=search)
+    )
+
+
+def search(term: str, limit: int = 25) -> tuple[SearchResult, ...]:
+    words = queries.search_words(term)
+    key = f"search:{' '.join(words)}:limit={limit}"
+    return get_cache().get_or_set(key, lambda: _load_search(term, limit))
+
+
+def destination(pk) -> DestinationSnapshot | None:
+    pk = _parse_pk(pk)
+    if pk is None:
+        return None
+    return get_cache().get_or_set(f"destination:{pk}", lambda: _load_destination(pk))
+
+
+def cruise(pk) -> CruiseSnapshot | None:
+    pk = _parse_pk(pk)
+    if pk is None:
+        return None
+    return get_cache().get_or_set(f"cruise:{pk}", lambda: _load_cruise(pk))
+
+
+def _parse_pk(pk) -> int | None:
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+def _load_page(query, snapshot, after, before, limit, **filters):
+    rows, has_more = query(after=after, before=before, limit=limit, **filters)
+    items = tuple(snapshot(id=row.id, name=row.name) for row in rows)
+    if not items:
+        return Page(items=items)
+    if before is not None:
+        # Paging back: more rows means an earlier page, and the page we came from follows
+        return Page(items, prev_cursor=items[0].id if has_more else None, next_cursor=items[-1].id)
+    return Page(
+        items,
+        prev_cursor=items[0].id if after is not None else None,
+        next_cursor=items[-1].id if has_more else None,
+    )
+
+
+def _load_search(term, limit):
+    rows = queries.search_catalog(term, limit, candidates=current_app.config["CATALOG_SEARCH_CANDIDATES"])
+    return tuple(SearchResult(**row._mapping) for row in rows)
+
+
+def _load_destination(pk):
+    row = queries.find_destination_detail(pk)
+    if row is None:
+        return None
+    return DestinationSnapshot(
+        id=row.id,
+        name=row.name,
+        subtitle=row.subtitle,
+        description=row.description,
+        cruises=tuple(CruiseSnapshot(id=cruise.id, name=cruise.name) for cruise in row.cruises),
+    )
+
+
+def _load_cruise(pk):
+    row = queries.find_cruise_detail(pk)
+    if row is None:
+        return None
+    return CruiseSnapshot(
+        id=row.id,
+        name=row.name,
+        subtitle=row.subtitle,
+        description=row.description,
+        destinations=tuple(DestinationSnapshot(id=dest.id, name=dest.name) for dest in row.destinations),
+    )
+
+
+_CATALOG_MODELS = (models.Destination, models.Cruise)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_catalog_writes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _CATALOG_MODELS):
+            session.info["catalog_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("catalog_changed", False) and has_app_context():
+        if "catalog_cache" in current_app.extensions:
+            invalidate()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_writes(session, previous_transaction):
+    session.info.pop("catalog_changed", None)
@@ -14,3 +14,102 @@ dbport = os.environ.get("POSTGRES_PORT", 5432)
 DATABASE_URI = f"postgresql+psycopg2://{dbuser}:{dbpass}@{dbhost}:{dbport}/{dbname}"
 
 TIME_ZONE = "UTC"
+
+# Connection pool, per gunicorn worker. Keep workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# below the server's max_connections. DB_POOL_MODE=null disables pooling for PgBouncer.
+DB_POOL_MODE = os.environ.get("DB_POOL_MODE", "queue")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RESET_ON_RETURN = os.environ.get("DB_POOL_RESET_ON_RETURN", "rollback")
+DB_POOL_PREWARM = int(os.environ.get("DB_POOL_PREWARM", 0))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 0))
+
+# Read replicas for the catalog pages: comma-separated hosts that share the primary's credentials.
+# Reads fall back to the primary when a replica is unreachable or more than REPLICA_MAX_LAG_SECONDS behind.
+DATABASE_REPLICA_URIS = [
+    f"postgresql+psycopg2://{dbuser}:{dbpass}@{host.strip()}:{dbport}/{dbname}"
+    for host in os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", 10))
+REPLICA_CHECK_SECONDS = float(os.environ.get("REPLICA_CHECK_SECONDS", 5))
+REPLICA_RETRY_SECONDS = float(os.environ.get("REPLICA_RETRY_SECONDS", 30))
+REPLICA_CONNECT_TIMEOUT = int(os.environ.get("REPLICA_CONNECT_TIMEOUT", 2))
+
+# "memory" (per worker), "file" (shared by the workers on a host), "redis" (shared by all hosts) or "none"
+CATALOG_CACHE_BACKEND = os.environ.get("CATALOG_CACHE_BACKEND", "memory")
+CATALOG_CACHE_DIR = os.environ.get("CATALOG_CACHE_DIR")
+CATALOG_CACHE_URL = os.environ.get("CATALOG_CACHE_URL")
+CATALOG_CACHE_TTL = int(os.environ.get("CATALOG_CACHE_TTL", 300))
+CATALOG_CACHE_MAXSIZE = int(os.environ.get("CATALOG_CACHE_MAXSIZE", 1024))
+# Rows per page of the destination list and the info request cruise picker
+CATALOG_PAGE_SIZE = int(os.environ.get("CATALOG_PAGE_SIZE", 25))
+CATALOG_MAX_PAGE_SIZE = int(os.environ.get("CATALOG_MAX_PAGE_SIZE", 100))
+# Full-text matches ranked per table for /search; bounds the cost of very common terms
+CATALOG_SEARCH_CANDIDATES = int(os.environ.get("CATALOG_SEARCH_CANDIDATES", 1000))
+
+PAGE_CACHE_ENABLED = os.environ.get("PAGE_CACHE_ENABLED", "true").lower() == "true"
+PAGE_CACHE_BACKEND = os.environ.get("PAGE_CACHE_BACKEND", "memory")
+PAGE_CACHE_DIR = os.environ.get("PAGE_CACHE_DIR")
+PAGE_CACHE_URL = os.environ.get("PAGE_CACHE_URL")
+PAGE_CACHE_TTL = int(os.environ.get("PAGE_CACHE_TTL", 300))
+PAGE_CACHE_MAXSIZE = int(os.environ.get("PAGE_CACHE_MAXSIZE", 1024))
+PAGE_CACHE_MAX_AGE = int(os.environ.get("PAGE_CACHE_MAX_AGE", 60))
+
+# Compiled templates, shared by the workers on a host; defaults to a directory in /dev/shm
+TEMPLATE_BYTECODE_CACHE = os.environ.get("TEMPLATE_BYTECODE_CACHE", "true").lower() == "true"
+TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get("TEMPLATE_BYTECODE_CACHE_DIR")
+# Markup rendered by {% cache %} blocks in the templates; the backends are the same as above
+FRAGMENT_CACHE_BACKEND = os.environ.get("FRAGMENT_CACHE_BACKEND", "memory")
+FRAGMENT_CACHE_DIR = os.environ.get("FRAGMENT_CACHE_DIR")
+FRAGMENT_CACHE_URL = os.environ.get("FRAGMENT_CACHE_URL")
+FRAGMENT_CACHE_TTL = int(os.environ.get("FRAGMENT_CACHE_TTL", 3600))
+FRAGMENT_CACHE_MAXSIZE = int(os.environ.get("FRAGMENT_CACHE_MAXSIZE", 256))
+
+# /api/v1 bodies are compressed once per catalog version and kept in the page cache
+API_COMPRESS_MIN_SIZE = int(os.environ.get("API_COMPRESS_MIN_SIZE", 512))
+API_GZIP_LEVEL = int(os.environ.get("API_GZIP_LEVEL", 6))
+API_BROTLI_QUALITY = int(os.environ.get("API_BROTLI_QUALITY", 5))
+
+# Queue info requests in a local SQLite file and write them to Postgres in batches.
+# The file must be on a disk that survives worker restarts; it defaults to the temp directory.
+INFO_REQUEST_BUFFERED = os.environ.get("INFO_REQUEST_BUFFERED", "false").lower() == "true"
+INFO_REQUEST_QUEUE_PATH = os.environ.get("INFO_REQUEST_QUEUE_PATH")
+INFO_REQUEST_QUEUE_MAX = int(os.environ.get("INFO_REQUEST_QUEUE_MAX", 10000))
+INFO_REQUEST_BATCH_SIZE = int(os.environ.get("INFO_REQUEST_BATCH_SIZE", 500))
+INFO_REQUEST_FLUSH_INTERVAL = float(os.environ.get("INFO_REQUEST_FLUSH_INTERVAL", 1.0))
+INFO_REQUEST_CLAIM_TIMEOUT = float(os.environ.get("INFO_REQUEST_CLAIM_TIMEOUT", 30))
+INFO_REQUEST_RETRY_AFTER = int(os.environ.get("INFO_REQUEST_RETRY_AFTER", 5))
+
+# Azure Monitor. Without a connection string telemetry is not imported at all.
+APPLICATIONINSIGHTS_CONNECTION_STRING = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING")
+TELEMETRY_DEFERRED = os.environ.get("TELEMETRY_DEFERRED", "true").lower() == "true"
+TELEMETRY_SAMPLING_RATIO = float(os.environ.get("TELEMETRY_SAMPLING_RATIO", 1.0))
+TELEMETRY_MAX_QUEUE_SIZE = int(os.environ.get("TELEMETRY_MAX_QUEUE_SIZE", 2048))
+TELEMETRY_MAX_EXPORT_BATCH_SIZE = int(os.environ.get("TELEMETRY_MAX_EXPORT_BATCH_SIZE", 512))
+TELEMETRY_EXPORT_INTERVAL_MS = int(os.environ.get("TELEMETRY_EXPORT_INTERVAL_MS", 5000))
+TELEMETRY_METRIC_EXPORT_INTERVAL_MS = int(os.environ.get("TELEMETRY_METRIC_EXPORT_INTERVAL_MS", 60000))
+
+# Per-request SQL, render and total time: sent in a Server-Timing header, added to the request's
+# span and logged for requests and statements slower than these thresholds
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "true").lower() == "true"
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 1000))
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+
+# Prometheus metrics on /metrics, added up over the gunicorn workers (see gunicorn.conf.py).
+# With METRICS_TOKEN set, scrapes must send "Authorization: Bearer <token>".
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+# Compression of the precompressed copies written by `flask assets build`; the build runs once
+# per deploy, so the slowest, smallest settings are worth it
+ASSETS_GZIP_LEVEL = int(os.environ.get("ASSETS_GZIP_LEVEL", 9))
+ASSETS_BROTLI_QUALITY = int(os.environ.get("ASSETS_BROTLI_QUALITY", 11))
+
+# Widths and formats of the copies `flask images build` writes of the images shown with picture(),
+# besides a fallback in each image's own format
+IMAGE_WIDTHS = tuple(int(width) for width in os.environ.get("IMAGE_WIDTHS", "480,768,1024,1440,1920").split(","))
+IMAGE_FORMATS = tuple(os.environ.get("IMAGE_FORMATS", "avif,webp").split(","))
@@ -0,0 +1,37 @@
+"""
+Support for serving the app from gevent workers.
+
+gevent's monkey patching makes sockets cooperative, but psycopg2 talks to Postgres
+through libpq in C, so a query would still block every greenlet in the worker.
+Installing a wait callback makes psycopg2 yield to the gevent hub while it waits.
+"""
+
+import sys
+
+
+def is_monkey_patched() -> bool:
+    """True when gevent has patched the standard library in this process."""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("socket")
+
+
+def patch_psycopg() -> None:
+    from psycopg2 import extensions
+
+    extensions.set_wait_callback(gevent_wait_callback)
+
+
+def gevent_wait_callback(conn, timeout=None):
+    from gevent.socket import wait_read, wait_write
+    from psycopg2 import OperationalError, extensions
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise OperationalError(f"Bad result from poll: {state!r}")
@@ -0,0 +1,278 @@
+"""
+Responsive images.
+
+`flask images build` finds every image the templates show with `picture(...)` and writes
+resized copies of it at IMAGE_WIDTHS, in AVIF and WebP and in the image's own format, to
+`static/derived/`, with a manifest in `static/derived/images.json`. `picture()` turns the
+manifest entry into a `<picture>` element whose `srcset`s let the browser download the
+smallest copy, in the best format, that fills the space the image takes up on its screen,
+instead of a multi-megabyte original. An image that hasn't been derived yet is shown from
+its original file, so pages still work before the first build.
+
+Only images whose file changed since the last build are encoded again, since AVIF encoding
+takes seconds per copy. `flask images check` fails when a template shows an image without
+up-to-date copies, such as one added without rebuilding.
+
+Run the build when deploying, before `flask assets build` so the copies are fingerprinted too,
+and `flask images check` when the app starts.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import posixpath
+from collections.abc import Sequence
+
+from flask import current_app, url_for
+from jinja2 import nodes
+from markupsafe import Markup, escape
+
+DERIVED_DIRECTORY = "derived"
+MANIFEST_NAME = "images.json"
+# Listed best first: a browser uses the first <source> whose type it supports
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+# Source extensions and the format of the fallback copies written for them
+FALLBACK_FORMATS = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png"}
+# Qualities that keep the copies visually indistinguishable from the originals at their size.
+# AVIF speed 7 and WebP method 4 give copies the size of the slower settings' in half the
+# time, which keeps deploys short: the build runs once per deploy, in postbuild.sh.
+ENCODER_OPTIONS = {
+    "avif": {"quality": 50, "speed": 7},
+    "webp": {"quality": 75, "method": 4},
+    "jpeg": {"quality": 80, "optimize": True, "progressive": True},
+    "png": {},
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class Derivative:
+    path: str
+    width: int
+
+
+@dataclasses.dataclass
+class ImageEntry:
+    source: str
+    width: int
+    height: int
+    # Format name to its copies, narrowest first; the last format is the <img> fallback
+    formats: dict[str, list[Derivative]]
+
+    def to_json(self) -> dict:
+        return {
+            "source": self.source,
+            "width": self.width,
+            "height": self.height,
+            "formats": {
+                fmt: [{"path": d.path, "width": d.width} for d in derivatives]
+                for fmt, derivatives in self.formats.items()
+            },
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> ImageEntry:
+        formats = {
+            fmt: [Derivative(d["path"], d["width"]) for d in derivatives]
+            for fmt, derivatives in data["formats"].items()
+        }
+        return cls(source=data["source"], width=data["width"], height=data["height"], formats=formats)
+
+
+def init_app(app):
+    app.config.setdefault("IMAGE_WIDTHS", (480, 768, 1024, 1440, 1920))
+    app.config.setdefault("IMAGE_FORMATS", ("avif", "webp"))
+    load(app)
+    app.add_template_global(picture)
+
+
+def load(app) -> dict[str, ImageEntry]:
+    """Reads the manifest from the static folder, if images have been derived, and makes it current."""
+    manifest = read_manifest(app.static_folder)
+    app.extensions["images"] = manifest
+    return manifest
+
+
+def read_manifest(static_folder: str) -> dict[str, ImageEntry]:
+    try:
+        with open(os.path.join(static_folder, DERIVED_DIRECTORY, MANIFEST_NAME)) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {filename: ImageEntry.from_json(entry) for filename, entry in data.items()}
+
+
+def referenced(app) -> dict[str, list[str]]:
+    """The images shown with `picture()` in the app's templates, with the templates that show them."""
+    images = {}
+    loader = app.jinja_env.loader
+    for template in loader.list_templates():
+        source, _, _ = loader.get_source(app.jinja_env, template)
+        for call in app.jinja_env.parse(source).find_all(nodes.Call):
+            if (
+                isinstance(call.node, nodes.Name)
+                and call.node.name == "picture"
+                and call.args
+                and isinstance(call.args[0], nodes.Const)
+            ):
+                images.setdefault(call.args[0].value, []).append(template)
+    return images
+
+
+def build(
+    static_folder: str,
+    filenames: Sequence[str],
+    widths: Sequence[int] = (480, 768, 1024, 1440, 1920),
+    formats: Sequence[str] = ("avif", "webp"),
+    force: bool = False,
+) -> tuple[dict[str, ImageEntry], list[str]]:
+    """Derives the copies of each image in `filenames`. Returns (manifest, the filenames encoded again).
+
+    An image is skipped when its file and the settings are unchanged since the last build, unless `force`.
+    """
+    previous = read_manifest(static_folder)
+    manifest = {}
+    built = []
+    for filename in sorted(set(filenames)):
+        with open(os.path.join(static_folder, filename), "rb") as f:
+            source = _source_hash(f.read(), widths, formats)
+        entry = previous.get(filename)
+        if entry is None or entry.source != source or force or _missing(static_folder, entry):
+            entry = _derive(static_folder, filename, source, widths, formats)
+            built.append(filename)
+        manifest[filename] = entry
+
+    _remove_stale(static_folder, manifest)
+    target = os.path.join(static_folder, DERIVED_DIRECTORY, MANIFEST_NAME)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + ".tmp", "w") as f:
+        # Not sort_keys: the order of each entry's formats is the order of the <source>s
+        json.dump({filename: entry.to_json() for filename, entry in manifest.items()}, f, indent=2)
+    os.replace(target + ".tmp", target)
+    return manifest, built
+
+
+def check(
+    static_folder: str, filenames: Sequence[str], widths: Sequence[int], formats: Sequence[str]
+) -> list[tuple[str, str]]:
+    """(filename, problem) for each image in `filenames` without up-to-date copies."""
+    manifest = read_manifest(static_folder)
+    problems = []
+    for filename in sorted(set(filenames)):
+        path = os.path.join(static_folder, filename)
+        if not os.path.exists(path):
+            problems.append((filename, "no such file"))
+            continue
+        entry = manifest.get(filename)
+        with open(path, "rb") as f:
+            source = _source_hash(f.read(), widths, formats)
+        if entry is None:
+            problems.append((filename, "no derivatives"))
+        elif entry.source != source:
+            problems.append((filename, "derivatives are out of date"))
+        elif _missing(static_folder, entry):
+            problems.append((filename, "derivative files are missing"))
+    return problems
+
+
+def picture(filename: str, alt: str, sizes: str = "100vw", **attributes) -> Markup:
+    """A `<picture>` for a static image, with `srcset`s of its derived copies.
+
+    `sizes` tells the browser how wide the image is shown, so it can pick a copy before
+    layout; the other keyword arguments become attributes of the `<img>`.
+    """
+    entry = current_app.extensions.get("images", {}).get(filename)
+    if entry is None:
+        return Markup(f"<img{_attributes(src=url_for('static', filename=filename), alt=alt, **attributes)}>")
+
+    *preferred, fallback = entry.formats.items()
+    sources = [
+        f"<source{_attributes(type=MIME_TYPES[fmt], srcset=_srcset(derivatives), sizes=sizes)}>"
+        for fmt, derivatives in preferred
+    ]
+    fmt, derivatives = fallback
+    img = _attributes(
+        src=url_for("static", filename=derivatives[-1].path),
+        srcset=_srcset(derivatives),
+        sizes=sizes,
+        width=entry.width,
+        height=entry.height,
+        alt=alt,
+        **attributes,
+    )
+    return Markup(f"<picture>{''.join(sources)}<img{img}></picture>")
+
+
+def _srcset(derivatives: list[Derivative]) -> str:
+    return ", ".join(f"{url_for('static', filename=d.path)} {d.width}w" for d in derivatives)
+
+
+def _attributes(**attributes) -> str:
+    return "".join(f' {name}="{escape(value)}"' for name, value in attributes.items() if value is not None)
+
+
+def _source_hash(content: bytes, widths: Sequence[int], formats: Sequence[str]) -> str:
+    # The settings are part of the hash, so changing them derives the images again
+    digest = hashlib.sha256(content)
+    digest.update(json.dumps([sorted(widths), list(formats), ENCODER_OPTIONS], sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _missing(static_folder: str, entry: ImageEntry) -> bool:
+    return any(
+        not os.path.exists(os.path.join(static_folder, d.path))
+        for derivatives in entry.formats.values()
+        for d in derivatives
+    )
+
+
+def _derive(
+    static_folder: str, filename: str, source: str, widths: Sequence[int], formats: Sequence[str]
+) -> ImageEntry:
+    # Only the build needs Pillow
+    from PIL import Image, ImageOps
+
+    stem, extension = posixpath.splitext(filename)
+    fallback = FALLBACK_FORMATS.get(extension.lower())
+    if fallback is None:
+        raise ValueError(f"{filename}: only {', '.join(FALLBACK_FORMATS)} images can be derived")
+    # Pillow writes AVIF from 11.2, which needs Python 3.9; older versions don't know the format
+    Image.init()
+    formats = [fmt for fmt in formats if fmt.upper() in Image.SAVE] + [fallback]
+
+    with Image.open(os.path.join(static_folder, filename)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    # Never upscaled: widths beyond the original's are replaced by the original width
+    sizes = sorted({min(width, image.width) for width in widths})
+    derived = {fmt: [] for fmt in formats}
+    for width in sizes:
+        resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        for fmt in formats:
+            path = posixpath.join(DERIVED_DIRECTORY, f"{stem}-{width}w.{'jpg' if fmt == 'jpeg' else fmt}")
+            target = os.path.join(static_folder, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # JPEG has no alpha channel; the other formats keep transparency
+            copy = resized.convert("RGB") if fmt == "jpeg" and resized.mode != "RGB" else resized
+            copy.save(target, fmt.upper(), **ENCODER_OPTIONS[fmt])
+            derived[fmt].append(Derivative(path, width))
+    height = round(image.height * sizes[-1] / image.width)
+    return ImageEntry(source=source, width=sizes[-1], height=height, formats=derived)
+
+
+def _remove_stale(static_folder: str, manifest: dict[str, ImageEntry]) -> None:
+    """Deletes copies no entry refers to, left by images or widths that are gone."""
+    current = {
+        os.path.normpath(os.path.join(static_folder, d.path))
+        for entry in manifest.values()
+        for derivatives in entry.formats.values()
+        for d in derivatives
+    }
+    folder = os.path.join(static_folder, DERIVED_DIRECTORY)
+    for directory, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.normpath(os.path.join(directory, name))
+            if name != MANIFEST_NAME and path not in current:
+                os.remove(path)
@@ -0,0 +1,308 @@
+"""
+Buffered ingestion of info requests.
+
+By default `create_info_request` writes each request to Postgres and commits before it
+answers. With INFO_REQUEST_BUFFERED it validates the request, appends it to a durable
+queue in a local SQLite database instead and answers at once. The queue is in WAL mode and
+shared by the workers on a host. A background thread in each worker moves queued requests
+to Postgres in multi-row inserts, so a burst of form posts costs one commit per batch
+rather than one per post.
+
+Delivery is at least once. The flusher claims a batch for INFO_REQUEST_CLAIM_TIMEOUT seconds,
+commits it to Postgres, and only then deletes it from the queue. If a worker dies in
+between, another one claims the batch again once the claim expires, and the unique
+`dedup_key` turns the second insert into a no-op. When the queue holds INFO_REQUEST_QUEUE_MAX
+requests, `submit` raises `QueueFull` instead of letting the backlog grow.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+
+from flask import current_app
+from sqlalchemy import exc, insert
+from sqlalchemy.dialects import postgresql
+
+from . import catalog, db, models
+
+logger = logging.getLogger(__name__)
+
+# Longest value each form field may have, from the info_request columns
+FIELD_LENGTHS = {"name": 255, "email": 255, "notes": 255}
+DEDUP_KEY_LENGTH = 64
+
+
+class QueueFull(Exception):
+    """The queue is at capacity; the client should retry later."""
+
+
+class InfoRequestQueue:
+    """A bounded FIFO of info requests in a SQLite file, safe to share between processes."""
+
+    def __init__(self, path: str, max_size: int = 10000, claim_timeout: float = 30.0):
+        self.path = path
+        self.max_size = max_size
+        self.claim_timeout = claim_timeout
+        self._local = threading.local()
+        # Closed rather than kept: this runs in create_app, which is in the gunicorn master under preload_app
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS pending ("
+                "dedup_key TEXT PRIMARY KEY, payload TEXT NOT NULL, claimed_until REAL NOT NULL DEFAULT 0)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS failed (dedup_key TEXT PRIMARY KEY, payload TEXT NOT NULL, error TEXT)"
+            )
+        finally:
+            connection.close()
+
+    def put(self, row: dict) -> int:
+        """Appends `row` unless a row with its dedup key is already queued. Returns the queue size.
+
+        Raises `QueueFull` when the queue is at capacity.
+        """
+        with self._transaction() as connection:
+            size = connection.execute("SELECT count(*) FROM pending").fetchone()[0]
+            if size >= self.max_size:
+                raise QueueFull(f"{size} info requests are waiting to be written")
+            inserted = connection.execute(
+                "INSERT INTO pending (dedup_key, payload) VALUES (?, ?) ON CONFLICT (dedup_key) DO NOTHING",
+                (row["dedup_key"], json.dumps(row)),
+            ).rowcount
+        return size + inserted
+
+    def claim(self, limit: int) -> list[tuple[int, dict]]:
+        """The oldest `limit` unclaimed rows as (rowid, row), claimed for `claim_timeout` seconds."""
+        now = time.time()
+        with self._transaction() as connection:
+            claimed = connection.execute(
+                "UPDATE pending SET claimed_until = ? WHERE rowid IN "
+                "(SELECT rowid FROM pending WHERE claimed_until < ? ORDER BY rowid LIMIT ?) "
+                "RETURNING rowid, payload",
+                (now + self.claim_timeout, now, limit),
+            ).fetchall()
+        return sorted((rowid, json.loads(payload)) for rowid, payload in claimed)
+
+    def ack(self, rowids: list[int]) -> None:
+        """Removes rows that are safely in Postgres."""
+        with self._transaction() as connection:
+            connection.executemany("DELETE FROM pending WHERE rowid = ?", [(rowid,) for rowid in rowids])
+
+    def release(self, rowids: list[int]) -> None:
+        """Makes claimed rows available again without waiting for their claim to expire."""
+        with self._transaction() as connection:
+            connection.executemany(
+                "UPDATE pending SET claimed_until = 0 WHERE rowid = ?", [(rowid,) for rowid in rowids]
+            )
+
+    def fail(self, rowid: int, error: str) -> None:
+        """Moves a row Postgres rejected to the `failed` table, so it doesn't block the queue."""
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO failed (dedup_key, payload, error) "
+                "SELECT dedup_key, payload, ? FROM pending WHERE rowid = ?",
+                (error, rowid),
+            )
+            connection.execute("DELETE FROM pending WHERE rowid = ?", (rowid,))
+
+    def __len__(self):
+        return self._connection().execute("SELECT count(*) FROM pending").fetchone()[0]
+
+    def failed(self) -> list[tuple[dict, str]]:
+        rows = self._connection().execute("SELECT payload, error FROM failed ORDER BY rowid").fetchall()
+        return [(json.loads(payload), error) for payload, error in rows]
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared between threads,
+        # nor used on both sides of a fork, so a forked process opens its own
+        pid, connection = getattr(self._local, "connection", (None, None))
+        if pid != os.getpid():
+            connection = self._connect()
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        # WAL lets the flusher read while requests append; the default synchronous=FULL
+        # syncs every commit, so an acknowledged request survives a crash
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, so the size check and the insert in `put` are atomic across processes."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+class Flusher:
+    """Background thread that moves queued requests to Postgres in each worker.
+
+    Like deferred telemetry, it starts on the first request rather than in `create_app`,
+    so it runs in the process that serves requests even when gunicorn preloads the app.
+    """
+
+    def __init__(self, app, queue: InfoRequestQueue):
+        self.app = app
+        self.queue = queue
+        self.batch_size = app.config["INFO_REQUEST_BATCH_SIZE"]
+        self.interval = app.config["INFO_REQUEST_FLUSH_INTERVAL"]
+        self._wake = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="info-request-flusher", daemon=True).start()
+
+    def notify(self, size: int) -> None:
+        """Flushes early once a full batch is waiting."""
+        if size >= self.batch_size:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    drain(self.queue, self.batch_size)
+                except Exception:
+                    self.app.logger.exception("Flushing info requests failed; they stay queued")
+                finally:
+                    db.session.remove()
+
+
+def init_app(app):
+    app.config.setdefault("INFO_REQUEST_BUFFERED", False)
+    app.config.setdefault("INFO_REQUEST_QUEUE_PATH", None)
+    app.config.setdefault("INFO_REQUEST_QUEUE_MAX", 10000)
+    app.config.setdefault("INFO_REQUEST_BATCH_SIZE", 500)
+    app.config.setdefault("INFO_REQUEST_FLUSH_INTERVAL", 1.0)
+    app.config.setdefault("INFO_REQUEST_CLAIM_TIMEOUT", 30.0)
+    app.config.setdefault("INFO_REQUEST_RETRY_AFTER", 5)
+    if not app.config["INFO_REQUEST_BUFFERED"]:
+        return
+
+    path = app.config["INFO_REQUEST_QUEUE_PATH"] or os.path.join(tempfile.gettempdir(), "flaskapp-info-requests.db")
+    queue = InfoRequestQueue(
+        path, max_size=app.config["INFO_REQUEST_QUEUE_MAX"], claim_timeout=app.config["INFO_REQUEST_CLAIM_TIMEOUT"]
+    )
+    flusher = Flusher(app, queue)
+    app.extensions["info_request_queue"] = queue
+    app.extensions["info_request_flusher"] = flusher
+    # Started on any request, so a backlog left by an earlier worker is written without waiting for a post
+    app.before_request(flusher.start)
+
+
+def get_queue() -> InfoRequestQueue | None:
+    """The queue, or None when info requests are written directly."""
+    return current_app.extensions.get("info_request_queue")
+
+
+def parse(form: Mapping[str, str]) -> dict:
+    """An info_request row from the submitted form. Raises ValueError if the form is invalid."""
+    row = {}
+    for field, length in FIELD_LENGTHS.items():
+        value = form.get(field, "").strip()
+        if not value:
+            raise ValueError(f"Please fill in the {field} field.")
+        if len(value) > length:
+            raise ValueError(f"The {field} field is limited to {length} characters.")
+        row[field] = value
+    cruise = catalog.cruise(form.get("cruise_id"))
+    if cruise is None:
+        raise ValueError("Please choose one of our cruises.")
+    row["cruise_id"] = cruise.id
+    dedup_key = form.get("request_key") or uuid.uuid4().hex
+    if len(dedup_key) > DEDUP_KEY_LENGTH:
+        raise ValueError("Invalid request key.")
+    row["dedup_key"] = dedup_key
+    return row
+
+
+def submit(row: dict) -> None:
+    """Writes the row now, or queues it when buffering is on. Raises `QueueFull` under backpressure."""
+    queue = get_queue()
+    if queue is None:
+        write([row])
+        return
+    size = queue.put(row)
+    current_app.extensions["info_request_flusher"].notify(size)
+
+
+def write(rows: list[dict]) -> None:
+    """Inserts and commits the rows in one multi-row INSERT, skipping dedup keys already stored."""
+    table = models.InfoRequest.__table__
+    if db.session.get_bind().dialect.name == "postgresql":
+        statement = postgresql.insert(table).on_conflict_do_nothing(index_elements=["dedup_key"])
+    else:
+        statement = insert(table)
+    try:
+        db.session.execute(statement, rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def flush(queue: InfoRequestQueue, batch_size: int) -> int:
+    """Writes one batch from the queue to Postgres. Returns how many rows it took off the queue."""
+    batch = queue.claim(batch_size)
+    if not batch:
+        return 0
+    rowids = [rowid for rowid, _ in batch]
+    try:
+        write([row for _, row in batch])
+    except exc.IntegrityError:
+        # One bad row, such as one whose cruise was deleted after it was queued, must not hold
+        # back the others: write them one at a time and set the rejected ones aside
+        for rowid, row in batch:
+            try:
+                write([row])
+            except exc.IntegrityError as error:
+                logger.warning("Info request %s was rejected: %s", row["dedup_key"], error.orig)
+                queue.fail(rowid, str(error.orig))
+            else:
+                queue.ack([rowid])
+        return len(batch)
+    except Exception:
+        queue.release(rowids)
+        raise
+    queue.ack(rowids)
+    return len(batch)
+
+
+def drain(queue: InfoRequestQueue, batch_size: int) -> int:
+    """Flushes batches until the queue has no unclaimed rows. Returns how many were written."""
+    total = 0
+    while True:
+        flushed = flush(queue, batch_size)
+        total += flushed
+        if flushed < batch_size:
+            return total
@@ -0,0 +1,139 @@
+"""
+Prometheus metrics, aggregated across gunicorn workers.
+
+Records request latency per endpoint, database pool checkouts, waits and overflow, cache
+hits and misses, and gunicorn worker exits, and serves them in the Prometheus text format
+on /metrics. When PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py sets it up), every
+worker writes its values to memory-mapped files in that directory and /metrics adds them
+up. A scrape that lands on any worker therefore sees the whole server, including workers
+that have since been recycled. Without it the numbers cover the current process only.
+
+This module is only imported when METRICS_ENABLED is on, so prometheus_client is only
+needed then.
+"""
+
+import hmac
+import os
+import time
+
+from flask import Response, abort, current_app, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy.pool import QueuePool
+
+from . import db, timing
+
+# Seconds; finer at the low end, where cached pages land
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "flaskapp_request_duration_seconds",
+    "Time the app took to handle a request",
+    ["endpoint", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+POOL_CHECKOUTS = Counter("flaskapp_db_pool_checkouts", "Connections checked out of the pool", ["bind"])
+POOL_CONNECTS = Counter("flaskapp_db_pool_connects", "New database connections opened by the pool", ["bind"])
+POOL_WAITS = Counter("flaskapp_db_pool_waits", "Checkouts that waited for a connection", ["bind"])
+POOL_WAIT_SECONDS = Counter("flaskapp_db_pool_wait_seconds", "Time spent waiting for a connection", ["bind"])
+# livesum: the current total over the workers that are alive
+POOL_CHECKED_OUT = Gauge("flaskapp_db_pool_checked_out", "Connections in use", ["bind"], multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge(
+    "flaskapp_db_pool_overflow", "Connections open beyond the pool size", ["bind"], multiprocess_mode="livesum"
+)
+CACHE_EVENTS = Counter("flaskapp_cache_events", "Cache lookups and removals by outcome", ["cache", "event"])
+WORKER_EXITS = Counter("flaskapp_worker_exits", "Gunicorn workers that exited, by reason", ["reason"])
+
+_CACHES = (("catalog", "catalog_cache"), ("page", "page_cache"), ("fragment", "fragment_cache"))
+_CACHE_EVENTS = ("hits", "misses", "evictions", "expirations", "invalidations")
+
+# The pool and cache counters are plain attributes updated on hot paths; they are copied
+# into the Prometheus counters after each request, as the increase since the last copy.
+# Keyed by the pool or cache object, so a new pool or cache starts from zero.
+_synced = {}
+
+
+def init_app(app):
+    app.config.setdefault("METRICS_TOKEN", None)
+    app.after_request(_observe)
+    app.add_url_rule("/metrics", "metrics", _metrics_view)
+
+
+def is_multiprocess() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render() -> bytes:
+    """The metrics in the Prometheus text format, added up over every worker in multiprocess mode."""
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def sync(app) -> None:
+    """Copies the pool and cache counters of this process into the Prometheus metrics."""
+    for bind, engine in db.engines.items():
+        # Tests bind the app to a Connection, which has no pool
+        pool = getattr(engine, "pool", None)
+        if not isinstance(pool, QueuePool):
+            continue
+        label = bind or "default"
+        POOL_CHECKED_OUT.labels(label).set(pool.checkedout())
+        POOL_OVERFLOW.labels(label).set(max(pool.overflow(), 0))
+        pool_metrics = getattr(pool, "metrics", None)
+        if pool_metrics is None:
+            continue
+        for metric, value in (
+            (POOL_CHECKOUTS, pool_metrics.checkouts),
+            (POOL_CONNECTS, pool_metrics.connects),
+            (POOL_WAITS, pool_metrics.waits),
+            (POOL_WAIT_SECONDS, pool_metrics.wait_seconds),
+        ):
+            _increase(metric.labels(label), (id(pool), metric), value)
+
+    for name, extension in _CACHES:
+        backend = app.extensions.get(extension)
+        if backend is None:
+            continue
+        for event in _CACHE_EVENTS:
+            _increase(CACHE_EVENTS.labels(name, event), (id(backend), event), getattr(backend.stats, event))
+
+
+def record_worker_exit(worker) -> None:
+    """Counts a gunicorn worker exit; call it from the `worker_exit` server hook."""
+    reason = "max_requests" if worker.nr >= worker.max_requests else "shutdown"
+    WORKER_EXITS.labels(reason).inc()
+
+
+def _increase(child, key, value) -> None:
+    delta = value - _synced.get(key, 0)
+    if delta > 0:
+        child.inc(delta)
+    _synced[key] = value
+
+
+def _observe(response):
+    request_timing = timing.current()
+    if request_timing is not None:
+        REQUEST_LATENCY.labels(request.endpoint or "none", request.method, str(response.status_code)).observe(
+            time.perf_counter() - request_timing.started
+        )
+    sync(current_app)
+    return response
+
+
+def _metrics_view():
+    token = current_app.config["METRICS_TOKEN"]
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        abort(401)
+    return Response(render(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,46 @@
+"""index foreign keys
+
+Revision ID: 5d2e8b6a4c3f
+Revises: 3c9d5e2f7a1b
+Create Date: 2026-10-18 11:40:07.318264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e8b6a4c3f'
+down_revision = '3c9d5e2f7a1b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The link table's primary key leads with destination_id, so lookups by cruise need their own index
+    with op.batch_alter_table('cruise_destination_link', schema=None) as batch_op:
+        batch_op.create_index('ix_cruise_destination_link_cruise_id', ['cruise_id'], unique=False)
+
+    with op.batch_alter_table('info_request', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_info_request_cruise_id'), ['cruise_id'], unique=False)
+
+    # 7e0fa0af05a6 created info_request without the foreign key the model declares.
+    # On Postgres it is added NOT VALID: new rows are checked, existing rows are not scanned
+    # under lock, and any orphans already stored don't block the upgrade.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            'ALTER TABLE info_request ADD CONSTRAINT info_request_cruise_id_fkey '
+            'FOREIGN KEY (cruise_id) REFERENCES cruise (id) NOT VALID'
+        )
+    else:
+        with op.batch_alter_table('info_request', schema=None) as batch_op:
+            batch_op.create_foreign_key('info_request_cruise_id_fkey', 'cruise', ['cruise_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('info_request', schema=None) as batch_op:
+        batch_op.drop_constraint('info_request_cruise_id_fkey', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_info_request_cruise_id'))
+
+    with op.batch_alter_table('cruise_destination_link', schema=None) as batch_op:
+        batch_op.drop_index('ix_cruise_destination_link_cruise_id')
@@ -0,0 +1,42 @@
+"""catalog search vectors
+
+Revision ID: 7b4f1c9e2d8a
+Revises: 5d2e8b6a4c3f
+Create Date: 2026-10-18 14:05:52.730116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4f1c9e2d8a'
+down_revision = '5d2e8b6a4c3f'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(subtitle, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade():
+    # Generated tsvector columns are Postgres-only; elsewhere search falls back to ILIKE
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('destination', 'cruise'):
+        op.execute(
+            f'ALTER TABLE {table} ADD COLUMN search_vector tsvector '
+            f'GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED'
+        )
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('cruise', 'destination'):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,39 @@
+"""validate info request cruise foreign key
+
+Revision ID: c4e1a7d9b2f6
+Revises: 2a6f3d8c1e4b
+Create Date: 2026-10-18 17:25:13.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e1a7d9b2f6'
+down_revision = '2a6f3d8c1e4b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 5d2e8b6a4c3f added the foreign key NOT VALID. Validating it scans info_request under a
+    # SHARE UPDATE EXCLUSIVE lock, which doesn't block reads or writes, and fails if any
+    # request points at a cruise that doesn't exist.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    orphans = op.get_bind().execute(sa.text(
+        'SELECT count(*) FROM info_request WHERE NOT EXISTS '
+        '(SELECT 1 FROM cruise WHERE cruise.id = info_request.cruise_id)'
+    )).scalar()
+    if orphans:
+        raise RuntimeError(
+            f'{orphans} info requests refer to cruises that do not exist. Delete them or restore '
+            'the cruises, then run the migration again.'
+        )
+    op.execute('ALTER TABLE info_request VALIDATE CONSTRAINT info_request_cruise_id_fkey')
+
+
+def downgrade():
+    # A validated constraint can't be marked NOT VALID again, and needn't be
+    pass
@@ -0,0 +1,26 @@
+"""key info requests stored without a dedup key
+
+Revision ID: e8b3d5a1f7c2
+Revises: c4e1a7d9b2f6
+Create Date: 2026-10-18 18:02:51.377940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3d5a1f7c2'
+down_revision = 'c4e1a7d9b2f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Requests stored before 2a6f3d8c1e4b have no dedup key, and NULLs never conflict, so an
+    # export of them would be imported again as duplicates. Key them by id, which is unique.
+    op.execute("UPDATE info_request SET dedup_key = 'legacy-' || id WHERE dedup_key IS NULL")
+
+
+def downgrade():
+    op.execute("UPDATE info_request SET dedup_key = NULL WHERE dedup_key LIKE 'legacy-%'")
@@ -2,9 +2,11 @@
 Models for PostgreSQL
 
 """
+
+import uuid
 from typing import List, Optional
 
-from sqlalchemy import Column, ForeignKey, String
+from sqlalchemy import DDL, Column, ForeignKey, Index, String, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import db
@@ -13,6 +15,8 @@ association_table = db.Table(
     "cruise_destination_link",
     Column("cruise_id", ForeignKey("cruise.id"), primary_key=True),
     Column("destination_id", ForeignKey("destination.id"), primary_key=True),
+    # The primary key leads with destination_id, so it can't serve lookups by cruise
+    Index("ix_cruise_destination_link_cruise_id", "cruise_id"),
 )
 
 
@@ -40,9 +44,43 @@ class Cruise(db.Model):
         return self.name
 
 
+# Full-text search over name, subtitle and description, weighted in that order. The column
+# is generated by Postgres and not mapped, so it is never loaded with the rows; other
+# databases don't get it and search falls back to ILIKE.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(subtitle, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+# Not in the metadata, so migrations/env.py keeps autogenerate from dropping them
+SEARCH_OBJECTS = {"search_vector", "ix_destination_search_vector", "ix_cruise_search_vector"}
+
+for _table in (Destination.__table__, Cruise.__table__):
+    event.listen(
+        _table,
+        "after_create",
+        DDL(
+            f"ALTER TABLE %(table)s ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED; "
+            "CREATE INDEX ix_%(table)s_search_vector ON %(table)s USING gin (search_vector)"
+        ).execute_if(dialect="postgresql"),
+    )
+
+
 class InfoRequest(db.Model):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255))
     email: Mapped[str] = mapped_column(String(255))
     notes: Mapped[str] = mapped_column(String(255))
-    cruise_id: Mapped[int] = mapped_column(ForeignKey("cruise.id"))
+    cruise_id: Mapped[int] = mapped_column(ForeignKey("cruise.id"), index=True)
+    # Set by the form, so a resubmitted or redelivered request is stored once. Requests made
+    # any other way get a random one, so every exported request can be recognised on import.
+    dedup_key: Mapped[Optional[str]] = mapped_column(String(64), unique=True, default=lambda: uuid.uuid4().hex)
+
+
+class AppMetadata(db.Model):
+    """Key-value facts about the deployment, such as fingerprints of what startup last applied."""
+
+    __tablename__ = "app_metadata"
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    value: Mapped[str] = mapped_column(String(255))
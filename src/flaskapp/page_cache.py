@@ -0,0 +1,77 @@
+"""
+Full-page response cache for the catalog pages.
+
+Rendered bodies are stored per endpoint, view arguments, query string and catalog
+version, so a catalog write makes every cached page unreachable at once. Responses carry a strong
+ETag (a hash of the body) and Last-Modified (the catalog version), and conditional
+GETs that match are answered with 304 without querying the database or rendering.
+"""
+
+import dataclasses
+import functools
+import hashlib
+from urllib.parse import urlencode
+
+from flask import Response, current_app, make_response, request
+
+from . import cache, catalog
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedPage:
+    body: bytes
+    mimetype: str
+    etag: str
+    last_modified: float
+
+
+def init_app(app):
+    app.config.setdefault("PAGE_CACHE_ENABLED", True)
+    app.config.setdefault("PAGE_CACHE_MAX_AGE", 60)
+    app.extensions["page_cache"] = cache.from_config(app.config, prefix="page")
+
+
+def cached_page(view):
+    """Serves `view` from the page cache, rendering and storing it on a miss.
+
+    Only successful responses are cached; errors such as 404 are rendered every time.
+    """
+
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+        if not current_app.config["PAGE_CACHE_ENABLED"]:
+            return view(**kwargs)
+
+        version = catalog.version()
+        page_cache = current_app.extensions["page_cache"]
+        key = cache_key(request.endpoint, kwargs, request.args, version)
+        page = page_cache.get(key)
+        if page is None:
+            response = make_response(view(**kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            page = CachedPage(
+                body=body,
+                mimetype=response.mimetype,
+                etag=hashlib.sha256(body).hexdigest(),
+                last_modified=version,
+            )
+            page_cache.set(key, page)
+
+        response = Response(page.body, mimetype=page.mimetype)
+        response.set_etag(page.etag)
+        response.last_modified = page.last_modified
+        response.cache_control.public = True
+        response.cache_control.max_age = int(current_app.config["PAGE_CACHE_MAX_AGE"])
+        return response.make_conditional(request)
+
+    return wrapper
+
+
+def cache_key(endpoint, view_args, query_args, version):
+    """The cache key of a response to `endpoint`, for these arguments and catalog version."""
+    args = ",".join(f"{name}={value}" for name, value in sorted(view_args.items()))
+    # Sorted so the same arguments in a different order share an entry
+    query = urlencode(sorted(query_args.items(multi=True)))
+    return f"{endpoint}({args})?{query}@{version!r}"
@@ -1,30 +1,70 @@
-from flask import Blueprint, redirect, render_template, request, url_for
+import uuid
 
-from . import db, models
+from flask import Blueprint, abort, current_app, jsonify, redirect, render_template, request, url_for
+from werkzeug.exceptions import ServiceUnavailable
+
+from . import catalog, ingest
+from .page_cache import cached_page
+from .replicas import replica_reads
 
 bp = Blueprint("pages", __name__)
 
 
 @bp.get("/")
+@cached_page
+@replica_reads
 def index():
     return render_template("index.html")
 
 
 @bp.get("/about")
+@cached_page
+@replica_reads
 def about():
     return render_template("about.html")
 
 
+def page_args():
+    """Keyset cursors and a page size clamped to the configured maximum, from the query string."""
+    limit = request.args.get("limit", current_app.config["CATALOG_PAGE_SIZE"], type=int)
+    return {
+        "after": request.args.get("after", type=int),
+        "before": request.args.get("before", type=int),
+        "limit": max(1, min(limit, current_app.config["CATALOG_MAX_PAGE_SIZE"])),
+    }
+
+
+def _link_args():
+    """Query arguments that pagination links carry over to the neighbouring pages."""
+    return {name: request.args[name] for name in ("limit", "q") if request.args.get(name)}
+
+
 @bp.get("/destinations")
+@cached_page
+@replica_reads
 def destinations():
-    all_destinations = db.session.execute(db.select(models.Destination)).scalars().all()
+    page = catalog.destinations_page(**page_args())
+
+    return render_template("destinations.html", destinations=page.items, page=page, link_args=_link_args())
+
+
+@bp.get("/search")
+@cached_page
+@replica_reads
+def search():
+    term = request.args.get("q", "").strip()
+    results = catalog.search(term, limit=page_args()["limit"]) if term else ()
 
-    return render_template("destinations.html", destinations=all_destinations)
+    return render_template("search.html", term=term, results=results)
 
 
 @bp.get("/destination/<pk>")
+@cached_page
+@replica_reads
 def destination_detail(pk):
-    destination = db.get_or_404(models.Destination, pk)
+    destination = catalog.destination(pk)
+    if destination is None:
+        abort(404)
 
     return render_template(
         "destination_detail.html",
@@ -34,8 +74,12 @@ def destination_detail(pk):
 
 
 @bp.get("/cruise/<pk>")
+@cached_page
+@replica_reads
 def cruise_detail(pk: int):
-    cruise = db.get_or_404(models.Cruise, pk)
+    cruise = catalog.cruise(pk)
+    if cruise is None:
+        abort(404)
 
     return render_template(
         "cruise_detail.html",
@@ -45,22 +89,50 @@ def cruise_detail(pk: int):
 
 
 @bp.get("/info_request")
+@replica_reads
 def info_request():
-    all_cruises = db.session.execute(db.select(models.Cruise)).scalars().all()
+    search = request.args.get("q", "").strip()
+    page = catalog.cruises_page(search=search or None, **page_args())
 
-    return render_template("info_request_create.html", cruises=all_cruises, message=request.args.get("message"))
+    return render_template(
+        "info_request_create.html",
+        cruises=page.items,
+        page=page,
+        search=search,
+        link_args=_link_args(),
+        message=request.args.get("message"),
+        # Identifies this submission, so posting the form twice stores one request
+        request_key=uuid.uuid4().hex,
+    )
+
+
+@bp.get("/cruises/search")
+@cached_page
+@replica_reads
+def search_cruises():
+    """Cruise picker data for the info request form: a page of cruises whose names match `q`."""
+    search = request.args.get("q", "").strip()
+    page = catalog.cruises_page(search=search or None, **page_args())
+
+    return jsonify(
+        cruises=[{"id": cruise.id, "name": cruise.name} for cruise in page.items],
+        prev=page.prev_cursor,
+        next=page.next_cursor,
+    )
 
 
 @bp.post("/info_request")
 def create_info_request():
-    name = request.form["name"]
-    db_info_request = models.InfoRequest(
-        name=name,
-        email=request.form["email"],
-        notes=request.form["notes"],
-        cruise_id=request.form["cruise_id"],
-    )
-    db.session.add(db_info_request)
-    db.session.commit()
-    success_message = f"Thank you, {name}! We will email you when we have more information!"
+    try:
+        row = ingest.parse(request.form)
+    except ValueError as error:
+        abort(400, str(error))
+    try:
+        ingest.submit(row)
+    except ingest.QueueFull:
+        raise ServiceUnavailable(
+            "We are receiving a lot of requests right now. Please try again in a few seconds.",
+            retry_after=current_app.config["INFO_REQUEST_RETRY_AFTER"],
+        )
+    success_message = f"Thank you, {row['name']}! We will email you when we have more information!"
     return redirect(url_for("pages.info_request", message=success_message))
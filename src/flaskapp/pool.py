@@ -0,0 +1,144 @@
+"""
+Database connection pool configuration, pre-warming and saturation metrics.
+"""
+
+import dataclasses
+import threading
+import time
+
+from sqlalchemy.pool import NullPool, QueuePool
+
+from . import db
+
+
+@dataclasses.dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    connects: int = 0
+    waits: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    peak_checked_out: int = 0
+
+    def record_wait(self, seconds: float) -> None:
+        self.waits += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that counts checkouts and new connections and records how long callers wait."""
+
+    # Waits shorter than this are an uncontended queue get, not a saturated pool
+    wait_threshold = 0.001
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        self._metrics_lock = threading.Lock()
+        self._connect_time = threading.local()
+
+    def _do_get(self):
+        self._connect_time.seconds = 0.0
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            # Time spent opening a new connection is connect latency, not waiting for the pool
+            waited = time.perf_counter() - start - self._connect_time.seconds
+            with self._metrics_lock:
+                self.metrics.checkouts += 1
+                self.metrics.peak_checked_out = max(self.metrics.peak_checked_out, self.checkedout())
+                if waited >= self.wait_threshold:
+                    self.metrics.record_wait(waited)
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            self._connect_time.seconds = getattr(self._connect_time, "seconds", 0.0) + time.perf_counter() - start
+            with self._metrics_lock:
+                self.metrics.connects += 1
+
+
+def engine_options(config) -> dict:
+    """Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* and DB_STATEMENT_TIMEOUT settings.
+
+    DB_POOL_MODE "null" opens a connection per checkout, for use behind PgBouncer
+    or another external pooler; any other value uses a sized, metered QueuePool.
+    """
+    options = {}
+    if config.get("DB_POOL_MODE", "queue") == "null":
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=MeteredQueuePool,
+            pool_size=int(config.get("DB_POOL_SIZE", 5)),
+            max_overflow=int(config.get("DB_MAX_OVERFLOW", 10)),
+            pool_timeout=float(config.get("DB_POOL_TIMEOUT", 30)),
+            pool_recycle=int(config.get("DB_POOL_RECYCLE", -1)),
+            pool_pre_ping=bool(config.get("DB_POOL_PRE_PING", True)),
+        )
+    reset_on_return = config.get("DB_POOL_RESET_ON_RETURN", "rollback")
+    options["pool_reset_on_return"] = None if reset_on_return == "none" else reset_on_return
+
+    statement_timeout = int(config.get("DB_STATEMENT_TIMEOUT_MS", 0))
+    uri = config.get("SQLALCHEMY_DATABASE_URI") or ""
+    if statement_timeout and uri.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+def prewarm(app) -> int:
+    """Opens up to DB_POOL_PREWARM connections on each engine so the first requests don't pay for them.
+
+    Returns how many connections were opened. Connections beyond the pool size
+    would be discarded on return, so the count is capped at the pool size.
+    """
+    count = int(app.config.get("DB_POOL_PREWARM", 0))
+    opened = 0
+    with app.app_context():
+        for engine in db.engines.values():
+            if isinstance(engine.pool, NullPool):
+                continue
+            connections = [engine.connect() for _ in range(min(count, engine.pool.size()))]
+            opened += len(connections)
+            for connection in connections:
+                connection.close()
+    return opened
+
+
+def dispose_inherited(app) -> None:
+    """Discards pooled connections inherited from a parent process, without closing them.
+
+    Call this in a forked child. The connections still belong to the parent, so closing
+    them here would also close the parent's sockets.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def stats(app) -> dict:
+    """Current size, usage and saturation of each engine's pool, keyed by bind name."""
+    result = {}
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                result[bind] = {"pool": type(pool).__name__}
+                continue
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            pool_stats = {
+                "pool": type(pool).__name__,
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "capacity": capacity,
+                "saturation": pool.checkedout() / capacity if capacity else 0.0,
+            }
+            if hasattr(pool, "metrics"):
+                pool_stats.update(dataclasses.asdict(pool.metrics))
+            result[bind] = pool_stats
+    return result
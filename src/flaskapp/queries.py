@@ -0,0 +1,178 @@
+"""
+Query layer over the catalog models.
+
+Each view gets a loader strategy sized to what its template renders, so a page
+is served in a fixed number of statements instead of one per lazy relationship.
+"""
+
+from __future__ import annotations
+
+import re
+
+from sqlalchemy import and_, case, func, literal, literal_column, or_, select, union_all
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import load_only, selectinload
+
+from . import db, models
+
+
+def page_destinations(
+    after: int | None = None, before: int | None = None, limit: int = 25
+) -> tuple[list[models.Destination], bool]:
+    """A page of destinations in id order, seeking past `after` or back from `before`.
+
+    Returns the rows and whether there are more beyond them in the direction of travel.
+    """
+    query = db.select(models.Destination).options(load_only(models.Destination.id, models.Destination.name))
+    return _seek(query, models.Destination.id, after, before, limit)
+
+
+def page_cruises(
+    after: int | None = None, before: int | None = None, limit: int = 25, search: str | None = None
+) -> tuple[list[models.Cruise], bool]:
+    """A page of cruises in id order for the info request picker, optionally filtered by name."""
+    query = db.select(models.Cruise).options(load_only(models.Cruise.id, models.Cruise.name))
+    if search:
+        query = query.where(models.Cruise.name.icontains(search, autoescape=True))
+    return _seek(query, models.Cruise.id, after, before, limit)
+
+
+def page_rows(
+    model, fields: list[str], after: int | None = None, before: int | None = None, limit: int = 25
+) -> tuple[list[Row], bool]:
+    """A page of plain rows with only the named columns of `model`, without ORM objects."""
+    query = db.select(*(getattr(model, field) for field in fields))
+    return _seek(query, model.id, after, before, limit, scalars=False)
+
+
+def find_row(model, pk: int, fields: list[str]) -> Row | None:
+    """One plain row with only the named columns of `model`, or None."""
+    query = db.select(*(getattr(model, field) for field in fields)).where(model.id == pk)
+    return db.session.execute(query).first()
+
+
+def linked_rows(model, ids: list[int]) -> list[Row]:
+    """(owner_id, id, name) rows for what `model` rows with `ids` link to: cruises of destinations or vice versa."""
+    link = models.association_table.c
+    if model is models.Destination:
+        owner, other, other_key = link.destination_id, models.Cruise, link.cruise_id
+    else:
+        owner, other, other_key = link.cruise_id, models.Destination, link.destination_id
+    query = (
+        db.select(owner.label("owner_id"), other.id, other.name)
+        .join(other, other.id == other_key)
+        .where(owner.in_(ids))
+        .order_by(owner, other.id)
+    )
+    return db.session.execute(query).all()
+
+
+def _seek(query, key, after, before, limit, scalars=True):
+    """Keyset pagination on a unique, indexed `key`: one statement however deep the page is.
+
+    One extra row is fetched to tell whether another page follows.
+    """
+    if before is not None:
+        query = query.where(key < before).order_by(key.desc())
+    else:
+        if after is not None:
+            query = query.where(key > after)
+        query = query.order_by(key)
+    result = db.session.execute(query.limit(limit + 1))
+    rows = result.scalars().all() if scalars else result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before is not None:
+        rows.reverse()
+    return rows, has_more
+
+
+def find_destination_detail(pk: int) -> models.Destination | None:
+    """A destination with its cruises loaded up front, or None."""
+    query = (
+        db.select(models.Destination)
+        .where(models.Destination.id == pk)
+        .options(
+            selectinload(models.Destination.cruises).options(load_only(models.Cruise.id, models.Cruise.name)),
+        )
+    )
+    return db.session.execute(query).scalars().first()
+
+
+def find_cruise_detail(pk: int) -> models.Cruise | None:
+    """A cruise with its destinations loaded up front, or None."""
+    query = (
+        db.select(models.Cruise)
+        .where(models.Cruise.id == pk)
+        .options(
+            selectinload(models.Cruise.destinations).options(load_only(models.Destination.id, models.Destination.name)),
+        )
+    )
+    return db.session.execute(query).scalars().first()
+
+
+# Shorter words only match whole lexemes; a one- or two-letter prefix matches most of the catalog
+MIN_PREFIX_LENGTH = 3
+
+
+def search_words(term: str) -> list[str]:
+    """The words of a search term, lowercased, without punctuation or operators."""
+    return re.findall(r"[^\W_]+", term.lower())
+
+
+def search_catalog(term: str, limit: int = 25, candidates: int | None = 1000) -> list[Row]:
+    """Destinations and cruises matching every word of `term`, best matches first.
+
+    On Postgres each word matches as a prefix against the GIN-indexed `search_vector`,
+    and results are ranked with name matches above subtitle and description matches.
+    At most `candidates` matches per table are ranked, which bounds the cost of broad
+    terms; their results are then the best of the first matches found rather than of all.
+    Other databases fall back to a case-insensitive substring match on the same columns.
+    Rows have `kind` ("destination" or "cruise"), `id`, `name`, `subtitle` and `rank`.
+    """
+    words = search_words(term)
+    if not words:
+        return []
+    if db.session.get_bind().dialect.name == "postgresql":
+        matches = [_fulltext_matches(model, words, limit, candidates) for model in (models.Destination, models.Cruise)]
+    else:
+        matches = [_substring_matches(model, words, limit) for model in (models.Destination, models.Cruise)]
+    combined = union_all(*(select(match) for match in matches)).subquery()
+    query = select(combined).order_by(combined.c.rank.desc(), combined.c.kind, combined.c.id).limit(limit)
+    return db.session.execute(query).all()
+
+
+def _fulltext_matches(model, words, limit, candidates):
+    table = model.__table__
+    tsquery = func.to_tsquery(
+        "english", " & ".join(f"{word}:*" if len(word) >= MIN_PREFIX_LENGTH else word for word in words)
+    )
+    vector = literal_column(f"{table.name}.search_vector")
+    matches = (
+        select(model.id, model.name, model.subtitle, vector.label("search_vector"))
+        .where(vector.op("@@")(tsquery))
+        .limit(candidates)
+        .subquery()
+    )
+    rank = func.ts_rank(matches.c.search_vector, tsquery)
+    # Each table is ranked and cut to `limit` on its own, so at most 2 * limit rows are merged
+    return (
+        select(literal(table.name).label("kind"), matches.c.id, matches.c.name, matches.c.subtitle, rank.label("rank"))
+        .order_by(rank.desc(), matches.c.id)
+        .limit(limit)
+        .subquery()
+    )
+
+
+def _substring_matches(model, words, limit):
+    table = model.__table__
+    columns = (model.name, model.subtitle, model.description)
+    in_name = and_(*(model.name.icontains(word, autoescape=True) for word in words))
+    rank = case((in_name, 1.0), else_=0.5)
+    return (
+        select(literal(table.name).label("kind"), model.id, model.name, model.subtitle, rank.label("rank"))
+        .where(*(or_(*(column.icontains(word, autoescape=True) for column in columns)) for word in words))
+        .order_by(rank.desc(), model.id)
+        .limit(limit)
+        .subquery()
+    )
@@ -0,0 +1,210 @@
+"""
+Read replicas for the catalog pages.
+
+DATABASE_REPLICA_URIS lists read replicas of the primary database. Each one becomes a bind
+("replica_0", "replica_1", ...), and views decorated with `replica_reads` run their
+SELECTs on them, taking turns so every replica gets a share of the reads. Everything
+else uses the primary: writes, flushes, other views, and every request from a client
+that wrote within the last REPLICA_MAX_LAG_SECONDS, so a redirect after a POST shows what
+was just posted.
+
+Before a replica is used, and every REPLICA_CHECK_SECONDS after that, it is asked how
+far its replay is behind the primary. A replica that can't be reached, that isn't
+streaming from the primary, or that is more than REPLICA_MAX_LAG_SECONDS behind, is
+skipped until it is checked again, and reads fall back to the primary when no replica is
+usable. Unreachable and non-streaming replicas are checked again every
+REPLICA_RETRY_SECONDS. A view whose replica fails mid-request runs again on the primary.
+
+Views render from the primary for a while after the catalog changes, too. Their results are
+stored in the catalog and page caches under the new catalog version, for as long as the
+caches keep them, so a page rendered from a replica that hasn't replayed the change yet
+would keep serving the old catalog after the replica caught up. The change time is the
+catalog cache's "changed_at" entry, which never expires and which the file and Redis
+backends share with every worker.
+
+Migrations, seeding and `db.create_all()` only ever touch the primary: the models have
+no bind key, and the replica binds get no metadata of their own.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import functools
+import itertools
+import math
+import threading
+import time
+
+from flask import current_app, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import exc, text
+from sqlalchemy.sql.selectable import SelectBase
+
+BIND_PREFIX = "replica_"
+
+# Set on responses to writes, so the client's next requests read from the primary
+PRIMARY_COOKIE = "read_primary"
+
+# 0 on a primary, or on a replica that has replayed everything it received. NULL on a replica
+# that isn't streaming from the primary: it has replayed everything it received, but it receives
+# nothing, and falls further behind with every write. Roles without pg_read_all_stats see a NULL
+# status, so for them a running WAL receiver has to do.
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN NOT EXISTS (SELECT FROM pg_stat_wal_receiver WHERE coalesce(status, 'streaming') = 'streaming') THEN NULL"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to the replica bind in `info["replica"]`, and everything else to the usual bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get("replica")
+        if replica is not None and bind is None and not self._flushing and isinstance(clause, SelectBase):
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@dataclasses.dataclass
+class Replica:
+    bind: str
+    checked_at: float = -math.inf
+    lag: float | None = None
+    error: str | None = None
+    lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def reachable(self) -> bool:
+        return self.error is None and self.lag is not None
+
+
+class Router:
+    """The replicas of one app, their last known state, and the round-robin counter."""
+
+    def __init__(self, binds: list[str]):
+        self.replicas = [Replica(bind) for bind in binds]
+        self._turns = itertools.count()
+
+    def choose(self, config) -> Replica | None:
+        """The next usable replica in turn, or None to read from the primary."""
+        usable = [replica for replica in self.replicas if self._usable(replica, config)]
+        if not usable:
+            return None
+        return usable[next(self._turns) % len(usable)]
+
+    def _usable(self, replica: Replica, config) -> bool:
+        interval = config["REPLICA_CHECK_SECONDS"] if replica.reachable else config["REPLICA_RETRY_SECONDS"]
+        # One thread checks at a time; the others go by the last result meanwhile
+        if time.monotonic() - replica.checked_at >= interval and replica.lock.acquire(blocking=False):
+            try:
+                check(replica)
+            finally:
+                replica.lock.release()
+        return replica.reachable and replica.lag <= config["REPLICA_MAX_LAG_SECONDS"]
+
+
+def check(replica: Replica) -> None:
+    """Measures how far `replica` is behind the primary, recording an error if it can't be reached."""
+    from . import db
+
+    try:
+        with db.engines[replica.bind].connect() as connection:
+            lag = connection.execute(LAG_QUERY).scalar()
+    except exc.DBAPIError as error:
+        mark(replica, error=str(error.orig).strip())
+        return
+    if lag is None:
+        mark(replica, error="not streaming from the primary")
+    else:
+        mark(replica, lag=float(lag))
+
+
+def mark(replica: Replica, lag: float | None = None, error: str | None = None) -> None:
+    replica.checked_at = time.monotonic()
+    replica.lag = lag
+    replica.error = error
+    if error is not None:
+        current_app.logger.warning("Read replica %s is unavailable, reading from the primary: %s", replica.bind, error)
+
+
+def binds(config) -> dict:
+    """SQLALCHEMY_BINDS entries for the DATABASE_REPLICA_URIS, keyed "replica_0", "replica_1", ..."""
+    # Bind options replace SQLALCHEMY_ENGINE_OPTIONS keys rather than merging them, so keep its connect_args
+    connect_args = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS", {}).get("connect_args", {}))
+    # Without a timeout, a replica that drops packets holds the request until the OS gives up on it
+    connect_args["connect_timeout"] = int(config.get("REPLICA_CONNECT_TIMEOUT", 2))
+    return {
+        f"{BIND_PREFIX}{number}": {"url": uri, "connect_args": connect_args}
+        for number, uri in enumerate(config.get("DATABASE_REPLICA_URIS", []))
+    }
+
+
+def init_app(app):
+    """Call after `db.init_app`, with the replica binds already in SQLALCHEMY_BINDS."""
+    from . import db
+
+    app.config.setdefault("REPLICA_MAX_LAG_SECONDS", 10)
+    app.config.setdefault("REPLICA_CHECK_SECONDS", 5)
+    app.config.setdefault("REPLICA_RETRY_SECONDS", 30)
+    names = [name for name in app.config["SQLALCHEMY_BINDS"] if name.startswith(BIND_PREFIX)]
+    for name in names:
+        # The replicas share the primary's tables, so they need no metadata of their own. Without
+        # this, db.create_all() would also run on them, and fail in apps without these binds.
+        db.metadatas.pop(name, None)
+    app.extensions["replicas"] = Router(names)
+    if names:
+        app.after_request(_stick_to_primary_after_writes)
+
+
+def _stick_to_primary_after_writes(response):
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        # Replicas that are further behind than this aren't read from, so the write is visible by then
+        max_age = math.ceil(current_app.config["REPLICA_MAX_LAG_SECONDS"])
+        response.set_cookie(PRIMARY_COOKIE, "1", max_age=max_age, httponly=True, samesite="Lax")
+    return response
+
+
+def _catalog_changed_recently(config) -> bool:
+    """Whether a usable replica may not have replayed the last catalog change yet."""
+    from . import catalog
+
+    changed_at = catalog.changed_at()
+    if changed_at is None:
+        return False
+    # A replica's lag may have grown since it was last checked
+    window = config["REPLICA_MAX_LAG_SECONDS"] + config["REPLICA_CHECK_SECONDS"]
+    return time.time() - changed_at < window
+
+
+def replica_reads(view):
+    """Runs the SELECTs of `view` on a replica, when one is usable, the client hasn't just written
+    and the catalog hasn't just changed.
+
+    If the replica fails while the view runs, the replica is marked unavailable and the
+    view runs again on the primary. Only decorate views that don't write.
+    """
+
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+        from . import db
+
+        router = current_app.extensions["replicas"]
+        if not router.replicas or request.cookies.get(PRIMARY_COOKIE) or _catalog_changed_recently(current_app.config):
+            return view(**kwargs)
+        replica = router.choose(current_app.config)
+        if replica is None:
+            return view(**kwargs)
+
+        db.session.info["replica"] = replica.bind
+        try:
+            return view(**kwargs)
+        except (exc.OperationalError, exc.InterfaceError) as error:
+            mark(replica, error=str(error.orig).strip())
+            db.session.rollback()
+        finally:
+            db.session.info.pop("replica", None)
+        return view(**kwargs)
+
+    return wrapper
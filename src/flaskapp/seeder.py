@@ -1,47 +1,244 @@
 """
 Seeder module for the PostgreSQL database.
 """
+
+from __future__ import annotations
+
+import dataclasses
 import json
+import time
+from collections.abc import Iterator
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.dialects import postgresql
+
+from . import catalog, models
+
+# Rows per INSERT statement; SQLAlchemy batches each chunk into multi-row VALUES
+CHUNK_SIZE = 5000
+
+# Characters read from the seed file at a time when streaming
+READ_SIZE = 64 * 1024
+
+
+@dataclasses.dataclass
+class SeedReport:
+    destinations: int = 0
+    cruises: int = 0
+    links: int = 0
+    skipped: int = 0
+    timings: dict[str, float] = dataclasses.field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.timings.values())
 
-from . import models
+    def __str__(self):
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.timings.items())
+        return (
+            f"Inserted {self.destinations} destinations, {self.cruises} cruises and {self.links} links, "
+            f"skipped {self.skipped} existing rows in {self.seconds:.2f}s ({phases})"
+        )
 
 
-def seed_data(db, filename: str) -> None:
-    """Uses the JSON file to populate the database"""
+def seed_data(db, filename: str) -> SeedReport:
+    """Uses the JSON file to populate the database.
+
+    Rows whose primary key already exists are left untouched, so seeding is idempotent.
+    Everything is written in one transaction with bulk inserts.
+    """
+    report = SeedReport()
+    started = time.perf_counter()
+
     with open(filename) as f:
         data = json.load(f)
-        session = db.session
-
-        for entry in data:
-            if entry["model"] == "relecloud.destination":
-                destination = session.get(models.Destination, entry["pk"])
-
-                if destination is None:
-                    destination = models.Destination(
-                        name=entry["fields"]["name"],
-                        id=entry["pk"],
-                        description=entry["fields"]["description"],
-                    )
-                    session.add(destination)
-                    session.commit()
-                    session.refresh(destination)
-            if entry["model"] == "relecloud.cruise":
-                cruise = session.get(models.Cruise, entry["pk"])
-                if cruise is None:
-                    destinations = []
-
-                    for destination_id in entry["fields"]["destinations"]:
-                        destination = session.get(models.Destination, destination_id)
-                        if destination is None:
-                            raise Exception(f"Destination with id {destination_id} not found")
-                        destinations.append(destination)
-
-                    cruise = models.Cruise(
-                        name=entry["fields"]["name"],
-                        id=entry["pk"],
-                        description=entry["fields"]["description"],
-                        destinations=destinations,
-                    )
-                    session.add(cruise)
-                    session.commit()
-                    session.refresh(cruise)
+    destinations = [_row(entry) for entry in data if entry["model"] == "relecloud.destination"]
+    cruises = [_row(entry) for entry in data if entry["model"] == "relecloud.cruise"]
+    cruise_destinations = {
+        entry["pk"]: entry["fields"]["destinations"] for entry in data if entry["model"] == "relecloud.cruise"
+    }
+    report.timings["load"] = _lap(started)
+
+    session = db.session
+    try:
+        started = time.perf_counter()
+        existing_destinations = set(session.execute(select(models.Destination.id)).scalars())
+        existing_cruises = set(session.execute(select(models.Cruise.id)).scalars())
+        new_destinations = [row for row in destinations if row["id"] not in existing_destinations]
+        new_cruises = [row for row in cruises if row["id"] not in existing_cruises]
+        known_destinations = existing_destinations.union(row["id"] for row in new_destinations)
+        links = []
+        for row in new_cruises:
+            for destination_id in cruise_destinations[row["id"]]:
+                if destination_id not in known_destinations:
+                    raise ValueError(f"Destination with id {destination_id} not found")
+                links.append({"cruise_id": row["id"], "destination_id": destination_id})
+        report.skipped = len(destinations) + len(cruises) - len(new_destinations) - len(new_cruises)
+        report.timings["diff"] = _lap(started)
+
+        started = time.perf_counter()
+        report.destinations = _insert(session, models.Destination.__table__, new_destinations)
+        report.cruises = _insert(session, models.Cruise.__table__, new_cruises)
+        report.links = _insert(session, models.association_table, links)
+        report.timings["write"] = _lap(started)
+
+        started = time.perf_counter()
+        if session.get_bind().dialect.name == "postgresql":
+            for model in (models.Destination, models.Cruise):
+                _reset_sequence(session, model)
+        session.commit()
+        report.timings["commit"] = _lap(started)
+    except Exception:
+        session.rollback()
+        raise
+
+    # Bulk inserts bypass the ORM events that normally invalidate the catalog
+    if report.destinations or report.cruises:
+        catalog.invalidate()
+    return report
+
+
+def stream_data(db, filename: str, batch_size: int = CHUNK_SIZE) -> SeedReport:
+    """Populates the database from the file without loading all of it into memory.
+
+    The file may be a JSON array, as for `seed_data`, or newline-delimited JSON with one
+    entry per line. Entries are written in batches of `batch_size`, so peak memory depends
+    on the batch size rather than the file size. Only the destination ids are kept for the
+    whole run, to resolve cruise destinations without querying for each one. A cruise may
+    reference a destination that appears later in the file. Everything is still committed
+    in one transaction.
+    """
+    report = SeedReport(timings={"parse": 0.0, "write": 0.0})
+    session = db.session
+    try:
+        known_destinations = set(session.execute(select(models.Destination.id)).scalars())
+        pending_links = []
+        entries = iter_entries(filename)
+        while True:
+            started = time.perf_counter()
+            batch = [entry for _, entry in zip(range(batch_size), entries)]
+            report.timings["parse"] += _lap(started)
+            if not batch:
+                break
+
+            started = time.perf_counter()
+            destinations = [_row(entry) for entry in batch if entry["model"] == "relecloud.destination"]
+            cruises = [entry for entry in batch if entry["model"] == "relecloud.cruise"]
+            new_destinations = _new_rows(session, models.Destination, destinations)
+            new_cruises = _new_rows(session, models.Cruise, [_row(entry) for entry in cruises])
+            known_destinations.update(row["id"] for row in new_destinations)
+            new_cruise_ids = {row["id"] for row in new_cruises}
+            links = []
+            for entry in cruises:
+                if entry["pk"] not in new_cruise_ids:
+                    continue
+                for destination_id in entry["fields"]["destinations"]:
+                    link = {"cruise_id": entry["pk"], "destination_id": destination_id}
+                    (links if destination_id in known_destinations else pending_links).append(link)
+            report.destinations += _insert(session, models.Destination.__table__, new_destinations)
+            report.cruises += _insert(session, models.Cruise.__table__, new_cruises)
+            report.links += _insert(session, models.association_table, links)
+            report.skipped += len(destinations) + len(cruises) - len(new_destinations) - len(new_cruises)
+            report.timings["write"] += _lap(started)
+
+        started = time.perf_counter()
+        for link in pending_links:
+            if link["destination_id"] not in known_destinations:
+                raise ValueError(f"Destination with id {link['destination_id']} not found")
+        report.links += _insert(session, models.association_table, pending_links)
+        if session.get_bind().dialect.name == "postgresql":
+            for model in (models.Destination, models.Cruise):
+                _reset_sequence(session, model)
+        session.commit()
+        report.timings["commit"] = _lap(started)
+    except Exception:
+        session.rollback()
+        raise
+
+    if report.destinations or report.cruises:
+        catalog.invalidate()
+    return report
+
+
+def iter_entries(filename: str) -> Iterator[dict]:
+    """Yields the entries of a JSON array or newline-delimited JSON file one at a time."""
+    with open(filename) as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        if first == "[":
+            yield from _iter_array(f)
+        else:
+            f.seek(0)
+            yield from (json.loads(line) for line in f if line.strip())
+
+
+def _iter_array(f) -> Iterator[dict]:
+    """Decodes the elements of a JSON array whose opening bracket has been read, a chunk at a time."""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            if position == len(buffer):
+                raise json.JSONDecodeError("Expecting value", buffer, position)
+            entry, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The next entry is incomplete: read more of the file and try again
+            if eof:
+                raise
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield entry
+
+
+def _row(entry) -> dict:
+    fields = entry["fields"]
+    return {
+        "id": entry["pk"],
+        "name": fields["name"],
+        "subtitle": fields.get("subtitle"),
+        "description": fields.get("description"),
+    }
+
+
+def _new_rows(session, model, rows: list[dict]) -> list[dict]:
+    """The rows whose primary key is not in the table yet, found with one query."""
+    if not rows:
+        return []
+    existing = set(session.execute(select(model.id).where(model.id.in_([row["id"] for row in rows]))).scalars())
+    return [row for row in rows if row["id"] not in existing]
+
+
+def _insert(session, table, rows: list[dict]) -> int:
+    if not rows:
+        return 0
+    if session.get_bind().dialect.name == "postgresql":
+        # Rows written concurrently by another seeder since the diff are skipped, not errors
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    else:
+        statement = insert(table)
+    for start in range(0, len(rows), CHUNK_SIZE):
+        session.execute(statement, rows[start : start + CHUNK_SIZE])
+    return len(rows)
+
+
+def _reset_sequence(session, model) -> None:
+    """Moves the id sequence past the seeded primary keys, so new rows don't collide with them."""
+    table = model.__table__
+    max_id = session.execute(select(func.max(table.c.id))).scalar()
+    if max_id is None:
+        return
+    session.execute(
+        text("SELECT setval(pg_get_serial_sequence(:table, 'id'), :max_id)"),
+        {"table": table.name, "max_id": max_id},
+    )
+
+
+def _lap(started: float) -> float:
+    return time.perf_counter() - started
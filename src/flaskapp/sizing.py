@@ -0,0 +1,147 @@
+"""
+Gunicorn worker topology sizing.
+
+Sizes workers from the CPU and memory the container may actually use (its cgroup
+limits, not the host's core count) and threads from the database pool each worker
+can draw on, so the server never runs more concurrent requests than it can serve.
+Every value can be pinned with an environment variable.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import math
+import os
+from collections.abc import Mapping
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# cgroup v1 reports "no limit" as a very large number rather than "max"
+_UNLIMITED_MEMORY = 1 << 60
+
+
+@dataclasses.dataclass(frozen=True)
+class Topology:
+    workers: int
+    threads: int
+    worker_class: str
+    worker_connections: int
+    cpus: float
+    memory_limit: int | None
+    db_connections: int | None
+    warnings: tuple[str, ...] = ()
+
+    def describe(self) -> str:
+        memory = f"{self.memory_limit // (1024 * 1024)}MiB" if self.memory_limit else "unlimited"
+        db_connections = self.db_connections if self.db_connections is not None else "unpooled"
+        return (
+            f"{self.workers} {self.worker_class} workers x {self.threads} threads "
+            f"(cpus={self.cpus:g}, memory={memory}, max db connections={db_connections})"
+        )
+
+
+def cpu_limit(cgroup_root: str = CGROUP_ROOT) -> float:
+    """CPUs available to this process: the cgroup quota if set, else the CPUs it may run on."""
+    quota = _read_cpu_quota(cgroup_root)
+    if quota is not None:
+        return quota
+    if hasattr(os, "sched_getaffinity"):
+        return float(len(os.sched_getaffinity(0)))
+    return float(os.cpu_count() or 1)
+
+
+def memory_limit(cgroup_root: str = CGROUP_ROOT) -> int | None:
+    """The cgroup memory limit in bytes, or None if the container is not limited."""
+    for name in ("memory.max", "memory/memory.limit_in_bytes", "memory.limit_in_bytes"):
+        value = _read(os.path.join(cgroup_root, name))
+        if value is None:
+            continue
+        if value == "max" or int(value) >= _UNLIMITED_MEMORY:
+            return None
+        return int(value)
+    return None
+
+
+def compute(env: Mapping[str, str] = os.environ, cgroup_root: str = CGROUP_ROOT) -> Topology:
+    """Works out the worker topology from `env` and the cgroup limits.
+
+    Environment variables:
+        GUNICORN_WORKERS / WEB_CONCURRENCY: fixed worker count
+        GUNICORN_THREADS: fixed thread count per gthread worker
+        GUNICORN_WORKER_CLASS: "gthread" (default) or "gevent"
+        GUNICORN_WORKER_CONNECTIONS: concurrent requests per gevent worker
+        GUNICORN_WORKER_MEMORY_MB: expected memory per worker, used to cap workers
+        DB_POOL_MODE, DB_POOL_SIZE, DB_MAX_OVERFLOW: the per-worker database pool
+        DB_MAX_CONNECTIONS: connections the database allows this app, to warn on oversubscription
+    """
+    warnings = []
+    cpus = cpu_limit(cgroup_root)
+    memory = memory_limit(cgroup_root)
+    worker_class = env.get("GUNICORN_WORKER_CLASS", "gthread")
+    worker_connections = int(env.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+    if env.get("DB_POOL_MODE", "queue") == "null":
+        pool_capacity = None
+    else:
+        pool_capacity = int(env.get("DB_POOL_SIZE", 5)) + int(env.get("DB_MAX_OVERFLOW", 10))
+
+    fixed_workers = env.get("GUNICORN_WORKERS") or env.get("WEB_CONCURRENCY")
+    if fixed_workers:
+        workers = int(fixed_workers)
+    else:
+        workers = math.ceil(cpus) * 2 + 1
+        if memory is not None:
+            worker_memory = int(env.get("GUNICORN_WORKER_MEMORY_MB", 200)) * 1024 * 1024
+            max_workers = max(1, memory // worker_memory)
+            if max_workers < workers:
+                warnings.append(f"memory limit allows only {max_workers} of {workers} workers")
+                workers = max_workers
+
+    if worker_class == "gevent":
+        threads = 1
+    elif env.get("GUNICORN_THREADS"):
+        threads = int(env["GUNICORN_THREADS"])
+    else:
+        # A thread without a connection to use just queues on the pool
+        threads = pool_capacity if pool_capacity is not None else 8
+
+    db_connections = workers * pool_capacity if pool_capacity is not None else None
+    max_connections = env.get("DB_MAX_CONNECTIONS")
+    if max_connections and db_connections is not None and db_connections > int(max_connections):
+        warnings.append(f"{db_connections} pooled connections exceed DB_MAX_CONNECTIONS={max_connections}")
+
+    return Topology(
+        workers=workers,
+        threads=threads,
+        worker_class=worker_class,
+        worker_connections=worker_connections,
+        cpus=cpus,
+        memory_limit=memory,
+        db_connections=db_connections,
+        warnings=tuple(warnings),
+    )
+
+
+def _read_cpu_quota(cgroup_root):
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    value = _read(os.path.join(cgroup_root, "cpu.max"))
+    if value is not None:
+        quota, _, period = value.partition(" ")
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    # cgroup v1: quota is -1 when unlimited
+    for directory in ("cpu", "cpu,cpuacct", ""):
+        quota = _read(os.path.join(cgroup_root, directory, "cpu.cfs_quota_us"))
+        period = _read(os.path.join(cgroup_root, directory, "cpu.cfs_period_us"))
+        if quota is not None and period is not None:
+            return int(quota) / int(period) if int(quota) > 0 else None
+    return None
+
+
+def _read(path) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
@@ -0,0 +1,191 @@
+"""
+Container startup: apply migrations and seed data only when they have changed.
+
+After migrating and seeding, `run` records the alembic head and a SHA-256 of the seed
+file in the `app_metadata` table, along with how long each phase took. On the next start
+one query reads them back, and phases whose inputs are unchanged are skipped, so a new
+instance on scale-out goes straight to booting gunicorn.
+
+When something has to run, `run` first takes a Postgres advisory lock, so instances that
+start together migrate and seed one after another. The ones that wait find the work done.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import hashlib
+import os
+import time
+
+import flask_migrate
+from alembic.script import ScriptDirectory
+from flask import current_app
+from sqlalchemy import column, exc, func, literal, select, table, union_all
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+
+from . import models
+
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(__file__), "migrations")
+
+ALEMBIC_HEAD = "alembic_head"
+SEED_FINGERPRINT = "seed_fingerprint"
+
+# Written by alembic itself, so the check notices migrations run outside of startup
+_alembic_version = table("alembic_version", column("version_num"))
+_DATABASE_VERSION = "alembic_version"
+
+# pg_advisory_lock key held while one instance migrates and seeds; any constant unique to the app
+STARTUP_LOCK = 7_261_530_114
+
+
+@dataclasses.dataclass
+class Phase:
+    name: str
+    ran: bool
+    seconds: float
+    # How long the phase took when it last ran, if it was skipped this time
+    saved: float = 0.0
+    detail: str = ""
+
+    def __str__(self):
+        if self.ran:
+            return f"{self.name}: ran in {self.seconds:.2f}s" + (f" ({self.detail})" if self.detail else "")
+        return f"{self.name}: unchanged, skipped (saved {self.saved:.2f}s)"
+
+
+@dataclasses.dataclass
+class StartupReport:
+    phases: list[Phase] = dataclasses.field(default_factory=list)
+
+    @property
+    def saved(self) -> float:
+        return sum(phase.saved for phase in self.phases)
+
+    def __str__(self):
+        lines = [str(phase) for phase in self.phases]
+        if self.saved:
+            lines.append(f"Saved {self.saved:.2f}s in total")
+        return "\n".join(lines)
+
+
+def fingerprint(filename: str) -> str:
+    """SHA-256 of the file's contents."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def alembic_head(directory: str = MIGRATIONS_DIRECTORY) -> str:
+    """The newest revision in the migrations directory, read from the files without the database."""
+    config = current_app.extensions["migrate"].migrate.get_config(directory)
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def recorded(db) -> dict[str, str]:
+    """What the last startup recorded, plus the database's alembic version, in one query.
+
+    Returns an empty dict when either table does not exist yet.
+    """
+    metadata = models.AppMetadata.__table__
+    query = union_all(
+        select(metadata.c.key, metadata.c.value),
+        select(literal(_DATABASE_VERSION), _alembic_version.c.version_num),
+    )
+    try:
+        return dict(db.session.execute(query).all())
+    except exc.DBAPIError:
+        db.session.rollback()
+        return {}
+
+
+def record(db, values: dict[str, str]) -> None:
+    rows = [{"key": key, "value": value} for key, value in values.items()]
+    if db.session.get_bind().dialect.name == "postgresql":
+        # A single upsert, so two instances recording the same key don't collide on the primary key
+        statement = postgresql.insert(models.AppMetadata.__table__)
+        statement = statement.on_conflict_do_update(index_elements=["key"], set_={"value": statement.excluded.value})
+        db.session.execute(statement, rows)
+    else:
+        for row in rows:
+            db.session.merge(models.AppMetadata(**row))
+    db.session.commit()
+
+
+@contextlib.contextmanager
+def exclusive(db):
+    """Holds the startup advisory lock, waiting for any other instance that holds it."""
+    engine = db.engine
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    # A connection of its own: the session's goes back to the pool on every commit.
+    # Tests bind the app to a Connection, which can hold the lock itself.
+    connection = engine.connect() if isinstance(engine, Engine) else contextlib.nullcontext(engine)
+    with connection as lock_connection:
+        lock_connection.execute(select(func.pg_advisory_lock(STARTUP_LOCK)))
+        try:
+            yield
+        finally:
+            lock_connection.execute(select(func.pg_advisory_unlock(STARTUP_LOCK)))
+
+
+def seed(db, filename: str, force: bool = False, stream: bool = False, batch_size: int = 5000, facts=None, digest=None):
+    """Seeds from `filename` unless the same file was already seeded. Returns a `Phase`."""
+    from . import seeder
+
+    facts = recorded(db) if facts is None else facts
+    digest = fingerprint(filename) if digest is None else digest
+    if not force and facts.get(SEED_FINGERPRINT) == digest:
+        return Phase("seed", ran=False, seconds=0.0, saved=float(facts.get("seed_seconds", 0)))
+
+    started = time.perf_counter()
+    if stream:
+        seed_report = seeder.stream_data(db, filename, batch_size=batch_size)
+    else:
+        seed_report = seeder.seed_data(db, filename)
+    seconds = time.perf_counter() - started
+    record(db, {SEED_FINGERPRINT: digest, "seed_seconds": f"{seconds:.3f}"})
+    return Phase("seed", ran=True, seconds=seconds, detail=str(seed_report))
+
+
+def run(db, seed_file: str, directory: str = MIGRATIONS_DIRECTORY, force: bool = False) -> StartupReport:
+    """Migrates to the head revision and seeds from `seed_file`, skipping whichever is unchanged."""
+    facts = recorded(db)
+    head = alembic_head(directory)
+    digest = fingerprint(seed_file)
+    if not force and _is_current(facts, head, digest):
+        return _run(db, seed_file, directory, head, digest, facts, force)
+    with exclusive(db):
+        # Another instance may have done the work while this one waited for the lock
+        return _run(db, seed_file, directory, head, digest, recorded(db), force)
+
+
+def _is_current(facts: dict[str, str], head: str, seed_digest: str) -> bool:
+    return (
+        facts.get(ALEMBIC_HEAD) == head
+        and facts.get(_DATABASE_VERSION) == head
+        and facts.get(SEED_FINGERPRINT) == seed_digest
+    )
+
+
+def _run(
+    db, seed_file: str, directory: str, head: str, digest: str, facts: dict[str, str], force: bool
+) -> StartupReport:
+    report = StartupReport()
+    if not force and facts.get(ALEMBIC_HEAD) == head and facts.get(_DATABASE_VERSION) == head:
+        report.phases.append(Phase("migrate", ran=False, seconds=0.0, saved=float(facts.get("migrate_seconds", 0))))
+    else:
+        started = time.perf_counter()
+        flask_migrate.upgrade(directory=directory)
+        seconds = time.perf_counter() - started
+        record(db, {ALEMBIC_HEAD: head, "migrate_seconds": f"{seconds:.3f}"})
+        report.phases.append(Phase("migrate", ran=True, seconds=seconds))
+        # The upgrade may have created the metadata table, so what was read before is stale
+        facts = recorded(db)
+
+    report.phases.append(seed(db, seed_file, force=force, facts=facts, digest=digest))
+    return report
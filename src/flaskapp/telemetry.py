@@ -0,0 +1,110 @@
+"""
+Azure Monitor OpenTelemetry setup.
+
+Nothing here is imported or installed unless APPLICATIONINSIGHTS_CONNECTION_STRING
+is set, so an app without telemetry pays nothing at import time or per request.
+With TELEMETRY_DEFERRED the exporter is set up on a background thread while the
+worker serves its first requests; requests that arrive before it is ready are not traced.
+"""
+
+import os
+import threading
+
+from flask import current_app, request
+
+
+class _DeferredMiddleware:
+    """WSGI middleware that passes requests through until telemetry is ready, then traces them.
+
+    When deferred, setup starts on the first request rather than in `create_app`, so it
+    runs in the process that serves requests even when gunicorn preloads the app.
+    """
+
+    def __init__(self, app, deferred):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.deferred = deferred
+        self.traced_app = None
+        self.ready = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if self.traced_app is not None:
+            return self.traced_app(environ, start_response)
+        if self.deferred and not self._started:
+            self._start()
+        return self.wsgi_app(environ, start_response)
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._configure, name="telemetry-setup", daemon=True).start()
+
+    def _configure(self):
+        try:
+            configure(self.app)
+        except Exception:
+            self.app.logger.exception("Telemetry setup failed; requests will not be traced")
+
+    def install(self, traced_app):
+        self.traced_app = traced_app
+        self.ready.set()
+
+
+def init_app(app):
+    if not app.config.get("APPLICATIONINSIGHTS_CONNECTION_STRING"):
+        return
+
+    deferred = app.config.get("TELEMETRY_DEFERRED", True)
+    middleware = _DeferredMiddleware(app, deferred)
+    app.wsgi_app = middleware
+    app.extensions["telemetry"] = middleware
+    app.before_request(_name_span_after_route)
+    if not deferred:
+        configure(app)
+
+
+def configure(app) -> None:
+    """Imports and configures the Azure Monitor distro, then starts tracing requests."""
+    # Read by the OpenTelemetry SDK when the distro builds its batch processors and metric reader
+    for variable, setting in (
+        ("OTEL_BSP_MAX_QUEUE_SIZE", "TELEMETRY_MAX_QUEUE_SIZE"),
+        ("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "TELEMETRY_MAX_EXPORT_BATCH_SIZE"),
+        ("OTEL_BSP_SCHEDULE_DELAY", "TELEMETRY_EXPORT_INTERVAL_MS"),
+        ("OTEL_BLRP_MAX_QUEUE_SIZE", "TELEMETRY_MAX_QUEUE_SIZE"),
+        ("OTEL_BLRP_SCHEDULE_DELAY", "TELEMETRY_EXPORT_INTERVAL_MS"),
+        ("OTEL_METRIC_EXPORT_INTERVAL", "TELEMETRY_METRIC_EXPORT_INTERVAL_MS"),
+    ):
+        if app.config.get(setting) is not None:
+            os.environ.setdefault(variable, str(app.config[setting]))
+
+    from azure.monitor.opentelemetry import configure_azure_monitor
+    from opentelemetry.instrumentation.wsgi import OpenTelemetryMiddleware
+
+    configure_azure_monitor(
+        connection_string=app.config["APPLICATIONINSIGHTS_CONNECTION_STRING"],
+        sampling_ratio=float(app.config.get("TELEMETRY_SAMPLING_RATIO", 1.0)),
+        # Requests are traced by the WSGI middleware below; patching the Flask class
+        # would not reach an app that already exists.
+        instrumentation_options={"flask": {"enabled": False}},
+    )
+    middleware = app.extensions["telemetry"]
+    middleware.install(OpenTelemetryMiddleware(middleware.wsgi_app))
+
+
+def is_ready(app) -> bool:
+    middleware = app.extensions.get("telemetry")
+    return middleware is not None and middleware.ready.is_set()
+
+
+def _name_span_after_route():
+    if request.url_rule is None or not is_ready(current_app):
+        return
+    from opentelemetry import trace
+
+    span = trace.get_current_span()
+    span.update_name(f"{request.method} {request.url_rule.rule}")
+    span.set_attribute("http.route", request.url_rule.rule)
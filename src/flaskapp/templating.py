@@ -0,0 +1,72 @@
+"""
+Template compilation and rendering caches.
+
+Every worker compiles each template to Python code on first use, again after gunicorn
+recycles it, and again in each new worker. With TEMPLATE_BYTECODE_CACHE on, the compiled
+code is written to a directory shared by the workers on the host
+(TEMPLATE_BYTECODE_CACHE_DIR, in /dev/shm by default), so a template is compiled once per
+host and every other worker only loads it. Entries are keyed by a checksum of the
+template's source, so an edited template is compiled again.
+
+`{% cache "name" %}...{% endcache %}` renders the enclosed markup once and stores it in the
+fragment cache (FRAGMENT_CACHE_*, the same backends as the catalog and page caches), for
+parts of a page that are the same on every request, such as the navbar. Expressions after
+the name become part of the key, for fragments that vary:
+
+    {% cache "cruise-card", cruise.id %}...{% endcache %}
+
+Keys also include the template's source checksum and the static asset build, so editing
+the template or rebuilding the assets stops old fragments from being used.
+"""
+
+import hashlib
+import os
+
+from flask import current_app, has_request_context, request
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from . import cache
+
+
+def init_app(app):
+    app.config.setdefault("TEMPLATE_BYTECODE_CACHE", True)
+    app.config.setdefault("TEMPLATE_BYTECODE_CACHE_DIR", None)
+    if app.config["TEMPLATE_BYTECODE_CACHE"]:
+        directory = app.config["TEMPLATE_BYTECODE_CACHE_DIR"] or os.path.join(cache._default_cache_root(), "jinja")
+        # The cache holds code the workers run, so only the app's user may write to it
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache.private_directory(directory))
+    app.extensions["fragment_cache"] = cache.from_config(app.config, prefix="fragment")
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+
+class FragmentCacheExtension(Extension):
+    """The `{% cache name[, key...] %}...{% endcache %}` tag."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        keys = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            keys.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        # Computed when the template is compiled, so the checksum is baked into its code
+        prefix = nodes.Const(f"{parser.name}:{self._checksum(parser.name)}")
+        call = self.call_method("_render", [prefix, nodes.List(keys)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _checksum(self, name):
+        if name is None or self.environment.loader is None:
+            return ""
+        source, _, _ = self.environment.loader.get_source(self.environment, name)
+        return hashlib.sha256(source.encode()).hexdigest()[:12]
+
+    def _render(self, prefix, keys, caller):
+        # url_for output depends on where the app is mounted and on the asset build
+        manifest = current_app.extensions.get("assets")
+        build = manifest.source[:12] if manifest is not None else ""
+        script_root = request.script_root if has_request_context() else ""
+        key = f"{prefix}:{build}:{script_root}:" + ":".join(str(key) for key in keys)
+        return Markup(current_app.extensions["fragment_cache"].get_or_set(key, caller))
@@ -0,0 +1,140 @@
+"""
+Per-request performance instrumentation.
+
+For every request this records how many SQL statements ran and how long they took, how
+long templates took to render, and the total time in the app. The numbers are sent back in
+a `Server-Timing` header (shown in the browser's network panel), added to the request's
+span when telemetry is on, and logged for requests and statements slower than
+SLOW_REQUEST_MS and SLOW_QUERY_MS. Statements run outside a request, such as by the info
+request flusher, are still checked against SLOW_QUERY_MS.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import time
+
+from flask import current_app, g, has_app_context, request, template_rendered
+from flask.signals import before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class RequestTiming:
+    started: float
+    statements: int = 0
+    db_seconds: float = 0.0
+    render_seconds: float = 0.0
+    slowest_statement: tuple[float, str] | None = None
+    _render_started: list[float] = dataclasses.field(default_factory=list)
+
+    def server_timing(self, total: float) -> str:
+        return ", ".join(
+            [
+                f'db;dur={self.db_seconds * 1000:.1f};desc="{self.statements} queries"',
+                f"render;dur={self.render_seconds * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ]
+        )
+
+
+def init_app(app):
+    app.config.setdefault("SERVER_TIMING_HEADER", True)
+    app.config.setdefault("SLOW_REQUEST_MS", 1000)
+    app.config.setdefault("SLOW_QUERY_MS", 200)
+    app.before_request(_start)
+    app.after_request(_finish)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+
+def current() -> RequestTiming | None:
+    """The timing of the request being served, or None outside of one."""
+    return g.get("request_timing") if has_app_context() else None
+
+
+def _start():
+    g.request_timing = RequestTiming(started=time.perf_counter())
+
+
+def _finish(response):
+    timing = current()
+    if timing is None:
+        return response
+    total = time.perf_counter() - timing.started
+    if current_app.config["SERVER_TIMING_HEADER"]:
+        response.headers.add("Server-Timing", timing.server_timing(total))
+    if telemetry.is_ready(current_app):
+        _annotate_span(timing, total)
+    if total * 1000 >= current_app.config["SLOW_REQUEST_MS"]:
+        slowest = timing.slowest_statement
+        logger.warning(
+            "Slow request %s %s: %.0f ms (%d queries in %.0f ms, rendering %.0f ms)%s",
+            request.method,
+            request.full_path if request.query_string else request.path,
+            total * 1000,
+            timing.statements,
+            timing.db_seconds * 1000,
+            timing.render_seconds * 1000,
+            f"; slowest query took {slowest[0] * 1000:.0f} ms: {slowest[1]}" if slowest else "",
+        )
+    return response
+
+
+def _annotate_span(timing: RequestTiming, total: float) -> None:
+    from opentelemetry import trace
+
+    span = trace.get_current_span()
+    span.set_attribute("app.db.statements", timing.statements)
+    span.set_attribute("app.db.duration_ms", timing.db_seconds * 1000)
+    span.set_attribute("app.render.duration_ms", timing.render_seconds * 1000)
+    span.set_attribute("app.duration_ms", total * 1000)
+
+
+def _render_started(sender, template, context, **extra):
+    timing = current()
+    if timing is not None:
+        timing._render_started.append(time.perf_counter())
+
+
+def _render_finished(sender, template, context, **extra):
+    timing = current()
+    if timing is not None and timing._render_started:
+        timing.render_seconds += time.perf_counter() - timing._render_started.pop()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("statement_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if not has_app_context():
+        return
+    timing = current()
+    if timing is not None:
+        timing.statements += 1
+        timing.db_seconds += elapsed
+        if timing.slowest_statement is None or elapsed > timing.slowest_statement[0]:
+            timing.slowest_statement = (elapsed, statement)
+    if elapsed * 1000 >= current_app.config.get("SLOW_QUERY_MS", float("inf")):
+        logger.warning("Slow query: %.0f ms: %s", elapsed * 1000, statement)
+
+
+@event.listens_for(Engine, "handle_error")
+def _statement_failed(exception_context):
+    # after_cursor_execute doesn't run for a failed statement, so drop its start time here
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("statement_started"):
+        connection.info["statement_started"].pop()
@@ -1,11 +1,95 @@
-import multiprocessing
+import gc
+import os
+import shutil
+import tempfile
+
+from flaskapp import sizing
 
 max_requests = 1000
 max_requests_jitter = 50
 log_file = "-"
 bind = "0.0.0.0:8000"
-workers = (multiprocessing.cpu_count() * 2) + 1
 
-threads = workers
+# Sized from the container's CPU/memory limits and the DB pool; see flaskapp/sizing.py for overrides.
+# With GUNICORN_WORKER_CLASS=gevent each worker serves each request on a greenlet, so one
+# worker can hold hundreds of requests that are waiting on Postgres.
+topology = sizing.compute()
+workers = topology.workers
+threads = topology.threads
+worker_class = topology.worker_class
+worker_connections = topology.worker_connections
 
 timeout = 600
+
+# GUNICORN_PRELOAD=true builds the app once in the master and forks it into the workers,
+# which speeds up worker boot and shares the app's memory between them. Not for gevent
+# workers: the master doesn't monkey-patch, so the app would skip the cooperative psycopg2
+# setup and every worker would block on Postgres.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "false").lower() == "true"
+if preload_app and worker_class == "gevent":
+    raise RuntimeError("GUNICORN_PRELOAD=true cannot be used with GUNICORN_WORKER_CLASS=gevent")
+
+# Each worker writes its Prometheus metrics to files in this directory, and /metrics adds them
+# up; see flaskapp/metrics.py. Gunicorn sets raw_env before it loads the app, so the variable is
+# in place before prometheus_client is imported, even with preload_app.
+# Off by default in production, as in the app's config.
+metrics_default = "false" if "RUNNING_IN_PRODUCTION" in os.environ else "true"
+metrics_enabled = os.environ.get("METRICS_ENABLED", metrics_default).lower() == "true"
+metrics_directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.path.join(
+    tempfile.gettempdir(), "flaskapp-metrics"
+)
+raw_env = [f"PROMETHEUS_MULTIPROC_DIR={metrics_directory}"] if metrics_enabled else []
+
+
+def on_starting(server):
+    if metrics_enabled:
+        # Files left by an earlier server would be added to this one's totals
+        shutil.rmtree(metrics_directory, ignore_errors=True)
+        os.makedirs(metrics_directory, exist_ok=True)
+        # Imported now rather than in child_exit: that runs in the SIGCHLD handler, which can fire
+        # again while the import is under way, and a re-entered import kills the master
+        import prometheus_client.multiprocess  # noqa: F401
+
+
+def when_ready(server):
+    server.log.info("Worker topology: %s", topology.describe())
+    for warning in topology.warnings:
+        server.log.warning("Worker topology: %s", warning)
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Move everything allocated so far out of the collector's reach, so that collections in
+        # the workers don't write to (and so copy) the pages they share with the master.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from flaskapp import pool
+
+        pool.dispose_inherited(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    # Runs once the worker has loaded the app (post_fork runs before that unless preload_app is set),
+    # so the connections opened here belong to this worker's own pool.
+    from flaskapp import pool
+
+    opened = pool.prewarm(worker.wsgi)
+    worker.log.info("Pre-warmed %d database connections", opened)
+
+
+def worker_exit(server, worker):
+    if metrics_enabled:
+        from flaskapp import metrics
+
+        metrics.record_worker_exit(worker)
+
+
+def child_exit(server, worker):
+    if metrics_enabled:
+        from prometheus_client import multiprocess
+
+        # Drops the exited worker from the gauges that only count live workers
+        multiprocess.mark_process_dead(worker.pid, metrics_directory)
@@ -0,0 +1,8 @@
+#!/bin/bash
+set -e
+# Run once per deploy, after Oryx installs the requirements (POST_BUILD_COMMAND in infra/web.bicep),
+# so the instances start from the same prebuilt files instead of each rebuilding them in the shared app folder.
+# Writes resized copies of the images in the templates, encoding only images changed since the last build
+python3 -m flask --app flaskapp images build
+# Fingerprints and precompresses the static files, including those copies
+python3 -m flask --app flaskapp assets build
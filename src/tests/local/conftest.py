@@ -6,8 +6,10 @@ import sys
 import ephemeral_port_reserve
 import pytest
 from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
-from flaskapp import create_app, db, seeder
+from flaskapp import catalog, create_app, db, seeder
 
 # Set start method to "fork" to avoid issues with pickling on OSes that default to "spawn"
 if sys.platform == "win32":
@@ -51,6 +53,34 @@ def app_with_db():
         engines[key] = engine
 
 
+@pytest.fixture
+def rollback_after(app_with_db):
+    """Runs the test in a savepoint that is rolled back, so rows it commits don't leak into other tests."""
+    with app_with_db.app_context():
+        # The session creates its own savepoint inside this one, so its commits stay revocable
+        savepoint = db.engine.begin_nested()
+        yield
+        db.session.remove()
+        savepoint.rollback()
+        catalog.invalidate()
+
+
+@pytest.fixture
+def client(app_with_db):
+    """A test client for the session app, with the catalog caches emptied first."""
+    with app_with_db.app_context():
+        catalog.invalidate()
+    return app_with_db.test_client()
+
+
+@pytest.fixture
+def app_context(app_with_db):
+    """Runs the test in an app context, with the catalog caches emptied first."""
+    with app_with_db.app_context():
+        catalog.invalidate()
+        yield
+
+
 @pytest.fixture(scope="session")
 def live_server_url(app_with_db):
     """Returns the url of the live server"""
@@ -73,3 +103,25 @@ def live_server_url(app_with_db):
 
     # Clean up the process
     proc.kill()
+
+
+class StatementCounter:
+    """Collects the SQL statements executed while it is active."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@pytest.fixture
+def count_statements():
+    """Yields a `StatementCounter` that records every statement sent to the database."""
+    counter = StatementCounter()
+    event.listen(Engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(Engine, "before_cursor_execute", counter)
@@ -0,0 +1,92 @@
+import gzip
+import json
+
+import brotli
+import pytest
+
+from flaskapp import api, catalog, db, models
+
+
+@pytest.fixture
+def mars(app_with_db):
+    with app_with_db.app_context():
+        return db.session.execute(db.select(models.Destination).where(models.Destination.name == "Mars")).scalar_one()
+
+
+def test_destinations_have_all_fields_by_default(client):
+    body = client.get("/api/v1/destinations").get_json()
+
+    first = body["data"][0]
+    assert set(first) == {"id", "name", "subtitle", "description", "cruises"}
+    assert all(set(cruise) == {"id", "name"} for cruise in first["cruises"])
+    assert body["links"] == {"prev": None, "next": None}
+
+
+def test_sparse_fieldset(client):
+    body = client.get("/api/v1/cruises?fields=name").get_json()
+
+    assert body["data"] and all(set(item) == {"id", "name"} for item in body["data"])
+
+
+def test_unknown_field_is_a_json_400(client):
+    response = client.get("/api/v1/cruises?fields=name,price")
+
+    assert response.status_code == 400
+    assert "price" in response.get_json()["error"]["detail"]
+
+
+def test_detail_and_json_404(app_with_db, client, mars):
+    body = client.get(f"/api/v1/destinations/{mars.id}?fields=name,cruises").get_json()
+    assert body["data"]["name"] == "Mars"
+    with app_with_db.app_context():
+        expected = [{"id": cruise.id, "name": cruise.name} for cruise in catalog.destination(mars.id).cruises]
+    assert sorted(body["data"]["cruises"], key=lambda cruise: cruise["id"]) == sorted(
+        expected, key=lambda cruise: cruise["id"]
+    )
+
+    response = client.get("/api/v1/cruises/999999")
+    assert response.status_code == 404
+    assert response.get_json()["error"]["status"] == 404
+
+
+def test_pagination_links(client):
+    first = client.get("/api/v1/destinations?fields=name&limit=2").get_json()
+    assert first["links"]["prev"] is None
+
+    second = client.get(first["links"]["next"]).get_json()
+    assert second["data"][0]["id"] > first["data"][-1]["id"]
+    assert client.get(second["links"]["prev"]).get_json()["data"] == first["data"]
+
+
+@pytest.mark.parametrize("encoding, decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)])
+def test_compressed_responses(client, encoding, decompress):
+    plain = client.get("/api/v1/destinations")
+    response = client.get("/api/v1/destinations", headers={"Accept-Encoding": f"{encoding}, identity"})
+
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.headers["ETag"] != plain.headers["ETag"]
+    assert json.loads(decompress(response.data)) == plain.get_json()
+
+
+def test_small_bodies_are_not_compressed(client, mars):
+    response = client.get(f"/api/v1/destinations/{mars.id}?fields=name", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+
+
+def test_cached_body_and_conditional_get(client, count_statements):
+    etag = client.get("/api/v1/cruises").headers["ETag"]
+    count_statements.statements.clear()
+
+    assert client.get("/api/v1/cruises").headers["ETag"] == etag
+    response = client.get("/api/v1/cruises", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert len(count_statements) == 0
+
+
+def test_dumps_matches_the_standard_encoder():
+    document = {"data": [{"id": 1, "name": "Ceres", "subtitle": None, "description": "Dwarf planet ☄"}]}
+
+    assert json.loads(api.dumps(document)) == document
@@ -0,0 +1,125 @@
+import gzip
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import brotli
+import pytest
+from flask import url_for
+
+from flaskapp import assets
+
+STATIC_FOLDER = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "static")
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    for name in ("res/css/theme.css", "res/css/theme.css.map", "res/img/small-logo.png", "manifest.json"):
+        os.makedirs(tmp_path / os.path.dirname(name), exist_ok=True)
+        shutil.copy(os.path.join(STATIC_FOLDER, name), tmp_path / name)
+    # A stylesheet that references a file in the folder, as theme.css itself doesn't
+    (tmp_path / "res/css/logo.css").write_text(
+        '.logo { background: url("../img/small-logo.png?v=1"); }\n'
+        ".mark { background: url(data:image/png;base64,AAAA); }\n"
+        "/*# sourceMappingURL=theme.css.map */\n"
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def built(app_with_db, static_folder, monkeypatch):
+    assets.build(str(static_folder))
+    monkeypatch.setattr(app_with_db, "static_folder", str(static_folder))
+    assets.load(app_with_db)
+    yield app_with_db
+    monkeypatch.undo()
+    assets.load(app_with_db)
+
+
+def test_build_fingerprints_and_precompresses(static_folder):
+    manifest, built = assets.build(str(static_folder))
+
+    assert built
+    css = manifest.files["res/css/theme.css"]
+    assert re.fullmatch(r"build/res/css/theme\.[0-9a-f]{12}\.css", css.path)
+    assert css.encodings == ("br", "gzip")
+    content = (static_folder / css.path).read_bytes()
+    assert brotli.decompress((static_folder / (css.path + ".br")).read_bytes()) == content
+    assert gzip.decompress((static_folder / (css.path + ".gz")).read_bytes()) == content
+    # Images are left uncompressed
+    assert manifest.files["res/img/small-logo.png"].encodings == ()
+    assert assets.read_manifest(str(static_folder)) == manifest
+
+
+def test_build_is_skipped_when_nothing_changed(static_folder):
+    first, _ = assets.build(str(static_folder))
+
+    assert assets.build(str(static_folder)) == (first, False)
+    assert assets.build(str(static_folder), force=True)[1]
+
+    (static_folder / "res/css/theme.css").write_text("body { color: red; }")
+    manifest, built = assets.build(str(static_folder))
+    assert built
+    assert manifest.files["res/css/theme.css"].path != first.files["res/css/theme.css"].path
+    assert not (static_folder / first.files["res/css/theme.css"].path).exists()
+
+
+def test_concurrent_builds_replace_the_build_whole(static_folder):
+    first, _ = assets.build(str(static_folder))
+    # Left behind by a build that was killed while swapping
+    (static_folder / f"build.old-{os.getpid()}").mkdir()
+
+    (static_folder / "res/css/theme.css").write_text("body { color: red; }")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: assets.build(str(static_folder)), range(4)))
+
+    # One build ran, the others waited for it and found it current
+    assert sorted(built for _, built in results) == [False, False, False, True]
+    assert sorted(os.listdir(static_folder)) == ["build", "build.lock", "manifest.json", "res"]
+    assert "build.lock" not in first.files and assets.read_manifest(str(static_folder)) == results[0][0]
+
+
+def test_build_rewrites_css_references(static_folder):
+    manifest, _ = assets.build(str(static_folder))
+
+    css = (static_folder / manifest.files["res/css/logo.css"].path).read_text()
+    logo = os.path.basename(manifest.files["res/img/small-logo.png"].path)
+    source_map = os.path.basename(manifest.files["res/css/theme.css.map"].path)
+    assert f'url("../img/{logo}?v=1")' in css
+    assert "url(data:image/png;base64,AAAA)" in css
+    assert f"sourceMappingURL={source_map} */" in css
+
+
+def test_url_for_links_to_fingerprinted_files(built):
+    manifest = built.extensions["assets"]
+
+    with built.test_request_context():
+        assert url_for("static", filename="res/css/theme.css") == "/static/" + manifest.files["res/css/theme.css"].path
+        assert url_for("static", filename="unknown.css") == "/static/unknown.css"
+
+
+@pytest.mark.parametrize("accept, encoding", [("br, gzip", "br"), ("gzip", "gzip"), ("identity", None)])
+def test_serves_precompressed_variant(built, accept, encoding):
+    path = built.extensions["assets"].files["res/css/theme.css"].path
+
+    response = built.test_client().get(f"/static/{path}", headers={"Accept-Encoding": accept})
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/css"
+    assert response.content_encoding == encoding
+    assert "Accept-Encoding" in response.vary
+    assert response.cache_control.immutable and response.cache_control.public
+    assert response.cache_control.max_age == assets.ONE_YEAR
+    body = {"br": brotli.decompress, "gzip": gzip.decompress, None: bytes}[encoding](response.data)
+    with open(os.path.join(built.static_folder, path), "rb") as f:
+        assert body == f.read()
+
+
+def test_unbuilt_files_are_served_as_before(built):
+    response = built.test_client().get("/static/manifest.json", headers={"Accept-Encoding": "br"})
+
+    assert response.status_code == 200
+    assert response.content_encoding is None
+    assert not response.cache_control.immutable
+    assert built.test_client().get("/static/missing.css").status_code == 404
@@ -0,0 +1,80 @@
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, Table, text
+
+from flaskapp import audit, db
+
+
+def probe_metadata():
+    """Models for a table that the tests create without its foreign key or index."""
+    metadata = MetaData()
+    Table("cruise", metadata, Column("id", Integer, primary_key=True))
+    Table(
+        "audit_probe",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("cruise_id", ForeignKey("cruise.id")),
+    )
+    return metadata
+
+
+def probe_query():
+    db.session.execute(text("SELECT id FROM audit_probe WHERE cruise_id = :cruise_id"), {"cruise_id": 1}).all()
+
+
+def test_migrated_schema_has_no_findings(app_with_db):
+    with app_with_db.app_context():
+        assert audit.audit() == []
+
+
+def test_audit_command(app_with_db):
+    result = app_with_db.test_cli_runner().invoke(args=["db", "audit"])
+
+    assert result.exit_code == 0
+    assert "No schema issues found." in result.output
+
+
+def test_flags_missing_and_unindexed_foreign_keys(rollback_after):
+    db.session.execute(text("CREATE TABLE audit_probe (id SERIAL PRIMARY KEY, cruise_id INTEGER)"))
+
+    findings = audit.check_foreign_keys(probe_metadata(), db.inspect(db.session.connection()))
+
+    assert [(finding.kind, finding.table) for finding in findings] == [
+        ("missing-foreign-key", "audit_probe"),
+        ("unindexed-foreign-key", "audit_probe"),
+    ]
+
+
+def test_index_satisfies_foreign_key_check(rollback_after):
+    db.session.execute(text("CREATE TABLE audit_probe (id SERIAL PRIMARY KEY, cruise_id INTEGER REFERENCES cruise)"))
+    db.session.execute(text("CREATE INDEX ix_audit_probe_cruise_id ON audit_probe (cruise_id)"))
+
+    assert audit.check_foreign_keys(probe_metadata(), db.inspect(db.session.connection())) == []
+
+
+def test_flags_filtered_query_without_index(rollback_after):
+    db.session.execute(text("CREATE TABLE audit_probe (id SERIAL PRIMARY KEY, cruise_id INTEGER)"))
+    db.session.commit()
+
+    findings = audit.check_query_plans([("probe", probe_query)])
+
+    assert [(finding.kind, finding.table) for finding in findings] == [("full-scan", "audit_probe")]
+
+    db.session.execute(text("CREATE INDEX ix_audit_probe_cruise_id ON audit_probe (cruise_id)"))
+    db.session.commit()
+
+    assert audit.check_query_plans([("probe", probe_query)]) == []
+
+
+def test_flags_foreign_keys_that_were_never_validated(rollback_after):
+    db.session.execute(text("CREATE TABLE audit_probe (id SERIAL PRIMARY KEY, cruise_id INTEGER)"))
+    db.session.execute(
+        text(
+            "ALTER TABLE audit_probe ADD CONSTRAINT audit_probe_cruise_id_fkey"
+            " FOREIGN KEY (cruise_id) REFERENCES cruise NOT VALID"
+        )
+    )
+
+    findings = audit.check_unvalidated_constraints()
+    assert [(finding.kind, finding.table) for finding in findings] == [("unvalidated-foreign-key", "audit_probe")]
+
+    db.session.execute(text("ALTER TABLE audit_probe VALIDATE CONSTRAINT audit_probe_cruise_id_fkey"))
+    assert audit.check_unvalidated_constraints() == []
@@ -0,0 +1,131 @@
+import importlib
+import io
+import json
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import text
+
+from flaskapp import bulk, db, models
+
+
+@pytest.fixture
+def requests(rollback_after):
+    cruise_ids = db.session.execute(db.select(models.Cruise.id).order_by(models.Cruise.id).limit(2)).scalars().all()
+    db.session.add_all(
+        models.InfoRequest(
+            name=f"Lead {n}",
+            email=f"lead{n}@example.com",
+            notes='Says "hi",\nthen leaves',
+            cruise_id=cruise_ids[n % 2],
+            dedup_key=f"lead-{n}",
+        )
+        for n in range(6)
+    )
+    db.session.commit()
+    return cruise_ids
+
+
+def exported(fmt, **filters):
+    out = io.BytesIO()
+    count = bulk.export_info_requests(db, out, fmt, **filters)
+    return count, out.getvalue().decode()
+
+
+def test_export_csv_and_ndjson(requests):
+    count, text = exported("csv", cruise_ids=[requests[0]])
+    assert count == 3
+    assert text.splitlines()[0] == "id,name,email,notes,cruise_id,dedup_key"
+
+    count, text = exported("ndjson", cruise_ids=requests)
+    rows = [json.loads(line) for line in text.splitlines()]
+    assert count == len(rows) == 6
+    assert rows[0]["notes"] == 'Says "hi",\nthen leaves'
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+
+
+def test_export_id_range(requests):
+    _, text = exported("ndjson", cruise_ids=requests)
+    ids = [json.loads(line)["id"] for line in text.splitlines()]
+
+    count, text = exported("ndjson", cruise_ids=requests, min_id=ids[1], max_id=ids[3])
+
+    assert count == 3 and [json.loads(line)["id"] for line in text.splitlines()] == ids[1:4]
+
+
+@pytest.mark.parametrize("fmt", bulk.FORMATS)
+def test_round_trip_is_idempotent(requests, fmt):
+    _, text = exported(fmt, cruise_ids=requests)
+
+    report = bulk.import_info_requests(db, io.BytesIO(text.encode()), fmt)
+
+    assert (report.read, report.inserted, report.duplicates, report.rejected) == (6, 0, 6, 0)
+
+
+def test_import_inserts_new_rows_and_rejects_invalid_ones(requests):
+    lines = [
+        {"name": "New", "email": "new@example.com", "notes": "n", "cruise_id": requests[0], "dedup_key": "new-1"},
+        {"name": "Again", "email": "new@example.com", "notes": "n", "cruise_id": requests[0], "dedup_key": "new-1"},
+        {"name": "No key", "email": "x@example.com", "notes": "n", "cruise_id": requests[1]},
+        {"name": "Lost", "email": "x@example.com", "notes": "n", "cruise_id": 999999},
+        {"name": "Long", "email": "x@example.com", "notes": "n" * 256, "cruise_id": requests[0]},
+        {"name": "Bad id", "email": "x@example.com", "notes": "n", "cruise_id": "seven"},
+    ]
+    source = io.BytesIO("\n".join(json.dumps(line) for line in lines).encode())
+
+    report = bulk.import_info_requests(db, source, "ndjson")
+
+    assert (report.read, report.inserted, report.duplicates, report.rejected) == (6, 2, 1, 3)
+    names = db.session.execute(db.select(models.InfoRequest.name).where(models.InfoRequest.name.in_(["New", "No key"])))
+    assert sorted(names.scalars()) == ["New", "No key"]
+
+
+def test_rows_without_keys_are_imported_once(requests):
+    csv = (
+        "name,email,notes,cruise_id\n"
+        f"Walk-in,w@example.com,Called,{requests[0]}\n"
+        f"Walk-in,w@example.com,Called,{requests[0]}\n"
+        f"Walk-in,w@example.com,Called again,{requests[0]}\n"
+        "Typo,t@example.com,Fat fingers,1O\n"
+    ).encode()
+
+    first = bulk.import_info_requests(db, io.BytesIO(csv), "csv")
+    second = bulk.import_info_requests(db, io.BytesIO(csv), "csv")
+
+    # A cruise_id that isn't a number rejects its row, as in NDJSON, rather than the whole file
+    assert (first.read, first.inserted, first.duplicates, first.rejected) == (4, 2, 1, 1)
+    assert (second.inserted, second.duplicates) == (0, 3)
+
+
+def test_round_trip_of_requests_stored_without_keys(requests):
+    db.session.execute(
+        text("INSERT INTO info_request (name, email, notes, cruise_id) VALUES ('Legacy', 'l@example.com', 'n', :id)"),
+        {"id": requests[0]},
+    )
+    migration = importlib.import_module("flaskapp.migrations.versions.e8b3d5a1f7c2_")
+    with Operations.context(MigrationContext.configure(db.session.connection())):
+        migration.upgrade()
+    _, exported_text = exported("csv", cruise_ids=requests)
+
+    report = bulk.import_info_requests(db, io.BytesIO(exported_text.encode()), "csv")
+
+    assert (report.read, report.inserted, report.duplicates) == (7, 0, 7)
+
+
+def test_import_csv_checks_columns(requests):
+    with pytest.raises(ValueError, match="Unknown columns price"):
+        bulk.import_info_requests(db, io.BytesIO(b"name,email,notes,cruise_id,price\n"), "csv")
+
+
+def test_cli_export_and_import(app_with_db, requests, tmp_path):
+    path = tmp_path / "leads.csv"
+    runner = app_with_db.test_cli_runner()
+
+    result = runner.invoke(args=["info-requests", "export", "--output", str(path), "--cruise", str(requests[1])])
+    assert result.exit_code == 0, result.stderr
+    assert "Exported 3 info requests." in result.stderr
+
+    result = runner.invoke(args=["info-requests", "import", str(path)])
+    assert result.exit_code == 0, result.output
+    assert "Read 3 rows: inserted 0, skipped 3 already stored" in result.output
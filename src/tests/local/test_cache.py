@@ -0,0 +1,232 @@
+import math
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from flaskapp import cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(params=["memory", "file", "redis"])
+def backend(request, tmp_path, clock):
+    if request.param == "memory":
+        return cache.TTLCache(maxsize=2, ttl=10, clock=clock)
+    if request.param == "file":
+        return cache.FileCache(str(tmp_path), maxsize=2, ttl=10, clock=clock)
+    fakeredis = pytest.importorskip("fakeredis")
+    return cache.RedisCache(fakeredis.FakeRedis(), prefix="test", ttl=10)
+
+
+def test_hit_and_miss(backend):
+    assert backend.get("a") is None
+    backend.set("a", {"value": 1})
+    assert backend.get("a") == {"value": 1}
+
+    assert backend.stats.hits == 1
+    assert backend.stats.misses == 1
+
+
+def test_clear(backend):
+    backend.set("a", 1)
+    backend.clear()
+
+    assert backend.get("a") is None
+    assert backend.stats.invalidations == 1
+
+
+def test_get_or_set_does_not_cache_none(backend):
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return None
+
+    assert backend.get_or_set("missing", factory) is None
+    assert backend.get_or_set("missing", factory) is None
+    assert len(calls) == 2
+
+
+def test_get_or_set_is_single_flight(backend):
+    calls = []
+
+    def slow_factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(backend.get_or_set("key", slow_factory))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    ttl_cache = cache.TTLCache(maxsize=2, ttl=10)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+
+    assert "a" in ttl_cache
+    assert "b" not in ttl_cache
+    assert "c" in ttl_cache
+    assert ttl_cache.stats.evictions == 1
+
+
+@pytest.mark.parametrize("backend_class", [cache.TTLCache, cache.FileCache])
+def test_entries_expire(backend_class, tmp_path, clock):
+    args = (str(tmp_path),) if backend_class is cache.FileCache else ()
+    local_cache = backend_class(*args, maxsize=2, ttl=10, clock=clock)
+    local_cache.set("a", 1)
+
+    clock.now = 9.9
+    assert local_cache.get("a") == 1
+    clock.now = 10
+    assert local_cache.get("a") is None
+    assert local_cache.stats.expirations == 1
+    assert len(local_cache) == 0
+
+
+@pytest.mark.parametrize("backend_class", [cache.TTLCache, cache.FileCache])
+def test_entries_can_have_their_own_ttl(backend_class, tmp_path, clock):
+    args = (str(tmp_path),) if backend_class is cache.FileCache else ()
+    local_cache = backend_class(*args, maxsize=2, ttl=10, clock=clock)
+    local_cache.set("short", 1, ttl=1)
+    local_cache.set("forever", 2, ttl=math.inf)
+
+    clock.now = 1
+    assert local_cache.get("short") is None
+    clock.now = 1e9
+    assert local_cache.get("forever") == 2
+
+
+def test_redis_entries_without_a_ttl_never_expire():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    redis_cache = cache.RedisCache(client, prefix="test", ttl=10)
+    redis_cache.set("forever", 2, ttl=math.inf)
+
+    assert client.pttl(redis_cache._key("forever")) == -1
+    assert redis_cache.get("forever") == 2
+
+
+def test_file_cache_evicts_past_maxsize(tmp_path):
+    file_cache = cache.FileCache(str(tmp_path), maxsize=2)
+    for key in ("a", "b", "c"):
+        file_cache.set(key, key)
+
+    assert len(file_cache) == 2
+    assert file_cache.stats.evictions == 1
+
+
+def test_file_cache_is_shared_between_instances(tmp_path):
+    writer = cache.FileCache(str(tmp_path))
+    reader = cache.FileCache(str(tmp_path))
+
+    writer.set("destinations", ("The Sun", "Mars"))
+    assert reader.get("destinations") == ("The Sun", "Mars")
+
+    reader.clear()
+    assert writer.get("destinations") is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="file locks are per process on Windows")
+def test_file_cache_single_flight_across_instances(tmp_path):
+    calls = []
+
+    def slow_factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    # Each thread gets its own instance, like separate gunicorn workers sharing a directory
+    instances = [cache.FileCache(str(tmp_path)) for _ in range(4)]
+    threads = [threading.Thread(target=instance.get_or_set, args=("key", slow_factory)) for instance in instances]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+
+
+def test_file_cache_lock_files_are_bounded(tmp_path):
+    file_cache = cache.FileCache(str(tmp_path), maxsize=10_000)
+    for number in range(500):
+        file_cache.get_or_set(f"page:{number}", lambda: number)
+
+    assert len(list(tmp_path.glob("*.lock"))) <= cache.FileCache._LOCK_STRIPES
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="needs POSIX owners")
+def test_file_cache_directories_must_be_private(tmp_path, monkeypatch):
+    (tmp_path / "shared").mkdir(mode=0o777)
+    (tmp_path / "shared").chmod(0o777)
+    with pytest.raises(RuntimeError, match="writable by other users"):
+        cache.FileCache(str(tmp_path / "shared"))
+
+    # As if another user had created the directory first
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(tmp_path).st_uid + 1)
+    with pytest.raises(RuntimeError, match="not a directory owned by the current user"):
+        cache.private_directory(str(tmp_path))
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="needs POSIX owners")
+def test_default_cache_root_is_per_user():
+    root = cache._default_cache_root()
+
+    assert root.endswith(f"flaskapp-cache-{os.getuid()}")
+    assert os.stat(root).st_mode & 0o777 == 0o700
+
+
+def test_redis_cache_is_shared_between_instances():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    writer = cache.RedisCache(fakeredis.FakeRedis(server=server), prefix="catalog")
+    reader = cache.RedisCache(fakeredis.FakeRedis(server=server), prefix="catalog")
+    other_prefix = cache.RedisCache(fakeredis.FakeRedis(server=server), prefix="other")
+
+    writer.set("destinations", ("The Sun",))
+    other_prefix.set("destinations", ("Pluto",))
+    reader.clear()
+
+    assert writer.get("destinations") is None
+    assert other_prefix.get("destinations") == ("Pluto",)
+
+
+def test_from_config(tmp_path):
+    assert isinstance(cache.from_config({}, prefix="catalog"), cache.TTLCache)
+
+    file_cache = cache.from_config(
+        {"CATALOG_CACHE_BACKEND": "file", "CATALOG_CACHE_DIR": str(tmp_path), "CATALOG_CACHE_TTL": "5"},
+        prefix="catalog",
+    )
+    assert isinstance(file_cache, cache.FileCache)
+    assert file_cache.ttl == 5
+
+    assert isinstance(cache.from_config({"CATALOG_CACHE_BACKEND": "none"}, prefix="catalog"), cache.NullCache)
+
+    with pytest.raises(ValueError):
+        cache.from_config({"CATALOG_CACHE_BACKEND": "memcached"}, prefix="catalog")
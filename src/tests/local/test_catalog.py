@@ -0,0 +1,54 @@
+from flaskapp import catalog, db, models
+
+
+def test_destination_pages_are_read_through(app_context, count_statements):
+    first = catalog.destinations_page()
+    statements_after_first = len(count_statements)
+    second = catalog.destinations_page()
+
+    assert statements_after_first == 1
+    assert len(count_statements) == 1
+    assert first is second
+    assert "The Sun" in [str(destination) for destination in first.items]
+
+
+def test_cruise_snapshot_includes_destinations(app_context):
+    cruise_id = db.session.execute(
+        db.select(models.Cruise.id).where(models.Cruise.name == "The Sun and Earth")
+    ).scalar_one()
+
+    cruise = catalog.cruise(cruise_id)
+
+    assert [destination.name for destination in cruise.destinations] == ["The Sun", "Earth"]
+
+
+def test_unknown_and_malformed_pks_are_none(app_context):
+    assert catalog.destination(999999) is None
+    assert catalog.cruise("not-a-number") is None
+
+
+def test_commit_of_catalog_change_invalidates(app_context):
+    destination = db.session.execute(
+        db.select(models.Destination).where(models.Destination.name == "Mars")
+    ).scalar_one()
+    original = catalog.destination(destination.id).description
+    invalidations = catalog.stats()["invalidations"]
+
+    destination.description = "It's still red"
+    db.session.commit()
+    try:
+        assert catalog.stats()["invalidations"] == invalidations + 1
+        assert catalog.destination(destination.id).description == "It's still red"
+    finally:
+        destination.description = original
+        db.session.commit()
+
+
+def test_commit_of_info_request_keeps_cache(app_context):
+    cruise = catalog.cruises_page().items[0]
+    invalidations = catalog.stats()["invalidations"]
+
+    db.session.add(models.InfoRequest(name="A", email="a@example.com", notes="n", cruise_id=cruise.id))
+    db.session.commit()
+
+    assert catalog.stats()["invalidations"] == invalidations
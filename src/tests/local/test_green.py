@@ -0,0 +1,51 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from flaskapp import green
+
+GEVENT_SCRIPT = textwrap.dedent(
+    """
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    import time
+
+    import gevent
+    import psycopg2.extensions
+    from sqlalchemy import text
+
+    from flaskapp import create_app, db
+
+    app = create_app({"DB_POOL_SIZE": 5})
+    assert psycopg2.extensions.get_wait_callback() is not None
+
+
+    def sleep_in_postgres():
+        with app.app_context():
+            db.session.execute(text("SELECT pg_sleep(0.2)"))
+            db.session.remove()
+
+
+    start = time.perf_counter()
+    gevent.joinall([gevent.spawn(sleep_in_postgres) for _ in range(5)], raise_error=True)
+    print(time.perf_counter() - start)
+    """
+)
+
+
+def test_not_patched_without_gevent():
+    assert not green.is_monkey_patched()
+
+
+def test_queries_run_concurrently_under_gevent():
+    pytest.importorskip("gevent")
+
+    result = subprocess.run([sys.executable, "-c", GEVENT_SCRIPT], capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    # Five 200ms queries overlap instead of taking a second back to back
+    assert float(result.stdout.strip().splitlines()[-1]) < 0.6
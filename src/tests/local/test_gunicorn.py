@@ -4,12 +4,23 @@ from unittest import mock
 import pytest
 from gunicorn.app.wsgiapp import run
 
+ARGV = ["gunicorn", "--check-config", "flaskapp:create_app()", "-c", "src/gunicorn.conf.py"]
 
-def test_config_imports():
-    argv = ["gunicorn", "--check-config", "flaskapp:create_app()", "-c", "src/gunicorn.conf.py"]
 
-    with mock.patch.object(sys, "argv", argv):
+def test_config_imports():
+    with mock.patch.object(sys, "argv", ARGV):
         with pytest.raises(SystemExit) as excinfo:
             run()
 
     assert excinfo.value.args[0] == 0
+
+
+def test_preload_is_refused_with_gevent_workers(monkeypatch):
+    monkeypatch.setenv("GUNICORN_PRELOAD", "true")
+    monkeypatch.setenv("GUNICORN_WORKER_CLASS", "gevent")
+
+    with mock.patch.object(sys, "argv", ARGV):
+        with pytest.raises(SystemExit) as excinfo:
+            run()
+
+    assert excinfo.value.args[0] != 0
@@ -0,0 +1,125 @@
+import os
+import re
+
+import pytest
+from PIL import Image
+
+from flaskapp import images
+
+WIDTHS = (200, 400, 800)
+FORMATS = ("avif", "webp")
+# Pillow writes AVIF from 11.2, which isn't available on Python 3.8
+Image.init()
+WRITTEN = [fmt for fmt in FORMATS if fmt.upper() in Image.SAVE]
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    os.makedirs(tmp_path / "res/img")
+    Image.new("RGB", (600, 400), "navy").save(tmp_path / "res/img/photo.jpeg")
+    Image.new("RGBA", (150, 100), (255, 0, 0, 128)).save(tmp_path / "res/img/logo.png")
+    return tmp_path
+
+
+@pytest.fixture
+def derived(app_with_db, static_folder, monkeypatch):
+    images.build(str(static_folder), ["res/img/photo.jpeg"], widths=WIDTHS, formats=FORMATS)
+    monkeypatch.setattr(app_with_db, "static_folder", str(static_folder))
+    images.load(app_with_db)
+    yield app_with_db
+    monkeypatch.undo()
+    images.load(app_with_db)
+
+
+def test_templates_reference_the_hero_images(app_with_db):
+    assert images.referenced(app_with_db) == {
+        "res/img/cosmos-db.jpeg": ["base.html"],
+        "res/img/bit_cosmos.png": ["base.html"],
+        "res/img/astronaut.jpeg": ["base.html"],
+    }
+
+
+def test_build_writes_each_width_and_format(static_folder):
+    manifest, built = images.build(
+        str(static_folder), ["res/img/photo.jpeg", "res/img/logo.png"], widths=WIDTHS, formats=FORMATS
+    )
+
+    assert built == ["res/img/logo.png", "res/img/photo.jpeg"]
+    photo = manifest["res/img/photo.jpeg"]
+    assert list(photo.formats) == [*WRITTEN, "jpeg"]
+    # Never wider than the original
+    assert [d.width for d in photo.formats["webp"]] == [200, 400, 600]
+    assert (photo.width, photo.height) == (600, 400)
+    with Image.open(static_folder / photo.formats["webp"][0].path) as copy:
+        assert (copy.format, copy.size) == ("WEBP", (200, 133))
+    logo = manifest["res/img/logo.png"]
+    assert list(logo.formats) == [*WRITTEN, "png"]
+    with Image.open(static_folder / logo.formats["webp"][0].path) as copy:
+        assert copy.mode == "RGBA"
+    assert images.read_manifest(str(static_folder)) == manifest
+
+
+def test_build_encodes_only_changed_images(static_folder):
+    filenames = ["res/img/photo.jpeg", "res/img/logo.png"]
+    first, _ = images.build(str(static_folder), filenames, widths=WIDTHS, formats=FORMATS)
+
+    assert images.build(str(static_folder), filenames, widths=WIDTHS, formats=FORMATS)[1] == []
+
+    Image.new("RGB", (600, 400), "teal").save(static_folder / "res/img/photo.jpeg")
+    assert images.build(str(static_folder), filenames, widths=WIDTHS, formats=FORMATS)[1] == ["res/img/photo.jpeg"]
+    # Other settings derive everything again
+    assert len(images.build(str(static_folder), filenames, widths=(300,), formats=FORMATS)[1]) == 2
+
+    images.build(str(static_folder), ["res/img/photo.jpeg"], widths=(300,), formats=FORMATS)
+    for derivatives in first["res/img/logo.png"].formats.values():
+        assert not (static_folder / derivatives[0].path).exists()
+
+
+def test_check_finds_images_without_derivatives(static_folder):
+    filenames = ["res/img/photo.jpeg", "res/img/logo.png", "res/img/missing.png"]
+    images.build(str(static_folder), ["res/img/photo.jpeg"], widths=WIDTHS, formats=FORMATS)
+
+    assert images.check(str(static_folder), filenames, widths=WIDTHS, formats=FORMATS) == [
+        ("res/img/logo.png", "no derivatives"),
+        ("res/img/missing.png", "no such file"),
+    ]
+    assert images.check(str(static_folder), ["res/img/photo.jpeg"], widths=(300,), formats=FORMATS) == [
+        ("res/img/photo.jpeg", "derivatives are out of date")
+    ]
+    os.remove(static_folder / images.DERIVED_DIRECTORY / f"res/img/photo-200w.{WRITTEN[0]}")
+    assert images.check(str(static_folder), ["res/img/photo.jpeg"], widths=WIDTHS, formats=FORMATS) == [
+        ("res/img/photo.jpeg", "derivative files are missing")
+    ]
+
+
+def test_check_command_fails_without_derivatives(app_with_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_with_db, "static_folder", str(tmp_path))
+
+    result = app_with_db.test_cli_runner().invoke(args=["images", "check"])
+
+    assert result.exit_code == 1
+    assert "res/img/cosmos-db.jpeg: no such file (shown in base.html)" in result.output
+
+
+def test_picture_lists_derivatives_best_format_first(derived):
+    with derived.test_request_context():
+        html = str(images.picture("res/img/photo.jpeg", alt="A <photo>", sizes="50vw", loading="lazy"))
+
+    types = re.findall(r'<source type="([^"]+)"', html)
+    assert types == [images.MIME_TYPES[fmt] for fmt in WRITTEN]
+    assert (
+        'srcset="/static/derived/res/img/photo-200w.webp 200w, /static/derived/res/img/photo-400w.webp 400w, '
+        '/static/derived/res/img/photo-600w.webp 600w" sizes="50vw"' in html
+    )
+    assert re.search(
+        r'<img src="/static/derived/res/img/photo-600w.jpg" srcset="[^"]+" sizes="50vw" '
+        r'width="600" height="400" alt="A &lt;photo&gt;" loading="lazy"></picture>$',
+        html,
+    )
+
+
+def test_picture_falls_back_to_the_original(derived):
+    with derived.test_request_context():
+        html = str(images.picture("res/img/logo.png", alt="Logo", **{"class": "img-fluid"}))
+
+    assert html == '<img src="/static/res/img/logo.png" alt="Logo" class="img-fluid">'
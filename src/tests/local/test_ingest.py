@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from flaskapp import db, ingest, models
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ingest.InfoRequestQueue(str(tmp_path / "queue.db"), max_size=3, claim_timeout=30)
+
+
+@pytest.fixture
+def buffered(app_with_db, queue, monkeypatch):
+    """Turns buffering on for the session app, without starting the background flusher."""
+    monkeypatch.setitem(app_with_db.extensions, "info_request_queue", queue)
+    monkeypatch.setitem(app_with_db.extensions, "info_request_flusher", ingest.Flusher(app_with_db, queue))
+    return queue
+
+
+@pytest.fixture
+def cruise_id(rollback_after):
+    return db.session.execute(db.select(models.Cruise.id).order_by(models.Cruise.id)).scalars().first()
+
+
+def form(cruise_id, key="k1"):
+    return {
+        "name": "Amanda Valdez",
+        "email": "a@example.com",
+        "notes": "More info",
+        "cruise_id": str(cruise_id),
+        "request_key": key,
+    }
+
+
+def stored(key):
+    query = db.select(models.InfoRequest.name).where(models.InfoRequest.dedup_key == key)
+    return db.session.execute(query).scalars().all()
+
+
+@pytest.mark.parametrize(
+    "field, value, message",
+    [("name", "", "fill in the name"), ("notes", "x" * 256, "limited to 255"), ("cruise_id", "999999", "cruises")],
+)
+def test_parse_rejects_invalid_forms(cruise_id, field, value, message):
+    with pytest.raises(ValueError, match=message):
+        ingest.parse(dict(form(cruise_id), **{field: value}))
+
+
+def test_invalid_post_is_400(app_with_db, cruise_id):
+    response = app_with_db.test_client().post("/info_request", data=form(999999))
+
+    assert response.status_code == 400
+
+
+def test_direct_write_stores_a_resubmitted_form_once(app_with_db, cruise_id):
+    client = app_with_db.test_client()
+    for _ in range(2):
+        assert client.post("/info_request", data=form(cruise_id)).status_code == 302
+
+    assert stored("k1") == ["Amanda Valdez"]
+
+
+def test_buffered_post_is_queued_then_flushed(app_with_db, buffered, cruise_id):
+    response = app_with_db.test_client().post("/info_request", data=form(cruise_id))
+
+    assert response.status_code == 302
+    assert len(buffered) == 1 and stored("k1") == []
+
+    assert ingest.drain(buffered, batch_size=2) == 1
+    assert len(buffered) == 0 and stored("k1") == ["Amanda Valdez"]
+
+
+def test_queue_deduplicates_and_applies_backpressure(app_with_db, buffered, cruise_id):
+    client = app_with_db.test_client()
+    for key in ("a", "a", "b", "c"):
+        assert client.post("/info_request", data=form(cruise_id, key)).status_code == 302
+    assert len(buffered) == 3
+
+    response = client.post("/info_request", data=form(cruise_id, "d"))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_redelivered_batch_is_written_once(queue, cruise_id):
+    queue.claim_timeout = 0
+    queue.put(ingest.parse(form(cruise_id)))
+    # A worker wrote the batch, then died before taking it off the queue
+    [(rowid, row)] = queue.claim(10)
+    ingest.write([row])
+
+    assert ingest.flush(queue, 10) == 1
+    assert len(queue) == 0 and stored("k1") == ["Amanda Valdez"]
+
+
+def test_rejected_rows_are_set_aside(queue, cruise_id):
+    queue.put(ingest.parse(form(cruise_id, "good")))
+    queue.put(dict(ingest.parse(form(cruise_id, "bad")), cruise_id=999999))
+
+    assert ingest.flush(queue, 10) == 2
+
+    assert stored("good") == ["Amanda Valdez"] and stored("bad") == []
+    [(row, error)] = queue.failed()
+    assert row["dedup_key"] == "bad" and "foreign key" in error
+    assert len(queue) == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_queue_reopens_its_connection_after_a_fork(queue):
+    # create_app keeps no connection open to be inherited by forked workers
+    assert not hasattr(queue._local, "connection")
+    queue.put({"dedup_key": "parent"})
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            queue.put({"dedup_key": "child"})
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert len(queue) == 2
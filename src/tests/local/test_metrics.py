@@ -0,0 +1,134 @@
+import os
+import re
+import runpy
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import ephemeral_port_reserve
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+
+
+def sample(text, name, **labels):
+    """The value of the sample `name` with exactly these labels, or 0 if there is none."""
+    wanted = ",".join(f'{label}="{value}"' for label, value in sorted(labels.items()))
+    for line in text.splitlines():
+        match = re.fullmatch(rf"{name}\{{(.*)\}} (\S+)", line)
+        if match and ",".join(sorted(match.group(1).split(","))) == wanted:
+            return float(match.group(2))
+    return 0.0
+
+
+def test_request_latency_and_cache_metrics(client):
+    before = client.get("/metrics").get_data(as_text=True)
+    client.get("/about")
+    client.get("/about")
+
+    text = client.get("/metrics").get_data(as_text=True)
+
+    labels = {"endpoint": "pages.about", "method": "GET", "status": "200"}
+    count = sample(text, "flaskapp_request_duration_seconds_count", **labels)
+    assert count - sample(before, "flaskapp_request_duration_seconds_count", **labels) == 2
+    hits = sample(text, "flaskapp_cache_events_total", cache="page", event="hits")
+    assert hits - sample(before, "flaskapp_cache_events_total", cache="page", event="hits") >= 1
+
+
+def test_metrics_token(app_with_db, client, monkeypatch):
+    monkeypatch.setitem(app_with_db.config, "METRICS_TOKEN", "s3cret")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+@pytest.fixture
+def gunicorn_server(tmp_path):
+    """Two sync gunicorn workers that are recycled every 5 requests, sharing a metrics directory."""
+    port = ephemeral_port_reserve.reserve()
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path / "metrics"))
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "flaskapp:create_app()",
+            "-c",
+            "gunicorn.conf.py",
+            f"--bind=127.0.0.1:{port}",
+            "--workers=2",
+            "--threads=1",
+            "--worker-class=sync",
+            "--max-requests=5",
+            "--max-requests-jitter=0",
+        ],
+        cwd=SRC_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            urllib.request.urlopen(f"{url}/metrics", timeout=5).read()
+            break
+        except (urllib.error.URLError, ConnectionError):
+            if time.monotonic() > deadline or server.poll() is not None:
+                server.kill()
+                pytest.fail("gunicorn did not start")
+            time.sleep(0.2)
+    yield url
+    server.send_signal(signal.SIGTERM)
+    server.wait(timeout=30)
+
+
+def get(url):
+    # Retried: a request can land on a worker just as it is being recycled
+    for attempt in range(5):
+        try:
+            return urllib.request.urlopen(url, timeout=10).read().decode()
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise AssertionError(f"{url} kept failing")
+
+
+@pytest.fixture
+def production_env(monkeypatch):
+    for name in ("POSTGRES_USERNAME", "POSTGRES_PASSWORD", "POSTGRES_HOST", "POSTGRES_DATABASE"):
+        monkeypatch.setenv(name, "x")
+    monkeypatch.setenv("RUNNING_IN_PRODUCTION", "1")
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    return monkeypatch
+
+
+def test_metrics_are_off_by_default_in_production(production_env):
+    config = runpy.run_path(os.path.join(SRC_DIR, "flaskapp", "config", "production.py"))
+    gunicorn_config = runpy.run_path(os.path.join(SRC_DIR, "gunicorn.conf.py"))
+
+    assert config["METRICS_ENABLED"] is False
+    assert gunicorn_config["metrics_enabled"] is False
+
+
+def test_production_metrics_need_a_token(production_env):
+    production_env.setenv("METRICS_ENABLED", "true")
+
+    with pytest.raises(RuntimeError, match="METRICS_TOKEN"):
+        runpy.run_path(os.path.join(SRC_DIR, "flaskapp", "config", "production.py"))
+
+    production_env.setenv("METRICS_TOKEN", "s3cret")
+    assert runpy.run_path(os.path.join(SRC_DIR, "flaskapp", "config", "production.py"))["METRICS_ENABLED"]
+
+
+def test_metrics_add_up_across_workers(gunicorn_server):
+    for _ in range(20):
+        get(f"{gunicorn_server}/about")
+
+    text = get(f"{gunicorn_server}/metrics")
+
+    # The 20 requests were served by at least four worker processes, most of them gone by now
+    labels = {"endpoint": "pages.about", "method": "GET", "status": "200"}
+    assert sample(text, "flaskapp_request_duration_seconds_count", **labels) == 20
+    assert sample(text, "flaskapp_worker_exits_total", reason="max_requests") >= 3
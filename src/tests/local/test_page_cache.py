@@ -0,0 +1,109 @@
+import pytest
+from flask import template_rendered
+
+from flaskapp import db, models
+
+
+@pytest.fixture
+def rendered_templates(app_with_db):
+    templates = []
+
+    def record(sender, template, context, **extra):
+        templates.append(template.name)
+
+    template_rendered.connect(record, app_with_db)
+    yield templates
+    template_rendered.disconnect(record, app_with_db)
+
+
+def test_cached_page_headers(client):
+    response = client.get("/destinations")
+
+    assert response.status_code == 200
+    etag, weak = response.get_etag()
+    assert etag and not weak
+    assert response.last_modified is not None
+    assert response.cache_control.public
+    assert response.cache_control.max_age == 60
+
+
+def test_second_request_is_served_from_cache(client, rendered_templates, count_statements):
+    first = client.get("/destinations")
+    second = client.get("/destinations")
+
+    assert rendered_templates == ["destinations.html"]
+    assert len(count_statements) == 1
+    assert first.data == second.data
+    assert first.headers["ETag"] == second.headers["ETag"]
+
+
+def test_conditional_get_returns_304(client, rendered_templates, count_statements):
+    etag = client.get("/about").headers["ETag"]
+    rendered_templates.clear()
+    count_statements.statements.clear()
+
+    response = client.get("/about", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert rendered_templates == []
+    assert len(count_statements) == 0
+
+
+def test_conditional_get_with_stale_etag_returns_200(client):
+    response = client.get("/about", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert b"About ReleCloud" in response.data
+
+
+def test_catalog_write_invalidates_cached_pages(app_with_db, client):
+    with app_with_db.app_context():
+        destination = db.session.execute(
+            db.select(models.Destination).where(models.Destination.name == "Mars")
+        ).scalar_one()
+        destination_id = destination.id
+    before = client.get(f"/destination/{destination_id}")
+
+    with app_with_db.app_context():
+        destination = db.session.get(models.Destination, destination_id)
+        original = destination.description
+        destination.description = "It's redder than before"
+        db.session.commit()
+    try:
+        after = client.get(f"/destination/{destination_id}", headers={"If-None-Match": before.headers["ETag"]})
+
+        assert after.status_code == 200
+        assert b"It&#39;s redder than before" in after.data
+    finally:
+        with app_with_db.app_context():
+            db.session.get(models.Destination, destination_id).description = original
+            db.session.commit()
+
+
+def test_not_found_is_not_cached(client):
+    response = client.get("/cruise/999999")
+
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+def test_disabled_page_cache(app_with_db, client, rendered_templates):
+    app_with_db.config["PAGE_CACHE_ENABLED"] = False
+    try:
+        client.get("/about")
+        response = client.get("/about")
+    finally:
+        app_with_db.config["PAGE_CACHE_ENABLED"] = True
+
+    assert rendered_templates == ["about.html", "about.html"]
+    assert "ETag" not in response.headers
+
+
+def test_query_string_is_part_of_the_key(client):
+    first_page = client.get("/destinations?limit=2")
+    second_page = client.get("/destinations?limit=2&after=2")
+
+    assert first_page.get_etag() != second_page.get_etag()
+    assert b"The Sun" in first_page.data
+    assert b"The Sun" not in second_page.data
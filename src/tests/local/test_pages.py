@@ -1,13 +1,6 @@
-import pytest
-
 from flaskapp import db, models
 
 
-@pytest.fixture
-def client(app_with_db):
-    return app_with_db.test_client()
-
-
 def test_index(client):
     response = client.get("/")
 
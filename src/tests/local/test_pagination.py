@@ -0,0 +1,108 @@
+import re
+
+import pytest
+
+from flaskapp import catalog, db, models, queries
+
+
+@pytest.fixture
+def many_destinations(rollback_after):
+    db.session.add_all(models.Destination(id=pk, name=f"Asteroid {pk}") for pk in range(900001, 900061))
+    db.session.commit()
+
+
+def ids(rows):
+    return [row.id for row in rows]
+
+
+def link(response, rel):
+    match = re.search(rf'rel="{rel}" href="([^"]+)"', response.get_data(as_text=True))
+    return match.group(1).replace("&amp;", "&") if match else None
+
+
+def test_seek_forward_and_back(many_destinations):
+    all_ids = sorted(row.id for row in db.session.query(models.Destination))
+
+    first, more = queries.page_destinations(limit=25)
+    assert ids(first) == all_ids[:25] and more
+    second, more = queries.page_destinations(after=first[-1].id, limit=25)
+    assert ids(second) == all_ids[25:50] and more
+    last, more = queries.page_destinations(after=second[-1].id, limit=25)
+    assert ids(last) == all_ids[50:] and not more
+
+    back, more = queries.page_destinations(before=last[0].id, limit=25)
+    assert ids(back) == ids(second) and more
+    back, more = queries.page_destinations(before=second[0].id, limit=25)
+    assert ids(back) == ids(first) and not more
+
+
+def test_catalog_page_cursors(many_destinations):
+    first = catalog.destinations_page(limit=40)
+    assert first.prev_cursor is None and first.next_cursor == first.items[-1].id
+
+    second = catalog.destinations_page(after=first.next_cursor, limit=40)
+    assert second.prev_cursor == second.items[0].id and second.next_cursor is None
+
+    assert catalog.destinations_page(before=second.prev_cursor, limit=40) == first
+
+
+def test_destinations_prev_and_next_links(client):
+    first = client.get("/destinations?limit=4")
+    assert link(first, "prev") is None
+    assert "The Sun" in first.get_data(as_text=True)
+
+    second = client.get(link(first, "next"))
+    assert "limit=4" in link(second, "next")
+    assert "The Sun" not in second.get_data(as_text=True)
+
+    assert client.get(link(second, "prev")).data == first.data
+
+
+def test_all_seed_destinations_fit_on_the_default_page(client):
+    response = client.get("/destinations")
+
+    assert "Pluto" in response.get_data(as_text=True)
+    assert link(response, "next") is None
+
+
+def test_page_size_is_clamped(app_with_db, client, many_destinations):
+    app_with_db.config["CATALOG_MAX_PAGE_SIZE"] = 30
+    try:
+        response = client.get("/destinations?limit=100000")
+    finally:
+        app_with_db.config["CATALOG_MAX_PAGE_SIZE"] = 100
+
+    assert response.get_data(as_text=True).count("list-group-item-action") == 30
+
+
+def test_malformed_cursor_is_ignored(client):
+    response = client.get("/destinations?after=pluto")
+
+    assert response.status_code == 200
+    assert "The Sun" in response.get_data(as_text=True)
+
+
+def test_info_request_picker_is_paginated_and_searchable(client):
+    response = client.get("/info_request?limit=2")
+    assert response.get_data(as_text=True).count("<option") == 2
+    assert link(response, "next") is not None
+
+    response = client.get("/info_request?q=expedition")
+    options = re.findall(r"<option [^>]*>([^<]+)</option>", response.get_data(as_text=True))
+    assert options == ["The Cold Planets Expedition", "The Central Planets Expedition"]
+
+
+def test_search_cruises_endpoint(client):
+    response = client.get("/cruises/search?q=TOUR")
+
+    assert response.status_code == 200
+    assert [cruise["name"] for cruise in response.json["cruises"]] == [
+        "The Hottest Planets Tour",
+        "The Grand Solar System Tour",
+    ]
+    assert response.json["next"] is None
+
+
+def test_search_treats_wildcards_literally(client):
+    assert client.get("/cruises/search?q=%25").json["cruises"] == []
+    assert client.get("/cruises/search?q=_").json["cruises"] == []
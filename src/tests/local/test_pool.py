@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy.pool import NullPool
+
+from flaskapp import create_app, db, pool
+
+
+def test_engine_options_for_queue_pool():
+    options = pool.engine_options(
+        {
+            "SQLALCHEMY_DATABASE_URI": "postgresql+psycopg2://user@localhost/db",
+            "DB_POOL_SIZE": 3,
+            "DB_MAX_OVERFLOW": 2,
+            "DB_POOL_RECYCLE": 600,
+            "DB_POOL_PRE_PING": False,
+            "DB_POOL_RESET_ON_RETURN": "none",
+            "DB_STATEMENT_TIMEOUT_MS": 5000,
+        }
+    )
+
+    assert options["poolclass"] is pool.MeteredQueuePool
+    assert options["pool_size"] == 3
+    assert options["max_overflow"] == 2
+    assert options["pool_recycle"] == 600
+    assert options["pool_pre_ping"] is False
+    assert options["pool_reset_on_return"] is None
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+
+def test_engine_options_for_null_pool():
+    options = pool.engine_options({"DB_POOL_MODE": "null", "DB_POOL_SIZE": 3})
+
+    assert options["poolclass"] is NullPool
+    assert "pool_size" not in options
+    assert "connect_args" not in options
+
+
+@pytest.fixture
+def pooled_app():
+    app = create_app({"TESTING": True, "DB_POOL_SIZE": 1, "DB_MAX_OVERFLOW": 0, "DB_POOL_PREWARM": 3})
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_prewarm_is_capped_at_pool_size(pooled_app):
+    assert pool.prewarm(pooled_app) == 1
+
+    stats = pool.stats(pooled_app)[None]
+    assert stats["connects"] == 1
+    assert stats["checked_out"] == 0
+
+
+def test_stats_record_saturation_and_waits(pooled_app):
+    with pooled_app.app_context():
+        engine = db.engine
+    held = engine.connect()
+    assert pool.stats(pooled_app)[None]["saturation"] == 1.0
+
+    def release_later():
+        time.sleep(0.05)
+        held.close()
+
+    releaser = threading.Thread(target=release_later)
+    releaser.start()
+    with engine.connect():
+        pass
+    releaser.join()
+
+    stats = pool.stats(pooled_app)[None]
+    assert stats["checkouts"] == 2
+    assert stats["waits"] == 1
+    assert stats["max_wait_seconds"] >= 0.04
+    assert stats["peak_checked_out"] == 1
+
+
+def test_dispose_inherited_starts_a_new_pool(pooled_app):
+    pool.prewarm(pooled_app)
+    with pooled_app.app_context():
+        inherited_pool = db.engine.pool
+
+    pool.dispose_inherited(pooled_app)
+
+    with pooled_app.app_context():
+        assert db.engine.pool is not inherited_pool
+    assert pool.stats(pooled_app)[None]["connects"] == 0
+    # The inherited connection was dropped, not closed, so its owner can keep using it
+    assert inherited_pool.checkedin() == 1
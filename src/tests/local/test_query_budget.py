@@ -0,0 +1,62 @@
+import pytest
+
+from flaskapp import catalog, db, models
+
+# Maximum number of SQL statements each page may execute.
+# A page that goes over its budget is almost always a new lazy load in a template.
+STATEMENT_BUDGETS = {
+    "/": 0,
+    "/about": 0,
+    "/destinations": 1,
+    "/destinations?after=5&limit=3": 1,
+    "/info_request": 1,
+    "/info_request?q=planets": 1,
+    "/cruises/search?q=tour": 1,
+    "/search?q=planet": 1,
+    "/api/v1/destinations": 2,
+    "/api/v1/cruises?fields=name": 1,
+}
+
+
+@pytest.fixture(autouse=True)
+def cold_catalog_cache(app_with_db):
+    """Budgets are for the uncached path, so every test starts with an empty catalog cache."""
+    with app_with_db.app_context():
+        catalog.invalidate()
+
+
+@pytest.mark.parametrize("url, budget", STATEMENT_BUDGETS.items())
+def test_page_statement_budget(client, count_statements, url, budget):
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert len(count_statements) <= budget, "\n".join(count_statements.statements)
+
+
+def test_destination_detail_statement_budget(app_with_db, client, count_statements):
+    with app_with_db.app_context():
+        sun = db.session.query(models.Destination).filter(models.Destination.name == "The Sun").first()
+    count_statements.statements.clear()
+
+    response = client.get(f"/destination/{sun.id}")
+
+    assert response.status_code == 200
+    assert len(count_statements) <= 2, "\n".join(count_statements.statements)
+
+
+def test_cruise_detail_statement_budget(app_with_db, client, count_statements):
+    with app_with_db.app_context():
+        cruise = db.session.query(models.Cruise).where(models.Cruise.name == "The Grand Solar System Tour").first()
+    count_statements.statements.clear()
+
+    response = client.get(f"/cruise/{cruise.id}")
+
+    assert response.status_code == 200
+    assert b"Pluto" in response.data
+    assert len(count_statements) <= 2, "\n".join(count_statements.statements)
+
+
+def test_missing_destination_is_404(client):
+    response = client.get("/destination/999999")
+
+    assert response.status_code == 404
@@ -0,0 +1,68 @@
+import pathlib
+
+from flaskapp import catalog, create_app, db, queries, seeder
+
+
+def names(results):
+    return [result.name for result in results]
+
+
+def test_words_match_as_prefixes(app_context):
+    assert names(catalog.search("hot plan")) == ["The Hottest Planets Tour"]
+
+
+def test_name_matches_rank_first(app_context):
+    results = catalog.search("planets")
+
+    assert results[0].name.endswith(("Tour", "Expedition"))
+    assert all("Planets" in name for name in names(results)[:3])
+    assert [result.rank for result in results] == sorted((result.rank for result in results), reverse=True)
+
+
+def test_searches_destinations_and_cruises(app_context):
+    results = catalog.search("sun")
+
+    assert ("destination", "The Sun") in [(result.kind, result.name) for result in results]
+    assert ("cruise", "The Sun and Earth") in [(result.kind, result.name) for result in results]
+
+
+def test_result_limit(app_context):
+    assert len(catalog.search("planet", limit=2)) == 2
+
+
+def test_operators_and_punctuation_are_ignored(app_context):
+    assert catalog.search("!!! & |") == ()
+    assert names(catalog.search("sun:*) | (earth")) == names(catalog.search("sun earth"))
+
+
+def test_search_page(client):
+    response = client.get("/search?q=pluto")
+
+    assert response.status_code == 200
+    assert b'href="/destination/10"' in response.data
+
+
+def test_search_page_without_matches(client):
+    response = client.get("/search?q=andromeda")
+
+    assert response.status_code == 200
+    assert b"Nothing in the catalog matches" in response.data
+
+
+def test_search_uses_substring_match_without_postgres(tmp_path):
+    app = create_app({"DATABASE_URI": f"sqlite:///{tmp_path / 'catalog.db'}", "CATALOG_CACHE_BACKEND": "none"})
+    with app.app_context():
+        db.create_all()
+        seeder.seed_data(db, pathlib.Path(__file__).parent.parent.parent / "seed_data.json")
+
+        assert names(catalog.search("hottest PLANETS")) == ["The Hottest Planets Tour"]
+        assert catalog.search("sun")[0].rank == 1.0
+        assert catalog.search("100%") == ()
+
+
+def test_candidates_bound_ranked_matches(app_context):
+    # One candidate per table: at most one destination and one cruise are ranked
+    rows = queries.search_catalog("planet", limit=10, candidates=1)
+
+    assert len(rows) <= 2
+    assert len({row.kind for row in rows}) == len(rows)
@@ -0,0 +1,143 @@
+import json
+import tracemalloc
+
+import pytest
+
+from flaskapp import catalog, db, models, seeder
+
+
+def write_seed_file(tmp_path, destinations, cruises):
+    entries = [
+        {"model": "relecloud.destination", "pk": pk, "fields": {"name": f"Destination {pk}", "description": "d"}}
+        for pk in destinations
+    ]
+    entries += [
+        {
+            "model": "relecloud.cruise",
+            "pk": pk,
+            "fields": {"name": f"Cruise {pk}", "subtitle": "s", "description": "c", "destinations": destination_ids},
+        }
+        for pk, destination_ids in cruises.items()
+    ]
+    path = tmp_path / "seed.json"
+    path.write_text(json.dumps(entries))
+    return path
+
+
+def test_seed_inserts_rows_and_links(rollback_after, tmp_path):
+    path = write_seed_file(tmp_path, [900001, 900002], {900001: [900001, 900002, 1]})
+
+    report = seeder.seed_data(db, path)
+
+    assert (report.destinations, report.cruises, report.links, report.skipped) == (2, 1, 3, 0)
+    cruise = db.session.get(models.Cruise, 900001)
+    assert cruise.subtitle == "s"
+    assert sorted(destination.id for destination in cruise.destinations) == [1, 900001, 900002]
+
+
+def test_seed_is_idempotent(rollback_after, tmp_path):
+    path = write_seed_file(tmp_path, [900001], {900001: [900001]})
+    seeder.seed_data(db, path)
+
+    report = seeder.seed_data(db, path)
+
+    assert (report.destinations, report.cruises, report.links, report.skipped) == (0, 0, 0, 2)
+
+
+def test_seed_rejects_unknown_destinations(rollback_after, tmp_path):
+    path = write_seed_file(tmp_path, [900001], {900001: [900001, 999999]})
+
+    with pytest.raises(ValueError, match="Destination with id 999999 not found"):
+        seeder.seed_data(db, path)
+
+    assert db.session.get(models.Destination, 900001) is None
+
+
+def test_seed_moves_sequences_past_seeded_ids(rollback_after, tmp_path):
+    seeder.seed_data(db, write_seed_file(tmp_path, [900001], {}))
+
+    destination = models.Destination(name="Created after seeding")
+    db.session.add(destination)
+    db.session.flush()
+
+    assert destination.id > 900001
+
+
+def test_seed_invalidates_catalog(rollback_after, tmp_path):
+    assert catalog.destination(900001) is None
+    invalidations = catalog.stats()["invalidations"]
+
+    seeder.seed_data(db, write_seed_file(tmp_path, [900001], {}))
+
+    assert catalog.stats()["invalidations"] == invalidations + 1
+    assert catalog.destination(900001).name == "Destination 900001"
+
+
+def test_seed_large_file(rollback_after, tmp_path):
+    destinations = range(1_000_000, 1_010_000)
+    cruises = {pk: [pk, pk + 1 if pk + 1 in destinations else pk - 1] for pk in destinations}
+    path = write_seed_file(tmp_path, destinations, cruises)
+
+    report = seeder.seed_data(db, path)
+
+    assert (report.destinations, report.cruises, report.links) == (10_000, 10_000, 20_000)
+    assert report.seconds < 30, str(report)
+
+
+def test_iter_entries_reads_array_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(seeder, "READ_SIZE", 7)
+    path = write_seed_file(tmp_path, [1, 2], {3: [1, 2]})
+
+    assert list(seeder.iter_entries(path)) == json.loads(path.read_text())
+
+
+def test_iter_entries_reads_ndjson(tmp_path):
+    entries = json.loads(write_seed_file(tmp_path, [1, 2], {3: [1, 2]}).read_text())
+    path = tmp_path / "seed.ndjson"
+    path.write_text("\n".join(json.dumps(entry) for entry in entries) + "\n")
+
+    assert list(seeder.iter_entries(path)) == entries
+
+
+def test_iter_entries_reads_empty_array(tmp_path):
+    path = tmp_path / "seed.json"
+    path.write_text(" [ ]\n")
+
+    assert list(seeder.iter_entries(path)) == []
+
+
+def test_stream_resolves_destinations_later_in_file(rollback_after, tmp_path):
+    path = write_seed_file(tmp_path, [900001, 900002], {900001: [900002, 1]})
+    entries = json.loads(path.read_text())
+    path.write_text(json.dumps(entries[::-1]))
+
+    report = seeder.stream_data(db, path, batch_size=1)
+
+    assert (report.destinations, report.cruises, report.links, report.skipped) == (2, 1, 2, 0)
+    cruise = db.session.get(models.Cruise, 900001)
+    assert sorted(destination.id for destination in cruise.destinations) == [1, 900002]
+    assert seeder.stream_data(db, path, batch_size=2).skipped == 3
+
+
+def test_stream_rejects_unknown_destinations(rollback_after, tmp_path):
+    path = write_seed_file(tmp_path, [900001], {900001: [999999]})
+
+    with pytest.raises(ValueError, match="Destination with id 999999 not found"):
+        seeder.stream_data(db, path)
+
+    assert db.session.get(models.Destination, 900001) is None
+
+
+def test_stream_memory_does_not_grow_with_file(rollback_after, tmp_path):
+    def peak_memory(count):
+        destinations = range(1_000_000, 1_000_000 + count)
+        path = write_seed_file(tmp_path, destinations, {pk: [pk] for pk in destinations})
+        tracemalloc.start()
+        seeder.stream_data(db, path, batch_size=500)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        db.session.rollback()
+        return peak
+
+    # The destination id index grows with the file, so allow some growth but far from 10x
+    assert peak_memory(10_000) < 2 * peak_memory(1_000)
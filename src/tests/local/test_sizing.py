@@ -0,0 +1,99 @@
+import pytest
+
+from flaskapp import sizing
+
+GiB = 1024 * 1024 * 1024
+
+
+@pytest.fixture
+def cgroup_v2(tmp_path):
+    def make(cpu_max="max 100000", memory_max="max"):
+        (tmp_path / "cpu.max").write_text(cpu_max + "\n")
+        (tmp_path / "memory.max").write_text(memory_max + "\n")
+        return str(tmp_path)
+
+    return make
+
+
+def test_cpu_limit_from_cgroup_v2_quota(cgroup_v2):
+    assert sizing.cpu_limit(cgroup_v2(cpu_max="200000 100000")) == 2.0
+
+
+def test_cpu_limit_from_cgroup_v1_quota(tmp_path):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("150000\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+
+    assert sizing.cpu_limit(str(tmp_path)) == 1.5
+
+
+def test_cpu_limit_without_quota_uses_available_cpus(cgroup_v2, tmp_path):
+    assert sizing.cpu_limit(cgroup_v2()) >= 1
+    assert sizing.cpu_limit(str(tmp_path / "missing")) >= 1
+
+
+def test_memory_limit(cgroup_v2, tmp_path):
+    assert sizing.memory_limit(cgroup_v2(memory_max=str(2 * GiB))) == 2 * GiB
+    assert sizing.memory_limit(cgroup_v2(memory_max="max")) is None
+    assert sizing.memory_limit(str(tmp_path / "missing")) is None
+
+
+def test_workers_follow_cgroup_cpus_and_threads_follow_pool(cgroup_v2):
+    topology = sizing.compute({"DB_POOL_SIZE": "4", "DB_MAX_OVERFLOW": "2"}, cgroup_v2(cpu_max="200000 100000"))
+
+    assert topology.workers == 5
+    assert topology.threads == 6
+    assert topology.worker_class == "gthread"
+    assert topology.db_connections == 30
+    assert topology.warnings == ()
+
+
+def test_fractional_cpu_quota_rounds_up(cgroup_v2):
+    assert sizing.compute({}, cgroup_v2(cpu_max="50000 100000")).workers == 3
+
+
+def test_workers_are_capped_by_memory(cgroup_v2):
+    topology = sizing.compute(
+        {"GUNICORN_WORKER_MEMORY_MB": "256"}, cgroup_v2(cpu_max="800000 100000", memory_max=str(1 * GiB))
+    )
+
+    assert topology.workers == 4
+    assert "memory limit allows only 4 of 17 workers" in topology.warnings
+
+
+def test_environment_overrides(cgroup_v2):
+    topology = sizing.compute({"WEB_CONCURRENCY": "3", "GUNICORN_THREADS": "2"}, cgroup_v2())
+
+    assert topology.workers == 3
+    assert topology.threads == 2
+
+
+def test_gevent_uses_one_thread(cgroup_v2):
+    topology = sizing.compute(
+        {"GUNICORN_WORKER_CLASS": "gevent", "GUNICORN_WORKER_CONNECTIONS": "500"}, cgroup_v2(cpu_max="100000 100000")
+    )
+
+    assert topology.worker_class == "gevent"
+    assert topology.threads == 1
+    assert topology.worker_connections == 500
+
+
+def test_null_pool_is_unpooled(cgroup_v2):
+    topology = sizing.compute({"DB_POOL_MODE": "null"}, cgroup_v2(cpu_max="100000 100000"))
+
+    assert topology.db_connections is None
+    assert topology.threads == 8
+    assert "unpooled" in topology.describe()
+
+
+def test_warns_when_pool_exceeds_max_connections(cgroup_v2):
+    topology = sizing.compute({"DB_MAX_CONNECTIONS": "50"}, cgroup_v2(cpu_max="200000 100000"))
+
+    assert topology.db_connections == 75
+    assert "75 pooled connections exceed DB_MAX_CONNECTIONS=50" in topology.warnings
+
+
+def test_describe(cgroup_v2):
+    topology = sizing.compute({}, cgroup_v2(cpu_max="100000 100000", memory_max=str(2 * GiB)))
+
+    assert topology.describe() == "3 gthread workers x 15 threads (cpus=1, memory=2048MiB, max db connections=45)"
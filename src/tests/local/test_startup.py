@@ -0,0 +1,173 @@
+import json
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from flaskapp import create_app, db, models, startup
+
+
+@pytest.fixture
+def seed_file(tmp_path):
+    path = tmp_path / "seed.json"
+    path.write_text(json.dumps([{"model": "relecloud.destination", "pk": 900001, "fields": {"name": "Ceres"}}]))
+    return path
+
+
+@pytest.fixture
+def fresh_metadata(rollback_after):
+    """Starts the test as if startup had never run, even if the database was migrated with it."""
+    db.session.execute(text("CREATE TABLE IF NOT EXISTS alembic_version (version_num VARCHAR(32) PRIMARY KEY)"))
+    db.session.execute(text("DELETE FROM alembic_version"))
+    db.session.execute(text("DELETE FROM app_metadata"))
+    db.session.commit()
+
+
+@pytest.fixture
+def migrations(fresh_metadata, monkeypatch):
+    """Replaces the upgrade with a fake that only sets the alembic version."""
+    upgrades = []
+
+    def upgrade(directory):
+        upgrades.append(directory)
+        db.session.execute(text("DELETE FROM alembic_version"))
+        db.session.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": startup.alembic_head()})
+        db.session.commit()
+
+    monkeypatch.setattr(startup.flask_migrate, "upgrade", upgrade)
+    return upgrades
+
+
+def test_fingerprint_follows_content(tmp_path):
+    path = tmp_path / "seed.json"
+    path.write_text("[]")
+    before = startup.fingerprint(path)
+    path.write_text("[ ]")
+
+    assert startup.fingerprint(path) != before
+    assert len(before) == 64
+
+
+def test_alembic_head_is_latest_revision(app_with_db):
+    with app_with_db.app_context():
+        assert startup.alembic_head() == "e8b3d5a1f7c2"
+
+
+@pytest.fixture
+def migrated_app():
+    """An app on a scratch database created by the migrations alone."""
+    admin = create_engine(create_app().config["SQLALCHEMY_DATABASE_URI"], isolation_level="AUTOCOMMIT")
+    with admin.connect() as connection:
+        connection.execute(text('DROP DATABASE IF EXISTS "flaskapp_test_migrations"'))
+        connection.execute(text('CREATE DATABASE "flaskapp_test_migrations"'))
+    url = admin.url.set(database="flaskapp_test_migrations").render_as_string(hide_password=False)
+    app = create_app({"TESTING": True, "DATABASE_URI": url})
+    result = app.test_cli_runner().invoke(args=["db", "upgrade", "--directory", startup.MIGRATIONS_DIRECTORY])
+    assert result.exit_code == 0, result.output
+
+    yield app
+
+    # The migrations' logging config disables the app's loggers, which other tests check
+    for logger in logging.Logger.manager.loggerDict.values():
+        if isinstance(logger, logging.Logger) and logger.disabled and logger.name.startswith("flaskapp"):
+            logger.disabled = False
+
+    with app.app_context():
+        db.engine.dispose()
+    with admin.connect() as connection:
+        connection.execute(text('DROP DATABASE IF EXISTS "flaskapp_test_migrations" WITH (FORCE)'))
+    admin.dispose()
+
+
+def test_models_match_the_migrations(migrated_app):
+    # A difference would show up in the next autogenerated migration, as a column or index to drop
+    result = migrated_app.test_cli_runner().invoke(args=["db", "check", "--directory", startup.MIGRATIONS_DIRECTORY])
+
+    assert result.exit_code == 0, result.output
+
+
+def test_recorded_is_empty_without_alembic_version(rollback_after):
+    db.session.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    db.session.commit()
+
+    assert startup.recorded(db) == {}
+    # The failed query must not leave the session unusable
+    assert db.session.get(models.Destination, 1) is not None
+
+
+def test_seed_skips_seeded_file(fresh_metadata, seed_file):
+    assert startup.seed(db, seed_file).ran
+    db.session.execute(text("DELETE FROM destination WHERE id = 900001"))
+    db.session.commit()
+
+    phase = startup.seed(db, seed_file)
+
+    assert not phase.ran
+    assert phase.saved > 0
+    assert db.session.get(models.Destination, 900001) is None
+    assert startup.seed(db, seed_file, force=True).ran
+    assert db.session.get(models.Destination, 900001) is not None
+
+
+def test_seed_runs_when_file_changes(fresh_metadata, seed_file):
+    startup.seed(db, seed_file)
+    seed_file.write_text(json.dumps([{"model": "relecloud.destination", "pk": 900002, "fields": {"name": "Vesta"}}]))
+
+    assert startup.seed(db, seed_file).ran
+    assert db.session.get(models.Destination, 900002) is not None
+
+
+def test_run_skips_unchanged_phases(migrations, seed_file, count_statements):
+    first = startup.run(db, seed_file)
+    assert [phase.ran for phase in first.phases] == [True, True]
+
+    count_statements.statements.clear()
+    second = startup.run(db, seed_file)
+
+    assert [phase.ran for phase in second.phases] == [False, False]
+    # Besides the savepoint the test session opens, deciding to skip everything takes one query
+    queries = [statement for statement in count_statements.statements if not statement.startswith("SAVEPOINT")]
+    assert len(queries) == 1
+    assert len(migrations) == 1
+    assert "saved" in str(second)
+
+
+def test_run_migrates_when_database_is_behind(migrations, seed_file):
+    startup.run(db, seed_file)
+    db.session.execute(text("UPDATE alembic_version SET version_num = 'bdb17ae99c7e'"))
+    db.session.commit()
+
+    report = startup.run(db, seed_file)
+
+    assert [phase.ran for phase in report.phases] == [True, False]
+    assert len(migrations) == 2
+
+
+def startup_locks_held():
+    return db.session.execute(
+        text("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND classid = :high AND objid = :low"),
+        {"high": startup.STARTUP_LOCK >> 32, "low": startup.STARTUP_LOCK & 0xFFFFFFFF},
+    ).scalar()
+
+
+def test_run_holds_the_startup_lock_while_it_works(migrations, seed_file, monkeypatch):
+    held = []
+    upgrade = startup.flask_migrate.upgrade
+
+    def locked_upgrade(directory):
+        held.append(startup_locks_held())
+        upgrade(directory)
+
+    monkeypatch.setattr(startup.flask_migrate, "upgrade", locked_upgrade)
+
+    startup.run(db, seed_file)
+
+    assert held == [1]
+    assert startup_locks_held() == 0
+
+
+def test_record_overwrites_existing_keys(fresh_metadata):
+    startup.record(db, {startup.ALEMBIC_HEAD: "first"})
+    startup.record(db, {startup.ALEMBIC_HEAD: "second"})
+
+    assert startup.recorded(db)[startup.ALEMBIC_HEAD] == "second"
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+# Generous enough for slow CI machines; importing the telemetry distro alone blows through it
+IMPORT_BUDGET_SECONDS = 2.0
+
+TELEMETRY_MODULE_PREFIXES = ("azure.monitor", "opentelemetry")
+
+FAKE_CONNECTION_STRING = "InstrumentationKey=00000000-0000-0000-0000-000000000000;IngestionEndpoint=http://127.0.0.1:9/"
+
+
+def parse_importtime(stderr):
+    """Maps each imported module to its cumulative import time in seconds."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(cumulative) / 1_000_000
+    return modules
+
+
+def test_import_time_without_telemetry():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import flaskapp"], capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    modules = parse_importtime(result.stderr)
+
+    assert not [name for name in modules if name.startswith(TELEMETRY_MODULE_PREFIXES)]
+    assert modules["flaskapp"] < IMPORT_BUDGET_SECONDS
+
+
+def test_no_op_without_connection_string(app_with_db):
+    assert "telemetry" not in app_with_db.extensions
+    assert app_with_db.wsgi_app.__self__ is app_with_db
+
+
+def test_deferred_setup_starts_on_first_request():
+    script = textwrap.dedent(
+        """
+        import sys
+
+        from flaskapp import create_app, telemetry
+
+        app = create_app({"TELEMETRY_SAMPLING_RATIO": 0.25, "TELEMETRY_MAX_QUEUE_SIZE": 1000})
+        assert "azure.monitor.opentelemetry" not in sys.modules
+        assert not telemetry.is_ready(app)
+
+        client = app.test_client()
+        assert client.get("/about").status_code == 200
+        assert app.extensions["telemetry"].ready.wait(60)
+        assert client.get("/about").status_code == 200
+
+        from opentelemetry import trace
+
+        print(trace.get_tracer_provider().sampler.get_description())
+        import os
+
+        print(os.environ["OTEL_BSP_MAX_QUEUE_SIZE"])
+        """
+    )
+    env = dict(
+        os.environ,
+        APPLICATIONINSIGHTS_CONNECTION_STRING=FAKE_CONNECTION_STRING,
+        APPLICATIONINSIGHTS_STATSBEAT_DISABLED_ALL="true",
+    )
+    env.pop("OTEL_BSP_MAX_QUEUE_SIZE", None)
+
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=120, env=env)
+
+    assert result.returncode == 0, result.stderr
+    sampler, queue_size = result.stdout.split()[-2:]
+    assert "0.25" in sampler
+    assert queue_size == "1000"
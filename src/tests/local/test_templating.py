@@ -0,0 +1,91 @@
+import itertools
+
+import pytest
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+
+from flaskapp import assets, create_app
+from flaskapp.cache import TTLCache
+
+
+@pytest.fixture
+def fragment_cache(app_with_db):
+    # A fresh cache, so its stats count this test's lookups only
+    previous = app_with_db.extensions["fragment_cache"]
+    fragment_cache = app_with_db.extensions["fragment_cache"] = TTLCache()
+    yield fragment_cache
+    app_with_db.extensions["fragment_cache"] = previous
+
+
+def render_string(app, source, **context):
+    with app.test_request_context():
+        return app.jinja_env.from_string(source).render(**context)
+
+
+def test_compiled_templates_are_shared_through_the_bytecode_cache(tmp_path):
+    config = {"TEMPLATE_BYTECODE_CACHE_DIR": str(tmp_path)}
+    first = create_app(config)
+    assert isinstance(first.jinja_env.bytecode_cache, FileSystemBytecodeCache)
+    with first.test_request_context():
+        html = render_template("about.html")
+    assert list(tmp_path.glob("__jinja2_*.cache"))
+
+    # A second worker loads the compiled code instead of compiling the source again
+    second = create_app(config)
+
+    def compile(*args, **kwargs):
+        raise AssertionError("template was compiled again")
+
+    second.jinja_env.compile = compile
+    with second.test_request_context():
+        assert render_template("about.html") == html
+
+
+def test_bytecode_cache_directory_must_be_private(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+
+    with pytest.raises(RuntimeError, match="writable by other users"):
+        create_app({"TEMPLATE_BYTECODE_CACHE_DIR": str(shared)})
+
+
+def test_bytecode_cache_can_be_turned_off():
+    app = create_app({"TEMPLATE_BYTECODE_CACHE": False})
+
+    assert app.jinja_env.bytecode_cache is None
+
+
+def test_cache_tag_renders_a_fragment_once_per_key(app_with_db, fragment_cache):
+    counter = itertools.count()
+    source = '{% cache "counter", key %}<b>{{ next() }}</b>{% endcache %}'
+
+    def render(key):
+        return render_string(app_with_db, source, key=key, next=lambda: next(counter))
+
+    assert render(1) == "<b>0</b>"
+    assert render(1) == "<b>0</b>"
+    assert render(2) == "<b>1</b>"
+    assert fragment_cache.stats.hits == 1
+
+
+def test_fragments_are_not_reused_after_an_asset_build(app_with_db, fragment_cache, monkeypatch):
+    counter = itertools.count()
+    source = '{% cache "counter" %}{{ next() }}{% endcache %}'
+    assert render_string(app_with_db, source, next=lambda: next(counter)) == "0"
+
+    monkeypatch.setitem(app_with_db.extensions, "assets", assets.Manifest(source="rebuilt", files={}))
+
+    assert render_string(app_with_db, source, next=lambda: next(counter)) == "1"
+
+
+def test_layout_fragments_are_cached(app_with_db, fragment_cache, monkeypatch):
+    monkeypatch.setitem(app_with_db.config, "PAGE_CACHE_ENABLED", False)
+    client = app_with_db.test_client()
+
+    first = client.get("/about").get_data(as_text=True)
+    assert fragment_cache.stats.misses == 3
+
+    assert client.get("/about").get_data(as_text=True) == first
+    assert fragment_cache.stats.hits == 3
+    assert 'href="/destinations"' in first
@@ -0,0 +1,69 @@
+import logging
+import re
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from flaskapp import telemetry
+
+
+def server_timing(response):
+    return {
+        name: (float(duration), description)
+        for name, duration, description in re.findall(
+            r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', response.headers["Server-Timing"]
+        )
+    }
+
+
+def test_server_timing_header(client):
+    timings = server_timing(client.get("/destinations"))
+
+    assert set(timings) == {"db", "render", "total"}
+    assert timings["db"][1] == "1 queries"
+    assert timings["render"][0] > 0
+    assert timings["total"][0] >= timings["db"][0] + timings["render"][0]
+
+
+def test_cached_page_has_no_queries_or_rendering(client):
+    client.get("/destinations")
+
+    timings = server_timing(client.get("/destinations"))
+
+    assert timings["db"] == (0.0, "0 queries")
+    assert timings["render"][0] == 0.0
+
+
+def test_header_can_be_turned_off(app_with_db, client, monkeypatch):
+    monkeypatch.setitem(app_with_db.config, "SERVER_TIMING_HEADER", False)
+
+    assert "Server-Timing" not in client.get("/about").headers
+
+
+def test_slow_requests_and_queries_are_logged(app_with_db, client, monkeypatch, caplog):
+    monkeypatch.setitem(app_with_db.config, "SLOW_REQUEST_MS", 0)
+    monkeypatch.setitem(app_with_db.config, "SLOW_QUERY_MS", 0)
+
+    with caplog.at_level(logging.WARNING, logger="flaskapp.timing"):
+        client.get("/destinations?limit=3")
+
+    slow_query, slow_request = caplog.messages
+    assert slow_query.startswith("Slow query:") and "FROM destination" in slow_query
+    assert slow_request.startswith("Slow request GET /destinations?limit=3:")
+    assert "1 queries" in slow_request and "FROM destination" in slow_request
+
+
+def test_span_attributes(client, monkeypatch):
+    monkeypatch.setattr(telemetry, "is_ready", lambda app: True)
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    with provider.get_tracer(__name__).start_as_current_span("request"):
+        client.get("/destinations")
+
+    [span] = exporter.get_finished_spans()
+    assert span.attributes["app.db.statements"] == 1
+    assert span.attributes["app.render.duration_ms"] > 0
+    assert span.attributes["app.duration_ms"] >= span.attributes["app.db.duration_ms"]